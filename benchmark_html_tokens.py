@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark the html_tokens passes against the regexes they replaced.
+
+Four synthetic inputs are timed at growing sizes:
+    document      emails/newsletters/zomo-health-template-01.html repeated N times
+    download page the escaped code of a download page repeated N times
+    attributes    icon img tags carrying N style attributes and no font-size, the
+                  shape that makes the old duplicate-attribute pattern backtrack
+    unclosed      N "<span class="material-icons"" starts without a closing ">",
+                  which the old icon pattern rescans to the end of the document
+                  from every start
+
+For each size the old regex and the tokenizer pass run on the same text and
+the best of --repeat runs is reported. On well-formed documents both grow
+linearly and the regexes keep a constant-factor lead (they do less: no
+attribute parsing); on the last two inputs the regex times grow
+quadratically while the tokenizer stays linear.
+
+Usage:
+    python benchmark_html_tokens.py
+    python benchmark_html_tokens.py --repeat 5 --sizes 1 10 100
+"""
+
+import re
+import sys
+import time
+import argparse
+
+import fix_remaining_icons
+import fix_duplicate_attributes
+import update_icon_urls
+import update_download_pages_icons
+
+sample_file = "emails/newsletters/zomo-health-template-01.html"
+download_page_file = "download-pages/email-verification-download.html"
+
+# The patterns the passes used before html_tokens
+OLD_PATTERNS = {
+    "duplicate_attributes": re.compile(
+        r'<img src="assets/images/icons/[^"]*\.svg"[^>]*style="[^"]*"[^>]*font-size:[^>]*>'),
+    "remaining_icons": re.compile(r'<span class="material-icons([^>]*)>([^<]+)</span>'),
+    "icon_urls": re.compile(r'src="assets/images/icons/([^"]*\.svg)"'),
+    "download_page_icons": re.compile(
+        r'&lt;span class=&quot;material-icons&quot;([^&]*)&gt;([^&]+)&lt;/span&gt;'),
+}
+
+NEW_PASSES = {
+    "duplicate_attributes": fix_duplicate_attributes.clean_duplicate_attributes,
+    "remaining_icons": fix_remaining_icons.replace_remaining_icons,
+    "icon_urls": update_icon_urls.rewrite_icon_urls,
+    "download_page_icons": update_download_pages_icons.replace_encoded_icons,
+}
+
+DEFAULT_SIZES = [1, 10, 100, 400]
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def document_input(size):
+    return read_text(sample_file) * size
+
+def download_page_input(size):
+    return read_text(download_page_file) * size
+
+def attribute_input(size):
+    tag = '<img src="assets/images/icons/check.svg"' + ' style="a:b"' * size + '>\n'
+    return tag * 50
+
+def unclosed_input(size):
+    return '<span class="material-icons" title="x" ' * (size * 10)
+
+INPUTS = [
+    ("document", document_input, ["duplicate_attributes", "remaining_icons", "icon_urls"]),
+    ("download page", download_page_input, ["download_page_icons"]),
+    ("attributes", attribute_input, ["duplicate_attributes"]),
+    ("unclosed", unclosed_input, ["remaining_icons"]),
+]
+
+def best_time(function, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_regex(name):
+    pattern = OLD_PATTERNS[name]
+    return lambda text: pattern.sub(lambda match: match.group(0), text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the html_tokens passes with the old regexes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help=f"input size multipliers (default: {' '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best is kept (default: 3)")
+    args = parser.parse_args()
+
+    print(f"{'input':<20} {'size':>5} {'KB':>8}  {'pass':<22} {'regex ms':>10} {'tokens ms':>10} {'ratio':>7}")
+    print("=" * 90)
+    for label, make_input, passes in INPUTS:
+        for size in args.sizes:
+            try:
+                text = make_input(size)
+            except OSError as e:
+                print(f"❌ {label}: {e}")
+                break
+            for name in passes:
+                regex = best_time(run_regex(name), text, args.repeat)
+                tokens = best_time(NEW_PASSES[name], text, args.repeat)
+                print(f"{label:<20} {size:>5} {len(text) / 1024:>8.1f}  {name:<22} "
+                      f"{regex * 1000:>10.2f} {tokens * 1000:>10.2f} {regex / tokens:>6.1f}x")
+        print("-" * 90)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
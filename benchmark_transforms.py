@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Benchmark the transform_pipeline passes on synthetic corpora of growing size.
+
+The corpora are modeled on emails/newsletters/zomo-health-template-01.html
+and its escaped download page, with the icon fixes undone so every step has
+work to do: icon img tags become Material Icons spans, local .svg paths or
+img tags with font-size debris, in rotation. Each registered pass runs on
+the templates. The download pages are generated from the templates rather
+than patched by a pass, so two more steps are timed the same way:
+download_pages (generate_download_pages.write_page: the shell fill and the
+streaming html.escape of a template) and download_page_icons
+(update_download_pages_icons rewriting escaped icon spans) on the escaped
+pages. Each step is scaled along two axes:
+
+    files   --scales times as many files as the step applies to today
+    size    today's file count, each document --scales times as long
+            (the <body> content repeated)
+
+Every file is timed on its own and the run reports ms per file and ms per MB
+for each step, axis and scale. Results are appended to a JSON Lines history
+(.cache/transform-benchmarks.jsonl). A measurement slower than the median of
+the previous runs on the same machine by more than --threshold fails the run,
+so a fix script change that slows the pipeline down shows up before it ships.
+
+Usage:
+    python benchmark_transforms.py                       # 1x 10x 100x 1000x
+    python benchmark_transforms.py --scales 1 10 --pass icon_urls
+    python benchmark_transforms.py --threshold 0.1 --no-record
+"""
+
+import io
+import os
+import re
+import sys
+import glob
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+
+import transform_pipeline
+import generate_download_pages
+import update_download_pages_icons
+
+# Base URL for the Vercel deployment
+BASE_URL = "https://zomo-emails.vercel.app"
+
+sample_file = "emails/newsletters/zomo-health-template-01.html"
+download_page_file = "download-pages/zomo-health-template-01-download.html"
+history_path = ".cache/transform-benchmarks.jsonl"
+
+DEFAULT_SCALES = [1, 10, 100, 1000]
+AXES = ("files", "size")
+
+# Fail when a measurement is this much slower than its baseline
+DEFAULT_THRESHOLD = 0.25
+# Previous runs whose median is the baseline
+BASELINE_RUNS = 5
+# Measurements shorter than this are too noisy to gate on
+MIN_GATED_SECONDS = 0.005
+# Corpora up to this size are timed --repeat times (best kept); larger ones once
+REPEAT_LIMIT_BYTES = 20 * 1024 * 1024
+
+ICON_IMG_PATTERN = re.compile(
+    r'<img src="' + re.escape(BASE_URL) + r'/assets/images/icons/(\w+)\.(?:png|svg)" alt="\w+" style="([^"]*)">')
+ESCAPED_ICON_IMG_PATTERN = re.compile(
+    r'&lt;img src=&quot;' + re.escape(BASE_URL) +
+    r'/assets/images/icons/(\w+)\.(?:png|svg)&quot; alt=&quot;\w+&quot; style=&quot;((?:(?!&quot;).)*)&quot;&gt;')
+BODY_PATTERN = re.compile(r'(<body\b[^>]*>)(.*)(</body>)', re.S | re.I)
+
+# --- Synthetic corpora ----------------------------------------------------------
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def unfix_icon(name, style, shape):
+    """
+    One of the icon shapes the fix scripts were written for
+    """
+    style = style.strip().rstrip(";")
+    if shape == 0:
+        return f'<span class="material-icons" style="{style}; font-size:16px;">{name}</span>'
+    if shape == 1:
+        return f'<img src="assets/images/icons/{name}.svg" alt="{name}" style="{style}">'
+    return (f'<img src="assets/images/icons/{name}.svg" alt="{name}" '
+            f'style="{style}; font-size:16px;" font-size:16px;"">')
+
+def unfix_template(content, variant):
+    counter = iter(range(sys.maxsize))
+    return ICON_IMG_PATTERN.sub(
+        lambda m: unfix_icon(m.group(1), m.group(2), (next(counter) + variant) % 3), content)
+
+def unfix_download_page(content, variant):
+    counter = iter(range(sys.maxsize))
+
+    def escaped_span(match):
+        # Every other icon, so the page keeps some already fixed img tags
+        if (next(counter) + variant) % 2:
+            return match.group(0)
+        return (f'&lt;span class=&quot;material-icons&quot; style=&quot;{match.group(2)}&quot;&gt;'
+                f'{match.group(1)}&lt;/span&gt;')
+    return ESCAPED_ICON_IMG_PATTERN.sub(escaped_span, content)
+
+def scale_document(content, factor):
+    """
+    Repeat the <body> content factor times, keeping the head once
+    """
+    match = BODY_PATTERN.search(content)
+    if match is None or factor == 1:
+        return content * factor
+    return content[:match.end(1)] + match.group(2) * factor + content[match.start(3):]
+
+class Corpus:
+    """
+    Synthetic files for one kind of input, built from a sample document.
+    The variants rotate the icon shapes so the files are not all identical.
+    """
+
+    VARIANTS = 3
+
+    def __init__(self, sample_path, unfix):
+        sample = read_text(sample_path)
+        self.variants = [unfix(sample, variant) for variant in range(self.VARIANTS)]
+
+    def files(self, count, factor):
+        """
+        Yield count synthetic documents, each factor times the sample's length
+        """
+        cache = {}
+        for index in range(count):
+            variant = index % self.VARIANTS
+            if variant not in cache:
+                cache[variant] = scale_document(self.variants[variant], factor)
+            yield cache[variant]
+
+# --- Benchmarked steps ----------------------------------------------------------
+
+def page_writer(shell):
+    """
+    Content transform that writes a template's download page in memory
+    """
+    def write(content):
+        out = io.StringIO()
+        generate_download_pages.write_page(io.StringIO(content), out, shell, sample_file)
+        return out.getvalue()
+    return write
+
+def benchmark_steps():
+    """
+    Return every benchmarked step as {"name", "transform", "corpus", "count"}:
+    the pipeline passes on the templates, then the download page generator
+    and the escaped-page icon rewrite
+    """
+    steps = [{
+        "name": p["name"],
+        "transform": p["transform"],
+        "corpus": (sample_file, unfix_template),
+        "count": lambda p=p: len(transform_pipeline.collect_files([p])),
+    } for p in transform_pipeline.PASSES]
+    steps.append({
+        "name": "download_pages",
+        "transform": page_writer(generate_download_pages.load_shell()),
+        "corpus": (sample_file, unfix_template),
+        "count": lambda: len(generate_download_pages.find_sources()),
+    })
+    steps.append({
+        "name": "download_page_icons",
+        "transform": update_download_pages_icons.replace_encoded_icons,
+        "corpus": (download_page_file, unfix_download_page),
+        "count": lambda: len(glob.glob(update_download_pages_icons.DOWNLOAD_PAGES_PATTERN)),
+    })
+    return steps
+
+def select_steps(names=None):
+    """
+    Return the benchmarked steps, optionally restricted to the given names
+    """
+    steps = benchmark_steps()
+    if not names:
+        return steps
+
+    unknown = set(names) - {step["name"] for step in steps}
+    if unknown:
+        raise ValueError(f"Unknown step(s): {', '.join(sorted(unknown))}")
+
+    return [step for step in steps if step["name"] in names]
+
+# --- Measurement ------------------------------------------------------------------
+
+def time_file(transform, content, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        transform(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def measure(step, corpus, axis, scale, base_count, repeat):
+    count = base_count * scale if axis == "files" else base_count
+    factor = scale if axis == "size" else 1
+    document_bytes = len(corpus.variants[0].encode('utf-8')) * factor
+    if document_bytes * count > REPEAT_LIMIT_BYTES:
+        repeat = 1
+
+    times = []
+    total_bytes = 0
+    for content in corpus.files(count, factor):
+        total_bytes += len(content.encode('utf-8'))
+        times.append(time_file(step["transform"], content, repeat))
+
+    seconds = sum(times)
+    return {
+        "pass": step["name"],
+        "axis": axis,
+        "scale": scale,
+        "files": count,
+        "bytes": total_bytes,
+        "seconds": seconds,
+        "ms_per_file": seconds * 1000 / count,
+        "ms_per_mb": seconds * 1000 / (total_bytes / 1024 / 1024),
+        "max_file_ms": max(times) * 1000,
+    }
+
+# --- History ------------------------------------------------------------------------
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "machine": platform.node(),
+        "python": platform.python_version(),
+    }
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    runs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return runs
+
+def append_history(path, run):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, sort_keys=True) + "\n")
+
+def baselines(history, env):
+    """
+    Return {(pass, axis, scale): median ms per MB} over the last runs on this machine and Python
+    """
+    same = [run for run in history
+            if run.get("machine") == env["machine"] and run.get("python") == env["python"]]
+    samples = {}
+    for run in same[-BASELINE_RUNS:]:
+        for result in run.get("results", []):
+            if result.get("seconds", 0) >= MIN_GATED_SECONDS:
+                key = (result["pass"], result["axis"], result["scale"])
+                samples.setdefault(key, []).append(result["ms_per_mb"])
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transform steps on scaled synthetic corpora")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help=f"scale factors (default: {' '.join(map(str, DEFAULT_SCALES))})")
+    parser.add_argument("--axis", choices=AXES, action="append",
+                        help="only scale file count or document size (default: both)")
+    parser.add_argument("--pass", dest="passes", action="append",
+                        help="only benchmark this pass or step (may be given more than once)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per file for corpora up to 20 MB, best is kept (default: 3)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed slowdown against the history, as a fraction (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--history", default=history_path, help=f"history file (default: {history_path})")
+    parser.add_argument("--no-record", action="store_true", help="compare with the history without appending")
+    args = parser.parse_args()
+
+    try:
+        steps = select_steps(args.passes)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    env = environment()
+    history = load_history(args.history)
+    baseline = baselines(history, env)
+    corpora = {}
+    results = []
+    regressions = []
+
+    print(f"{'pass':<22} {'axis':<6} {'scale':>6} {'files':>6} {'MB':>9} {'ms/file':>10} {'ms/MB':>9} {'max ms':>9} {'vs base':>8}")
+    print("=" * 94)
+    for step in steps:
+        source = step["corpus"]
+        try:
+            if source not in corpora:
+                corpora[source] = Corpus(*source)
+        except OSError as e:
+            print(f"❌ {step['name']}: {e}")
+            return 1
+        corpus = corpora[source]
+        base_count = max(1, step["count"]())
+
+        for axis in args.axis or AXES:
+            for scale in args.scales:
+                result = measure(step, corpus, axis, scale, base_count, max(1, args.repeat))
+                results.append(result)
+
+                key = (result["pass"], axis, scale)
+                change = ""
+                if key in baseline and result["seconds"] >= MIN_GATED_SECONDS:
+                    ratio = result["ms_per_mb"] / baseline[key]
+                    change = f"{(ratio - 1) * 100:+.0f}%"
+                    if ratio > 1 + args.threshold:
+                        regressions.append((key, ratio))
+                        change += " ⚠️"
+                print(f"{result['pass']:<22} {axis:<6} {scale:>5}x {result['files']:>6} "
+                      f"{result['bytes'] / 1024 / 1024:>9.1f} {result['ms_per_file']:>10.2f} "
+                      f"{result['ms_per_mb']:>9.1f} {result['max_file_ms']:>9.1f} {change:>8}")
+        print("-" * 94)
+
+    if not args.no_record:
+        append_history(args.history, dict(env, results=results))
+        print(f"ℹ️  Recorded {len(results)} measurements in {args.history}")
+
+    if not baseline:
+        print("ℹ️  No earlier runs on this machine to compare with")
+    for (name, axis, scale), ratio in regressions:
+        print(f"❌ {name} ({axis} {scale}x) is {(ratio - 1) * 100:.0f}% slower per MB than the baseline")
+    if regressions:
+        return 1
+    print("✅ No regressions" if baseline else "✅ Done")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
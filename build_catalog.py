@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Generate the template catalog: the gallery's listing pages and its search index.
+
+Every email in emails/<category>/ is described by metadata read from the
+template itself - subject (<title>), hidden preheader, Mailchimp merge tags
+and [PLACEHOLDER] fields - plus its card text in emails/catalog.json (name,
+description, thumb label and icon, all optional). Adding a template is
+dropping the file into its category directory and running this script; a
+catalog.json entry only refines its card.
+
+The card grids of index.html and of each category's page are regenerated
+between <!-- catalog:grid --> and <!-- /catalog:grid --> markers, so the
+hand-written text around them stays. A category without a page gets one from
+templates/catalog/category.html.
+
+The search index (assets/catalog/search-index.json) is precomputed: the
+documents as arrays and a sorted term list with postings [doc, weight, ...].
+The gallery fetches it when the search box is first used and prefix-matches
+query words with a binary search over the terms, so nothing is tokenized or
+scored on page load however many templates there are.
+
+Usage:
+    python build_catalog.py             # regenerate the pages and the index
+    python build_catalog.py --check     # exit 1 when anything is out of date
+    python build_catalog.py --json      # print the template metadata
+"""
+
+import os
+import re
+import sys
+import glob
+import html
+import json
+import argparse
+
+import html_tokens
+import email_files
+import build_messages
+import render_merge_tags
+import template_engine
+
+emails_dir = "emails"
+catalog_path = "emails/catalog.json"
+gallery_path = "index.html"
+index_path = "assets/catalog/search-index.json"
+templates_dir = "templates/catalog"
+
+GRID_START = "<!-- catalog:grid -->"
+GRID_END = "<!-- /catalog:grid -->"
+
+# Bump when the layout of the search index changes
+INDEX_VERSION = 1
+
+# Document fields stored in the index, in array order
+INDEX_FIELDS = ["url", "name", "category", "description"]
+
+# A term's weight for a document is the sum of the weights of the fields it occurs in
+FIELD_WEIGHTS = {
+    "name": 8,
+    "subject": 4,
+    "merge_tags": 4,
+    "placeholders": 4,
+    "category": 2,
+    "description": 1,
+    "preheader": 1,
+}
+
+# The client tokenizes queries with the same expression
+TERM_PATTERN = re.compile(r'[a-z0-9]+')
+PLACEHOLDER_PATTERN = re.compile(r'\[([A-Z][A-Z0-9_]*)\]')
+SITE_SUFFIX_PATTERN = re.compile(r'\s+[-–—]\s+ZOMO Health$')
+
+def load_catalog(path=catalog_path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except FileNotFoundError:
+        catalog = {}
+    catalog.setdefault("categories", {})
+    catalog.setdefault("templates", {})
+    return catalog
+
+def find_categories(catalog):
+    """
+    Return [(slug, info)] for the categories in catalog.json order, followed by
+    any other directory in emails/ that holds templates
+    """
+    categories = dict(catalog["categories"])
+    for directory in sorted(glob.glob(os.path.join(emails_dir, "*", ""))):
+        slug = os.path.basename(os.path.dirname(directory))
+        if slug not in categories and category_templates(slug, {}):
+            categories[slug] = {}
+
+    result = []
+    for slug, info in categories.items():
+        info = dict(info)
+        info.setdefault("title", slug.replace("-", " ").title())
+        info.setdefault("thumb", info["title"])
+        info.setdefault("description", f"{info['title']} email templates")
+        info.setdefault("subtitle", info["description"])
+        info.setdefault("heading", f"{info['title']} Emails")
+        info.setdefault("page", "index.html")
+        result.append((slug, info))
+    return result
+
+def category_page(slug, info):
+    return os.path.join(emails_dir, slug, info.get("page", "index.html"))
+
+def category_templates(slug, templates):
+    """
+    Return the templates of a category: those listed in catalog.json first, in
+    their order, then the rest by name
+    """
+    found = {to_url_path(os.path.relpath(p, emails_dir))
+             for p in glob.glob(os.path.join(emails_dir, slug, "*.html"))
+             if not p.endswith(".min.html") and os.path.basename(p) not in email_files.LISTING_PAGES}
+    listed = [key for key in templates if key in found]
+    return listed + sorted(found.difference(listed))
+
+def to_url_path(path):
+    return path.replace(os.sep, "/")
+
+def squash(text):
+    return " ".join(html.unescape(text).split())
+
+def read_metadata(key, slug, category, overrides):
+    """
+    Return the catalog entry of a template (key is its path under emails/)
+    """
+    path = os.path.join(emails_dir, *key.split("/"))
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    title = build_messages.TITLE_PATTERN.search(content)
+    subject = squash(title.group(1)) if title else ""
+
+    preheader = ""
+    for _, text, _ in html_tokens.text_elements(
+            content, {"div"}, lambda tag: "mso-hide" in (tag.get("style") or "")):
+        preheader = squash(text.text)
+        break
+
+    merge_tags = sorted({m.group("name") for m in render_merge_tags.MERGE_TAG_PATTERN.finditer(content)})
+    placeholders = list(dict.fromkeys(PLACEHOLDER_PATTERN.findall(content)))
+    stem = os.path.splitext(os.path.basename(key))[0]
+
+    return {
+        "path": to_url_path(path),
+        "category": slug,
+        "category_title": category["title"],
+        "name": overrides.get("name") or SITE_SUFFIX_PATTERN.sub("", subject) or stem.replace("-", " ").title(),
+        "description": overrides.get("description") or preheader or subject,
+        "thumb": overrides.get("thumb") or category["title"],
+        "icon": overrides.get("icon"),
+        "subject": subject,
+        "preheader": preheader,
+        "merge_tags": merge_tags,
+        "placeholders": placeholders,
+    }
+
+def collect(catalog):
+    """
+    Return (categories, entries): [(slug, info)] and the metadata of every template
+    """
+    categories = find_categories(catalog)
+    entries = []
+    for slug, info in categories:
+        for key in category_templates(slug, catalog["templates"]):
+            entries.append(read_metadata(key, slug, info, catalog["templates"].get(key, {})))
+    return categories, entries
+
+# --- Pages ----------------------------------------------------------------------
+
+def render_card(compiled, values):
+    # Optional slots (the icon) leave an empty line behind
+    return "\n".join(line for line in template_engine.render(compiled, values).splitlines() if line.strip())
+
+def render_grid(cards):
+    lines = ['<div class="grid">']
+    for card in cards:
+        lines.extend("  " + line for line in card.splitlines())
+    lines.append("</div>")
+    return lines
+
+def replace_grid(content, lines, path):
+    """
+    Put the grid lines between the catalog markers, indented like the start marker
+    """
+    start = content.find(GRID_START)
+    end = content.find(GRID_END, start)
+    if start < 0 or end < 0:
+        raise ValueError(f"{path}: no {GRID_START} ... {GRID_END} markers")
+    line_start = content.rfind("\n", 0, start) + 1
+    indent = content[line_start:start] if not content[line_start:start].strip() else ""
+    block = "\n".join([GRID_START] + [indent + line for line in lines] + [indent + GRID_END])
+    return content[:start] + block + content[end + len(GRID_END):]
+
+def category_pages(categories, entries):
+    """
+    Return {path: content} for every category page
+    """
+    card = template_engine.load_template(os.path.join(templates_dir, "card.html"))
+    layout = None
+    pages = {}
+    for slug, info in categories:
+        path = category_page(slug, info)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        else:
+            if layout is None:
+                layout = template_engine.load_template(os.path.join(templates_dir, "category.html"))
+            content = template_engine.render(layout, info)
+
+        cards = [render_card(card, {
+            "href": os.path.basename(entry["path"]),
+            "thumb": entry["thumb"],
+            "icon": f'<div class="material-icons icon">{html.escape(entry["icon"])}</div>' if entry["icon"] else "",
+            "name": entry["name"],
+            "description": entry["description"],
+        }) for entry in entries if entry["category"] == slug]
+        pages[path] = replace_grid(content, render_grid(cards), path)
+    return pages
+
+def gallery_page(categories):
+    card = template_engine.load_template(os.path.join(templates_dir, "category-card.html"))
+    with open(gallery_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    cards = [render_card(card, dict(info, href=to_url_path(category_page(slug, info))))
+             for slug, info in categories]
+    return replace_grid(content, render_grid(cards), gallery_path)
+
+# --- Search index ---------------------------------------------------------------
+
+def terms(value):
+    if isinstance(value, list):
+        value = " ".join(value)
+    return set(TERM_PATTERN.findall(value.lower()))
+
+def build_index(entries):
+    """
+    Return the search index: documents as arrays of INDEX_FIELDS, the sorted
+    terms and, for each term, a flat [doc, weight, doc, weight, ...] list
+    """
+    weights = {}
+    for doc, entry in enumerate(entries):
+        fields = dict(entry, category=entry["category_title"])
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in terms(fields[field]):
+                postings = weights.setdefault(term, {})
+                postings[doc] = postings.get(doc, 0) + weight
+
+    sorted_terms = sorted(weights)
+    return {
+        "version": INDEX_VERSION,
+        "fields": INDEX_FIELDS,
+        "docs": [[entry["path"], entry["name"], entry["category_title"], entry["description"]]
+                 for entry in entries],
+        "terms": sorted_terms,
+        "postings": [[n for doc in sorted(weights[term]) for n in (doc, weights[term][doc])]
+                     for term in sorted_terms],
+    }
+
+def serialize_index(index):
+    return json.dumps(index, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+# --- Output ---------------------------------------------------------------------
+
+def is_current(path, content):
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return f.read() == content
+    except FileNotFoundError:
+        return False
+
+def write_text(path, content):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the catalog pages and the gallery search index")
+    parser.add_argument("--check", action="store_true", help="only report out-of-date files (exit 1 if any)")
+    parser.add_argument("--json", action="store_true", help="print the template metadata as JSON")
+    args = parser.parse_args()
+
+    try:
+        catalog = load_catalog()
+        categories, entries = collect(catalog)
+        outputs = category_pages(categories, entries)
+        outputs[gallery_path] = gallery_page(categories)
+        outputs[index_path] = serialize_index(build_index(entries))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    if args.json:
+        print(json.dumps(entries, indent=2, ensure_ascii=False))
+        return 0
+
+    unknown = sorted(set(catalog["templates"]).difference(
+        entry["path"][len(emails_dir) + 1:] for entry in entries))
+    for key in unknown:
+        print(f"⚠️  {catalog_path} lists {key}, which is not a template")
+
+    stale = [path for path, content in outputs.items() if not is_current(path, content)]
+    if args.check:
+        for path in stale:
+            print(f"❌ {path} is out of date")
+        if stale:
+            print("ℹ️  Run python build_catalog.py to regenerate it")
+            return 1
+        print(f"✅ Catalog up to date ({len(entries)} templates in {len(categories)} categories)")
+        return 0
+
+    for path in stale:
+        write_text(path, outputs[path])
+        print(f"🔄 Updated {path}")
+    print(f"✅ Catalog: {len(entries)} templates in {len(categories)} categories, "
+          f"{len(stale)} file{'s' if len(stale) != 1 else ''} updated")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Production build of the Vercel deployment into dist/.
+
+Every file under assets/ is copied to a content-hashed name
+(Header.png → Header.3f2a9c01be.png) and the references to it in index.html,
+emails/** and download-pages/** (including the escaped code in the download
+pages) are rewritten to the hashed name. The original names are kept as well
+so emails that were already sent keep loading their images. Text files get
+.gz and, when the brotli module is installed, .br siblings, and a generated
+dist/vercel.json marks hashed assets as immutable. The output directory is
+replaced on every build, so only an empty directory or an earlier build is
+accepted as --out.
+
+Usage:
+    python build_dist.py                  # writes dist/
+    python build_dist.py --out public
+    vercel deploy dist --prod             # dist/vercel.json applies to that deployment
+"""
+
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Base URL for the Vercel deployment
+BASE_URL = "https://zomo-emails.vercel.app"
+
+default_out_dir = "dist"
+assets_dir = "assets"
+
+# Written into every build; only a directory holding it (or an empty one) is ever replaced
+BUILD_MARKER = ".build-dist"
+
+# Directories whose files are copied into the build, so the build cannot live inside them
+SOURCE_DIRS = ["assets", "emails", "download-pages", "code-pages"]
+
+PAGE_PATTERNS = ["index.html", "coming-soon.html", "emails/**/*.html",
+                 "download-pages/**/*.html", "code-pages/**/*.html"]
+
+# Names produced by optimize_images.py / rasterize_icons.py are already content-hashed
+HASHED_NAME_PATTERN = re.compile(r'\.[0-9a-f]{10}\.[A-Za-z0-9]+$')
+HASH_LENGTH = 10
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".svg", ".json", ".txt", ".xml")
+
+# An assets/ reference: absolute on the deployment, root-relative or relative to the page.
+# Paths stop at quotes, whitespace, brackets and "&" (the escaped quote in download pages).
+ASSET_REF_PATTERN = re.compile(
+    r'(?<![\w./-])(?P<prefix>' + re.escape(BASE_URL) + r'/|/|(?:\.\./)+|\./)?'
+    r'(?P<path>assets/[^"\'()\s&<>?#]+)'
+)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+# Original asset names may be referenced by emails already in inboxes; let the CDN keep them a while
+UNHASHED_ASSET = "public, max-age=3600, stale-while-revalidate=86400"
+
+def find_pages():
+    pages = set()
+    for pattern in PAGE_PATTERNS:
+        pages.update(glob.glob(pattern, recursive=True))
+    return sorted(p for p in pages if not p.endswith(".min.html"))
+
+def find_assets():
+    assets = []
+    for directory, subdirs, files in os.walk(assets_dir):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith("."))
+        assets.extend(os.path.join(directory, f) for f in sorted(files) if not f.startswith("."))
+    return assets
+
+def hashed_name(path, data):
+    """
+    Return the content-hashed name of an asset (unchanged if already hashed)
+    """
+    if HASHED_NAME_PATTERN.search(path):
+        return path
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}"
+
+def to_url_path(path):
+    return path.replace(os.sep, "/")
+
+def rewrite_references(content, page_path, asset_map):
+    """
+    Point every assets/ reference in a page at the hashed file.
+    Returns (content, number of references rewritten).
+    """
+    page_dir = os.path.dirname(page_path)
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        prefix, path = match.group("prefix") or "", match.group("path")
+        if prefix in (BASE_URL + "/", "/"):
+            resolved = path
+        else:
+            resolved = to_url_path(os.path.normpath(os.path.join(page_dir, prefix + path)))
+
+        hashed = asset_map.get(resolved)
+        if hashed is None:
+            return match.group(0)
+
+        count += 1
+        # Keep the reference style; only the file name part changes
+        return prefix + path[:len(path) - len(os.path.basename(path))] + os.path.basename(hashed)
+
+    return ASSET_REF_PATTERN.sub(replace, content), count
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def compress(path):
+    """
+    Write .gz (and .br) siblings of a text file. Returns the bytes written.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = 0
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    write_file(path + ".gz", compressed)
+    written += len(compressed)
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        write_file(path + ".br", compressed)
+        written += len(compressed)
+    return written
+
+def header_config(hashed_paths):
+    """
+    Vercel header rules: hashed assets are immutable, pages always revalidate.
+    When several rules set the same header the last match wins, so the
+    hashed-asset rule comes after the general assets rule.
+    """
+    hashed_extensions = sorted({os.path.splitext(p)[1].lstrip(".").lower() for p in hashed_paths})
+    return {
+        "headers": [
+            {
+                "source": "/assets/(.*)",
+                "headers": [{"key": "Cache-Control", "value": UNHASHED_ASSET}],
+            },
+            {
+                "source": r"/assets/(.*)\.([0-9a-f]{%d})\.(%s)" % (HASH_LENGTH, "|".join(hashed_extensions)),
+                "headers": [{"key": "Cache-Control", "value": IMMUTABLE}],
+            },
+            {
+                "source": "/(.*)\\.html",
+                "headers": [{"key": "Cache-Control", "value": REVALIDATE}],
+            },
+        ]
+    }
+
+def check_out_dir(out_dir):
+    """
+    Raise ValueError unless out_dir can be deleted and rebuilt: it must not
+    hold or sit inside the sources, and an existing directory must be empty
+    or an earlier build (it has the BUILD_MARKER file)
+    """
+    root = os.path.realpath(".")
+    target = os.path.realpath(out_dir)
+    if target == root or root.startswith(target + os.sep):
+        raise ValueError(f"Refusing to replace {out_dir}: it contains the sources")
+    for source in SOURCE_DIRS:
+        source = os.path.realpath(source)
+        if target == source or target.startswith(source + os.sep):
+            raise ValueError(f"Refusing to build into {out_dir}: it is inside the sources")
+    if os.path.exists(out_dir):
+        if not os.path.isdir(out_dir):
+            raise ValueError(f"Refusing to replace {out_dir}: it is not a directory")
+        if os.listdir(out_dir) and not os.path.isfile(os.path.join(out_dir, BUILD_MARKER)):
+            raise ValueError(f"Refusing to replace {out_dir}: it was not written by build_dist.py "
+                             f"(no {BUILD_MARKER}); delete it or choose another --out")
+
+def build(out_dir):
+    """
+    Build the whole dist tree. Returns a stats dict.
+    """
+    check_out_dir(out_dir)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    with open(os.path.join(out_dir, BUILD_MARKER), 'w', encoding='utf-8') as f:
+        f.write("Written by build_dist.py; this directory is deleted on every build\n")
+
+    asset_map = {}
+    for asset_path in find_assets():
+        with open(asset_path, 'rb') as f:
+            data = f.read()
+        hashed = hashed_name(asset_path, data)
+        asset_map[to_url_path(asset_path)] = to_url_path(hashed)
+        write_file(os.path.join(out_dir, asset_path), data)
+        if hashed != asset_path:
+            write_file(os.path.join(out_dir, hashed), data)
+
+    references = 0
+    pages = find_pages()
+    for page_path in pages:
+        with open(page_path, 'r', encoding='utf-8', newline='') as f:
+            content = f.read()
+        content, count = rewrite_references(content, page_path, asset_map)
+        references += count
+        write_file(os.path.join(out_dir, page_path), content.encode('utf-8'))
+
+    with open(os.path.join(out_dir, "asset-manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(asset_map, f, indent=1, sort_keys=True)
+    with open(os.path.join(out_dir, "vercel.json"), 'w', encoding='utf-8') as f:
+        json.dump(header_config(asset_map.values()), f, indent=2)
+
+    compressible = [os.path.join(directory, name)
+                    for directory, _, files in os.walk(out_dir) for name in files
+                    if name.lower().endswith(COMPRESSIBLE_EXTENSIONS)]
+    with ThreadPoolExecutor() as executor:
+        compressed_bytes = sum(executor.map(compress, compressible))
+
+    return {
+        "assets": len(asset_map),
+        "pages": len(pages),
+        "references": references,
+        "compressed": len(compressible),
+        "compressed_bytes": compressed_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the fingerprinted, precompressed deployment tree")
+    parser.add_argument("--out", default=default_out_dir, help=f"output directory (default: {default_out_dir})")
+    args = parser.parse_args()
+
+    print(f"📦 Building {args.out}/ ...")
+    try:
+        stats = build(args.out)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    formats = "gzip + brotli" if brotli is not None else "gzip (pip install brotli for .br)"
+    print(f"✅ {stats['assets']} assets fingerprinted, {stats['references']} references rewritten "
+          f"in {stats['pages']} pages")
+    print(f"✅ {stats['compressed']} text files precompressed ({formats})")
+    print(f"✅ Wrote {args.out}/vercel.json (hashed assets cached as immutable)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Self-host a subset of the Epilogue font for the gallery, download and code pages.
+
+The pages load Epilogue from Google Fonts in five weights, and most of them
+also load the whole Material Icons font: render-blocking requests to a third
+party on every page view. This stage scans the pages for the font weights
+their CSS and markup use and the characters they show, cuts Epilogue down to
+those weights and glyphs and writes WOFF2 files to assets/fonts/. A variable
+source font becomes one file covering the used weight range; static sources
+(one file per weight) become one file per weight in use. Printable ASCII is
+always kept so text set by scripts renders too.
+
+Each page's Google Fonts stylesheet link is then replaced by a preload of the
+font and its @font-face rules. The Material Icons stylesheet is dropped from
+pages with no material-icons element left, and the preconnects go once
+nothing on a page loads from Google any more. The email templates keep their
+Google Fonts links: mail clients load fonts from there, not from this site.
+
+Run it after build_catalog.py, and run generate_download_pages.py afterwards:
+the newsletters listing has a download page of its own. Download pages are
+rewritten in place like their shell, code-pages/template.html, so regenerating
+them keeps the self-hosted font. Subsetting needs fontTools and brotli
+(pip install fonttools brotli); --dry-run needs neither. The Epilogue variable
+font is downloaded once into .cache/fonts/ unless --source is given.
+
+Usage:
+    python build_fonts.py                     # subset, write assets/fonts/ and rewrite the pages
+    python build_fonts.py --dry-run           # weights, glyphs and the pages that would change
+    python build_fonts.py --source Epilogue-Regular.ttf --source Epilogue-Bold.ttf
+"""
+
+import io
+import os
+import re
+import sys
+import glob
+import html
+import hashlib
+import argparse
+import urllib.request
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    from fontTools.varLib import instancer
+except ImportError:
+    subset = None
+
+import html_tokens
+
+# The Epilogue variable font (wght 100-900) from the Google Fonts repository
+SOURCE_URL = "https://github.com/google/fonts/raw/main/ofl/epilogue/Epilogue%5Bwght%5D.ttf"
+
+cache_dir = ".cache/fonts"
+fonts_dir = "assets/fonts"
+
+PAGE_PATTERNS = ["index.html", "coming-soon.html", "emails/*/index.html", "emails/*/templates.html",
+                 "code-pages/*.html", "download-pages/*.html"]
+
+FAMILY = "Epilogue"
+
+# Kept in every subset: text inserted by the pages' scripts is not in the markup
+ALWAYS_KEPT = set(range(0x20, 0x7f))
+
+# Rendered bold by default
+BOLD_TAGS = {"b", "strong", "th", "h1", "h2", "h3", "h4", "h5", "h6"}
+KEYWORD_WEIGHTS = {"normal": 400, "bold": 700}
+
+# Attributes whose values are shown in the page font
+TEXT_ATTRIBUTES = ("alt", "title", "placeholder", "aria-label", "value")
+
+# The download pages show the escaped email source in a monospace font
+CODE_BLOCK_ID = "code-content"
+
+WEIGHT_PATTERN = re.compile(r'font-weight\s*:\s*([^;}"]+)', re.I)
+FONT_SHORTHAND_PATTERN = re.compile(r'(?<![\w-])font\s*:\s*([^;}"]+)', re.I)
+
+# Only unescaped tags match, never the escaped code shown in the download pages
+GOOGLE_FONT_LINK_PATTERN = re.compile(
+    r'<link\b[^>]*href="https://fonts\.googleapis\.com/css2?\?family=Epilogue[^"]*"[^>]*>')
+SELF_HOSTED_PATTERN = re.compile(
+    r'<link rel="preload" href="[^"]*assets/fonts/epilogue[^"]*\.woff2"[^>]*>\s*<style>(?:@font-face \{[^}]*\}\s*)+</style>')
+MATERIAL_ICONS_LINK_PATTERN = re.compile(
+    r'(?:<!-- Google Material Icons -->\s*)?<link\b[^>]*href="https://fonts\.googleapis\.com/icon\?family=Material\+Icons"[^>]*>')
+GOOGLE_LINK_PATTERN = re.compile(r'<link\b[^>]*href="https://fonts\.googleapis\.com/')
+PRECONNECT_PATTERN = re.compile(
+    r'<link\b[^>]*rel="preconnect"[^>]*href="https://fonts\.(?:googleapis|gstatic)\.com"[^>]*>')
+FONT_FILE_PATTERN = re.compile(r'^epilogue(?:-\d+)?\.[0-9a-f]{10}\.woff2$')
+
+def find_pages():
+    pages = set()
+    for pattern in PAGE_PATTERNS:
+        pages.update(glob.glob(pattern))
+    return sorted(p for p in pages if not p.endswith(".min.html"))
+
+# --- Scanning ---------------------------------------------------------------------
+
+def parse_weight(value):
+    """
+    Return the numeric weight of a font-weight value, or None for relative ones
+    """
+    value = value.replace("!important", "").strip().lower()
+    if value in KEYWORD_WEIGHTS:
+        return KEYWORD_WEIGHTS[value]
+    if re.fullmatch(r'[1-9]00', value):
+        return int(value)
+    return None
+
+def css_weights(css):
+    weights = set()
+    for match in WEIGHT_PATTERN.finditer(css):
+        weight = parse_weight(match.group(1))
+        if weight is not None:
+            weights.add(weight)
+    for match in FONT_SHORTHAND_PATTERN.finditer(css):
+        # The weight comes before the size in the shorthand
+        for part in match.group(1).split():
+            weight = parse_weight(part)
+            if weight is not None:
+                weights.add(weight)
+                break
+    return weights
+
+class PageUsage:
+    """
+    The weights and characters a page uses, and whether it has Material Icons elements
+    """
+
+    def __init__(self, content):
+        self.weights = {400}
+        self.codepoints = set()
+        self.material_icons = False
+
+        raw_parent = None
+        in_code = False
+        for token in html_tokens.tokenize(content):
+            if token.kind == "start":
+                raw_parent = token.name
+                if token.name == "pre" and token.get("id") == CODE_BLOCK_ID:
+                    in_code = True
+                if token.name in BOLD_TAGS:
+                    self.weights.add(700)
+                if "material-icons" in token.classes():
+                    self.material_icons = True
+                self.weights.update(css_weights(token.get("style") or ""))
+                for name in TEXT_ATTRIBUTES:
+                    self.add_text(token.get(name) or "")
+            elif token.kind == "end" and token.name == "pre":
+                in_code = False
+            elif token.kind == "raw" and raw_parent == "style":
+                self.weights.update(css_weights(token.text))
+            elif token.kind == "text" and not in_code:
+                self.add_text(html.unescape(token.text))
+
+    def add_text(self, text):
+        self.codepoints.update(ord(c) for c in text if c not in "\t\n\r\f")
+
+# --- Subsetting ---------------------------------------------------------------------
+
+def fetch_source():
+    """
+    Return the path of the cached Epilogue variable font, downloading it once
+    """
+    path = os.path.join(cache_dir, "Epilogue[wght].ttf")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        print(f"📥 Downloading {SOURCE_URL}")
+        with urllib.request.urlopen(SOURCE_URL, timeout=30) as response:
+            data = response.read()
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    return path
+
+def weight_axis(font):
+    if "fvar" not in font:
+        return None
+    return next((axis for axis in font["fvar"].axes if axis.axisTag == "wght"), None)
+
+def to_woff2(font, codepoints):
+    options = subset.Options()
+    options.flavor = "woff2"
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    font.flavor = "woff2"
+    buffer = io.BytesIO()
+    font.save(buffer)
+    return buffer.getvalue()
+
+def build_faces(sources, weights, codepoints):
+    """
+    Return [(file name stem, CSS font-weight, WOFF2 bytes)] for the used weights.
+    A variable source is limited to the used weight range; static sources are
+    picked by their nearest weight.
+    """
+    fonts = [TTFont(path) for path in sources]
+    for path, font in zip(sources, fonts):
+        axis = weight_axis(font)
+        if axis is not None:
+            low = max(axis.minValue, min(weights))
+            high = min(axis.maxValue, max(weights))
+            font = instancer.instantiateVariableFont(font, {"wght": low if low == high else (low, high)})
+            weight = f"{low:g}" if low == high else f"{low:g} {high:g}"
+            return [("epilogue", weight, to_woff2(font, codepoints))]
+
+    static = {font["OS/2"].usWeightClass: font for font in fonts}
+    needed = sorted({min(static, key=lambda w: (abs(w - used), w)) for used in weights})
+    return [(f"epilogue-{w}", str(w), to_woff2(static[w], codepoints)) for w in needed]
+
+def write_faces(faces):
+    """
+    Write the faces under content-hashed names and remove the ones they replace.
+    Returns [(path, CSS font-weight)].
+    """
+    os.makedirs(fonts_dir, exist_ok=True)
+    written = []
+    for stem, weight, data in faces:
+        path = os.path.join(fonts_dir, f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}.woff2")
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        written.append((path, weight))
+
+    keep = {os.path.basename(path) for path, _ in written}
+    for name in os.listdir(fonts_dir):
+        if FONT_FILE_PATTERN.match(name) and name not in keep:
+            os.remove(os.path.join(fonts_dir, name))
+    return written
+
+# --- Pages --------------------------------------------------------------------------
+
+def font_url(font_path, page_path):
+    return os.path.relpath(font_path, os.path.dirname(page_path) or ".").replace(os.sep, "/")
+
+def font_block(faces, page_path):
+    """
+    Return (preload link, style element) for the self-hosted faces
+    """
+    # Preload the face regular text uses; the others load when needed
+    regular = min(faces, key=lambda face: abs(int(face[1].split()[0]) - 400))
+    preload = (f'<link rel="preload" href="{font_url(regular[0], page_path)}" '
+               f'as="font" type="font/woff2" crossorigin>')
+    rules = " ".join(
+        f"@font-face {{ font-family: '{FAMILY}'; font-style: normal; font-weight: {weight}; "
+        f"font-display: swap; src: url('{font_url(path, page_path)}') format('woff2'); }}"
+        for path, weight in faces)
+    return preload, f"<style>{rules}</style>"
+
+def line_indent(content, start):
+    """
+    Return the indentation of the line a match starts on, or None when other
+    markup precedes it on that line
+    """
+    line_start = content.rfind("\n", 0, start) + 1
+    prefix = content[line_start:start]
+    return prefix if not prefix.strip() else None
+
+def remove_tag(content, match):
+    """
+    Remove a matched tag with the line it stands on, or with the space before
+    it when it shares the line
+    """
+    start, end = match.start(), match.end()
+    if line_indent(content, start) is not None and content[end:end + 1] in ("\n", ""):
+        return content[:content.rfind("\n", 0, start) + 1] + content[end + 1:]
+    if content[start - 1:start] == " ":
+        start -= 1
+    return content[:start] + content[end:]
+
+def rewrite_page(content, usage, faces, page_path):
+    match = GOOGLE_FONT_LINK_PATTERN.search(content) or SELF_HOSTED_PATTERN.search(content)
+    if match is not None:
+        indent = line_indent(content, match.start())
+        preload, style = font_block(faces, page_path)
+        joiner = " " if indent is None else "\n" + indent
+        content = content[:match.start()] + preload + joiner + style + content[match.end():]
+
+    if not usage.material_icons:
+        match = MATERIAL_ICONS_LINK_PATTERN.search(content)
+        if match is not None:
+            content = remove_tag(content, match)
+
+    if not GOOGLE_LINK_PATTERN.search(content):
+        while True:
+            match = PRECONNECT_PATTERN.search(content)
+            if match is None:
+                break
+            content = remove_tag(content, match)
+    return content
+
+def loads_google_fonts(content, usage):
+    """
+    Whether a page still has a Google Fonts request this stage would remove
+    """
+    if GOOGLE_FONT_LINK_PATTERN.search(content):
+        return True
+    if not usage.material_icons and MATERIAL_ICONS_LINK_PATTERN.search(content):
+        return True
+    return bool(PRECONNECT_PATTERN.search(content)) and not GOOGLE_LINK_PATTERN.search(content)
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-host a subset of the Epilogue font for the site pages")
+    parser.add_argument("--source", action="append",
+                        help="Epilogue variable font, or static fonts one per weight (default: download)")
+    parser.add_argument("--dry-run", action="store_true", help="report without subsetting or writing")
+    args = parser.parse_args()
+
+    pages = {}
+    for path in find_pages():
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            content = f.read()
+        pages[path] = (content, PageUsage(content))
+
+    weights = set().union(*(usage.weights for _, usage in pages.values()))
+    codepoints = ALWAYS_KEPT.union(*(usage.codepoints for _, usage in pages.values()))
+    icon_pages = sum(usage.material_icons for _, usage in pages.values())
+    print(f"🔍 {len(pages)} pages use weights {', '.join(map(str, sorted(weights)))} "
+          f"and {len(codepoints)} characters")
+    print(f"ℹ️  {icon_pages} pages still have material-icons elements and keep that font")
+
+    if args.dry_run:
+        changed = [path for path, (content, usage) in pages.items() if loads_google_fonts(content, usage)]
+        for path in changed:
+            print(f"   would rewrite {path}")
+        print(f"✅ Dry run: {len(changed)} pages would change")
+        return 0
+
+    if subset is None:
+        print("❌ Subsetting needs fontTools and brotli: pip install fonttools brotli")
+        return 1
+
+    try:
+        sources = args.source or [fetch_source()]
+        faces = write_faces(build_faces(sources, weights, codepoints))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    for path, weight in faces:
+        print(f"📦 {path}: weight {weight}, {os.path.getsize(path) / 1024:.1f} KB")
+
+    changed = 0
+    for path, (content, usage) in pages.items():
+        new_content = rewrite_page(content, usage, faces, path)
+        if new_content != content:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(new_content)
+            changed += 1
+    print("=" * 50)
+    print(f"✅ Rewrote {changed} of {len(pages)} pages")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
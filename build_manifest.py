@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Persistent build manifest for incremental template processing.
+
+The manifest records, per file, the stat signature and content hash of the
+file as it was last written, plus the fingerprints of the passes that were
+applied. A file whose signature and pass fingerprints are unchanged can be
+skipped without being read; a pass fingerprint changes whenever the pass
+version, the source of the module that defines it or of a project module it
+imports (html_tokens, css_parser ...), or its icon_mapping changes.
+
+The manifest is split into sections so that other build stages can keep
+their own records in the same file.
+"""
+
+import os
+import sys
+import json
+import types
+import hashlib
+import inspect
+
+# Default location of the manifest, relative to the project root
+MANIFEST_PATH = ".build-manifest.json"
+MANIFEST_VERSION = 1
+
+# Modules loaded from this directory are project code; everything else is a dependency
+project_dir = os.path.dirname(os.path.abspath(__file__))
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Load the manifest, returning an empty one if it is missing, unreadable or
+    was written by an incompatible version
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "sections": {}}
+
+    if manifest.get("version") != MANIFEST_VERSION or "sections" not in manifest:
+        return {"version": MANIFEST_VERSION, "sections": {}}
+
+    return manifest
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """
+    Write the manifest atomically so an interrupted run never leaves it corrupt
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def get_section(manifest, name):
+    """
+    Return the named section of the manifest, creating it if needed
+    """
+    return manifest["sections"].setdefault(name, {})
+
+def content_hash(data):
+    """
+    Return the SHA-256 hex digest of a str or bytes value
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(file_path):
+    """
+    Return the SHA-256 hex digest of a file's bytes
+    """
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_signature(file_path):
+    """
+    Return the cheap stat signature (size, mtime in ns) of a file, or None if
+    it does not exist
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def is_project_module(module):
+    path = getattr(module, "__file__", None)
+    if not path:
+        return False
+    path = os.path.abspath(path)
+    return path.startswith(project_dir + os.sep) and "site-packages" not in path
+
+def project_imports(module):
+    """
+    Return the project modules a module uses, directly or through other
+    project modules, sorted by name (the module itself excluded)
+    """
+    found = {}
+    pending = [module]
+    while pending:
+        current = pending.pop()
+        for value in list(vars(current).values()):
+            if isinstance(value, types.ModuleType):
+                used = value
+            else:
+                # Names pulled in with "from helper import name"
+                used = sys.modules.get(getattr(value, "__module__", None) or "")
+            if (used is not None and used is not module and used.__name__ not in found
+                    and is_project_module(used)):
+                found[used.__name__] = used
+                pending.append(used)
+    return [found[name] for name in sorted(found)]
+
+def pass_fingerprint(transform, version="1"):
+    """
+    Fingerprint a pass from its version, the source of the module that defines
+    the transform and of the project modules it imports, and that module's
+    icon_mapping (which may be changed at runtime without touching the source)
+    """
+    module = inspect.getmodule(transform)
+    h = hashlib.sha256()
+    h.update(str(version).encode('utf-8'))
+    h.update(transform.__qualname__.encode('utf-8'))
+
+    try:
+        h.update(inspect.getsource(module).encode('utf-8'))
+    except (OSError, TypeError):
+        h.update(inspect.getsource(transform).encode('utf-8'))
+
+    if module is not None:
+        for helper in project_imports(module):
+            h.update(helper.__name__.encode('utf-8'))
+            try:
+                h.update(inspect.getsource(helper).encode('utf-8'))
+            except (OSError, TypeError):
+                pass
+
+    icon_mapping = getattr(module, "icon_mapping", None)
+    if icon_mapping is not None:
+        h.update(json.dumps(icon_mapping, sort_keys=True).encode('utf-8'))
+
+    return h.hexdigest()[:16]
+
+def is_up_to_date(entry, file_path, fingerprints):
+    """
+    Decide whether a file can be skipped.
+    Returns (up_to_date, refreshed_entry). The stat signature is checked first
+    so unchanged files are never read; if only the stat changed (e.g. a touch
+    or a checkout) the content hash is compared and the entry refreshed.
+    """
+    if not entry or entry.get("passes") != fingerprints:
+        return False, None
+
+    signature = file_signature(file_path)
+    if signature is None:
+        return False, None
+
+    if entry.get("signature") == signature:
+        return True, entry
+
+    if file_hash(file_path) == entry.get("sha256"):
+        return True, dict(entry, signature=signature)
+
+    return False, None
+
+def make_entry(file_path, sha256, fingerprints):
+    """
+    Build a manifest entry for a file that has just been processed
+    """
+    return {
+        "signature": file_signature(file_path),
+        "sha256": sha256,
+        "passes": fingerprints,
+    }
+
+def prune_section(section, keep_paths):
+    """
+    Drop entries for files that no longer take part in the build
+    """
+    for path in list(section):
+        if path not in keep_paths:
+            del section[path]
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Assemble complete MIME messages (.eml) from a template and a recipient list.
+
+Each message is multipart/alternative with a plain-text part generated from
+the HTML and the HTML part itself, with the preview toolbar and scripts
+removed. With --embed-images the images the template shows from
+assets/images are attached once per message as CID parts
+(multipart/related) and the img tags point at them.
+
+Everything that is the same for every recipient is encoded once per batch:
+the MIME part headers, the base64 image parts, and the quoted-printable
+text of every line of the HTML and plain-text bodies that has no merge tag.
+Quoted-printable works line by line, so a personalized message only encodes
+its own merge-tag lines and joins the rest. Recipients are streamed
+(render_merge_tags.iter_recipients) and each message is written before the
+next is built, so memory stays bounded whatever the batch size.
+
+Usage:
+    python build_messages.py emails/transactional/password-reset.html recipients.csv \\
+        --from "ZOMO Health <no-reply@example.com>" --out build/eml
+    python build_messages.py template.html recipients.jsonl --from ... --archive build/eml.tar --embed-images
+"""
+
+import os
+import re
+import sys
+import html
+import json
+import time
+import uuid
+import base64
+import binascii
+import argparse
+import mimetypes
+from email.header import Header
+from email.utils import formataddr, formatdate
+from html.parser import HTMLParser
+
+import html_tokens
+import email_files
+import render_merge_tags
+
+CRLF = b"\r\n"
+
+# Images under this directory can be embedded
+EMBEDDABLE_DIR = os.path.join("assets", "images")
+
+# "=_" never occurs in quoted-printable or base64 output, so the boundary cannot collide with content
+BOUNDARY_PREFIX = "=_zomo_"
+
+TITLE_PATTERN = re.compile(r'<title\b[^>]*>(.*?)</title>', re.S | re.I)
+
+# --- Plain text ----------------------------------------------------------------
+
+# Line breaks requested around elements; adjacent requests merge into the larger one
+LINE_BREAK = 1
+PARAGRAPH_BREAK = 2
+LINE_TAGS = {"div", "tr", "li", "center", "section", "header", "footer"}
+PARAGRAPH_TAGS = {"p", "table", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "blockquote", "hr"}
+SKIP_TAGS = {"head", "style", "script", "title", "button"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+             "param", "source", "track", "wbr"}
+HIDDEN_STYLE_PATTERN = re.compile(r'display\s*:\s*none', re.I)
+
+class _TextExtractor(HTMLParser):
+    """
+    Collect the readable text of an email: block elements become line
+    breaks, links are followed by their URL, hidden elements and icon
+    ligatures are skipped
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self.stack = []
+        self.skipping = 0
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in VOID_TAGS:
+            if not self.skipping and tag in ("br", "hr"):
+                self.pieces.append(LINE_BREAK if tag == "br" else PARAGRAPH_BREAK)
+            return
+        hidden = (tag in SKIP_TAGS or HIDDEN_STYLE_PATTERN.search(attrs.get("style") or "")
+                  or "material-icons" in (attrs.get("class") or "").split())
+        self.stack.append((tag, bool(hidden)))
+        if hidden:
+            self.skipping += 1
+        elif not self.skipping:
+            self.open_element(tag, attrs)
+
+    def handle_endtag(self, tag):
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] != tag:
+                continue
+            for closed, hidden in reversed(self.stack[depth:]):
+                if hidden:
+                    self.skipping -= 1
+                elif not self.skipping:
+                    self.close_element(closed)
+            del self.stack[depth:]
+            return
+
+    def open_element(self, tag, attrs):
+        if tag in PARAGRAPH_TAGS:
+            self.pieces.append(PARAGRAPH_BREAK)
+        elif tag in LINE_TAGS:
+            self.pieces.append(LINE_BREAK)
+        if tag == "li":
+            self.pieces.append("- ")
+        elif tag == "a":
+            self.links.append((attrs.get("href") or "", len(self.pieces)))
+
+    def close_element(self, tag):
+        if tag == "a" and self.links:
+            href, start = self.links.pop()
+            text = "".join(p for p in self.pieces[start:] if isinstance(p, str)).strip()
+            if href and not href.startswith(("#", "javascript:")) and href != text:
+                if self.pieces and isinstance(self.pieces[-1], str):
+                    self.pieces[-1] = self.pieces[-1].rstrip()
+                self.pieces.append(f" ({href})")
+        elif tag in PARAGRAPH_TAGS:
+            self.pieces.append(PARAGRAPH_BREAK)
+        elif tag in LINE_TAGS:
+            self.pieces.append(LINE_BREAK)
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.pieces.append(re.sub(r'\s+', " ", data))
+
+def html_to_text(content):
+    """
+    Plain-text version of an email. Merge tags are kept.
+    """
+    extractor = _TextExtractor()
+    extractor.feed(content)
+    extractor.close()
+
+    out = []
+    pending = 0
+    for piece in extractor.pieces:
+        if not isinstance(piece, str):
+            pending = max(pending, piece)
+        elif piece.strip():
+            if pending and out:
+                out.append("\n" * pending)
+            out.append(piece)
+            pending = 0
+        elif not pending:
+            out.append(piece)
+    return "\n".join(line.strip() for line in "".join(out).split("\n")).strip() + "\n"
+
+# --- Sendable HTML -------------------------------------------------------------
+
+def embed_images(content, template_path):
+    """
+    Point the img tags that show images from assets/images at CID parts.
+    Returns (content, {path: content id}).
+    """
+    content_ids = {}
+
+    def point_at_cid(tag):
+        src = tag.get("src")
+        path = email_files.resolve_image(src, template_path) if src else None
+        if path is None or not path.startswith(EMBEDDABLE_DIR + os.sep) or not os.path.isfile(path):
+            return
+        if path not in content_ids:
+            name = re.sub(r'[^A-Za-z0-9._-]+', '_', os.path.basename(path))
+            content_ids[path] = f"{len(content_ids) + 1}.{name}@zomo"
+        tag.set("src", f"cid:{content_ids[path]}")
+        # The 2x variants are not embedded
+        tag.remove("srcset")
+
+    return html_tokens.rewrite_tags(content, point_at_cid, {"img"}), content_ids
+
+# --- Encoding -------------------------------------------------------------------
+
+def encode_qp(data):
+    """
+    Quoted-printable encode UTF-8 text with "\\n" line ends into CRLF lines
+    """
+    return binascii.b2a_qp(data, istext=True).replace(b"\n", CRLF)
+
+def compile_body(text):
+    """
+    Split a body into pre-encoded runs of static lines and the compiled
+    merge-tag lines that are encoded per message
+    """
+    segments = []
+    static = []
+    for line in text.replace("\r\n", "\n").splitlines(keepends=True):
+        if render_merge_tags.MERGE_TAG_PATTERN.search(line):
+            if static:
+                segments.append(encode_qp("".join(static).encode('utf-8')))
+                static = []
+            segments.append(render_merge_tags.compile_merge_text(line))
+        else:
+            static.append(line)
+    if static:
+        segments.append(encode_qp("".join(static).encode('utf-8')))
+    return segments
+
+def render_body(segments, values, keep_missing, escape):
+    parts = []
+    for segment in segments:
+        if isinstance(segment, bytes):
+            parts.append(segment)
+        else:
+            parts.append(encode_qp(render_merge_tags.render_message(segment, values, keep_missing, escape)))
+    return parts
+
+def single_line(value):
+    """
+    Fold CR/LF runs into spaces so a recipient value cannot start a new header
+    """
+    return re.sub(r'[\r\n]+', " ", str(value)).strip()
+
+def header_value(value):
+    """
+    A header value on one line, RFC 2047-encoded when it is not ASCII
+    """
+    value = single_line(value)
+    return value if value.isascii() else Header(value, 'utf-8').encode()
+
+def address_header(value):
+    name, _, address = str(value).rpartition("<")
+    if not address.endswith(">"):
+        return header_value(value)
+    return formataddr((re.sub(r'[\r\n"]+', " ", name).strip(), address[:-1].strip()))
+
+def mime_headers(headers):
+    return b"".join(f"{name}: {value}".encode('ascii') + CRLF for name, value in headers)
+
+def image_part(path, content_id, boundary):
+    """
+    A complete base64 image part, boundary line included
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    name = os.path.basename(path)
+    return (f"--{boundary}".encode('ascii') + CRLF + mime_headers([
+        ("Content-Type", f'{content_type}; name="{name}"'),
+        ("Content-Transfer-Encoding", "base64"),
+        ("Content-ID", f"<{content_id}>"),
+        ("Content-Disposition", f'inline; filename="{name}"'),
+    ]) + CRLF + base64.encodebytes(data).replace(b"\n", CRLF))
+
+def compile_messages(template_path, sender, subject=None, embed=False):
+    """
+    Prepare everything the messages of a batch share
+    """
+    with open(template_path, 'r', encoding='utf-8') as f:
+        content = email_files.strip_preview_chrome(f.read())
+
+    if subject is None:
+        title = TITLE_PATTERN.search(content)
+        subject = html.unescape(title.group(1)).strip() if title else os.path.basename(template_path)
+
+    content_ids = {}
+    if embed:
+        content, content_ids = embed_images(content, template_path)
+
+    token = uuid.uuid4().hex
+    alternative = f"{BOUNDARY_PREFIX}alt_{token}"
+    related = f"{BOUNDARY_PREFIX}rel_{token}"
+
+    def part_header(boundary, content_type):
+        return (f"--{boundary}".encode('ascii') + CRLF + mime_headers([
+            ("Content-Type", content_type),
+            ("Content-Transfer-Encoding", "quoted-printable"),
+        ]) + CRLF)
+
+    text_open = part_header(alternative, "text/plain; charset=utf-8")
+    if content_ids:
+        html_open = (f"--{alternative}".encode('ascii') + CRLF +
+                     mime_headers([("Content-Type", f'multipart/related; boundary="{related}"')]) + CRLF +
+                     part_header(related, "text/html; charset=utf-8"))
+        html_close = (CRLF + b"".join(image_part(path, cid, related) for path, cid in content_ids.items()) +
+                      f"--{related}--".encode('ascii') + CRLF)
+    else:
+        html_open = part_header(alternative, "text/html; charset=utf-8")
+        html_close = b""
+
+    return {
+        "path": template_path,
+        "sender": address_header(sender),
+        "subject": render_merge_tags.compile_merge_text(subject),
+        "text": compile_body(html_to_text(content)),
+        "html": compile_body(content),
+        "tags": render_merge_tags.compile_merge_text(content)["tags"],
+        "images": list(content_ids),
+        "date": formatdate(localtime=True),
+        "id_prefix": token,
+        "domain": sender.rpartition("@")[2].strip(" >") or "localhost",
+        "content_type": f'multipart/alternative; boundary="{alternative}"',
+        "text_open": text_open,
+        "html_open": CRLF + html_open,
+        "close": html_close + CRLF + f"--{alternative}--".encode('ascii') + CRLF,
+    }
+
+def render_mime(compiled, values, index, keep_missing=True):
+    """
+    Build one message as bytes with CRLF line ends
+    """
+    subject = render_merge_tags.render_message(compiled["subject"], values, keep_missing, escape=False)
+    recipient = single_line(values.get("EMAIL") or "")
+    name = single_line(" ".join(str(values[k]) for k in ("FNAME", "LNAME") if values.get(k)))
+    headers = [
+        ("From", compiled["sender"]),
+        ("To", formataddr((name, recipient))),
+        ("Subject", header_value(subject.decode('utf-8'))),
+        ("Date", compiled["date"]),
+        ("Message-ID", f"<{compiled['id_prefix']}.{index}@{compiled['domain']}>"),
+        ("MIME-Version", "1.0"),
+    ]
+    if values.get("UNSUB"):
+        headers.append(("List-Unsubscribe", f"<{header_value(values['UNSUB'])}>"))
+    headers.append(("Content-Type", compiled["content_type"]))
+
+    parts = [mime_headers(headers), CRLF, compiled["text_open"]]
+    parts.extend(render_body(compiled["text"], values, keep_missing, escape=False))
+    parts.append(compiled["html_open"])
+    parts.extend(render_body(compiled["html"], values, keep_missing, escape=True))
+    parts.append(compiled["close"])
+    return b"".join(parts)
+
+def iter_messages(compiled, recipients_path, defaults=None, keep_missing=True):
+    """
+    Yield (index, recipient record, message bytes) for every recipient
+    """
+    defaults = render_merge_tags.normalize_keys(defaults or {})
+    for index, record in enumerate(render_merge_tags.iter_recipients(recipients_path)):
+        values = dict(defaults)
+        values.update({k: v for k, v in record.items() if v not in (None, "")})
+        yield index, record, render_mime(compiled, values, index, keep_missing)
+
+def build_batch(compiled, recipients_path, write, defaults=None, keep_missing=True,
+                name_field="EMAIL", progress=True):
+    """
+    Write every message with write(name, data). Returns a stats dict.
+    """
+    count = 0
+    total_bytes = 0
+    start = time.perf_counter()
+
+    for index, record, data in iter_messages(compiled, recipients_path, defaults, keep_missing):
+        write(render_merge_tags.message_name(index, record, name_field, ".eml"), data)
+        count += 1
+        total_bytes += len(data)
+
+        if progress and count % render_merge_tags.PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            print(f"  … {count} messages ({count / elapsed:,.0f} msg/s)")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "messages": count,
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "messages_per_second": count / elapsed if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Build MIME messages (.eml) for a recipient list")
+    parser.add_argument("template", help="HTML template containing *|TAG|* merge tags")
+    parser.add_argument("recipients", help="recipient list (.csv with header, or .jsonl) with an EMAIL field")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--out", help="write one .eml file per recipient to this directory")
+    output.add_argument("--archive", help="write all messages to one .tar / .tar.gz archive")
+    parser.add_argument("--from", dest="sender", required=True, help='sender, e.g. "ZOMO Health <no-reply@example.com>"')
+    parser.add_argument("--subject", help="subject line, may contain merge tags (default: the template's <title>)")
+    parser.add_argument("--embed-images", action="store_true",
+                        help="attach the images from assets/images as CID parts")
+    parser.add_argument("--set", action="append", metavar="TAG=VALUE",
+                        help="default value for a tag (e.g. UNSUB=https://...)")
+    parser.add_argument("--defaults", help="JSON file of default tag values")
+    parser.add_argument("--drop-missing", action="store_true",
+                        help="remove tags with no value instead of leaving them in place")
+    parser.add_argument("--name-field", default="EMAIL", help="field used in output file names (default: EMAIL)")
+    args = parser.parse_args()
+
+    defaults = {}
+    if args.defaults:
+        with open(args.defaults, 'r', encoding='utf-8') as f:
+            defaults.update(json.load(f))
+    try:
+        defaults.update(render_merge_tags.parse_assignments(args.set))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    compiled = compile_messages(args.template, args.sender, args.subject, args.embed_images)
+
+    if args.out:
+        write, close = render_merge_tags.directory_writer(args.out)
+        destination = args.out
+    else:
+        write, close = render_merge_tags.archive_writer(args.archive)
+        destination = args.archive
+
+    print(f"✉️  Building messages from {args.template} for {args.recipients} → {destination}")
+    if compiled["images"]:
+        print(f"🖼️  Embedding {len(compiled['images'])} images: {', '.join(compiled['images'])}")
+
+    try:
+        stats = build_batch(compiled, args.recipients, write, defaults,
+                            keep_missing=not args.drop_missing,
+                            name_field=args.name_field.upper())
+    finally:
+        close()
+
+    print("=" * 50)
+    print(f"✅ Built {stats['messages']} messages, {stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.2f}s")
+    print(f"⚡ {stats['messages_per_second']:,.0f} msg/s ({stats['bytes'] / 1e6 / stats['seconds'] if stats['seconds'] else 0:,.1f} MB/s)")
+    print(f"🏷️  Merge tags: {', '.join(compiled['tags']) or 'none'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Build the email templates in templates/pages/** from their layouts and partials.
+
+Each page is rendered through its layout with the shared partials expanded
+(see partials.py). The build manifest records every file a page depended on
+when it was last built, so a run rebuilds exactly the pages whose page,
+layout or partials changed: editing templates/partials/footer.html rebuilds
+the pages that include the footer and nothing else. Layouts and partials
+are expanded and compiled once per run, so even a change that touches every
+page costs one join per page.
+
+Usage:
+    python build_templates.py                       # write changed pages to build/emails
+    python inline_css.py --out emails               # then inline build/emails over emails/**
+    python build_templates.py --force               # rebuild every page
+    python build_templates.py --dependents templates/partials/footer.html
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import partials
+import build_manifest
+
+default_out_dir = "build/emails"
+
+# Manifest section holding the per-output dependency records
+MANIFEST_SECTION = "templates"
+
+def output_path(page, out_dir):
+    return os.path.join(out_dir, os.path.relpath(page, partials.pages_dir))
+
+def dependency_state(path, memo):
+    """
+    Return (stat signature, sha256) of a dependency, hashing each file at most
+    once per run
+    """
+    if path not in memo:
+        signature = build_manifest.file_signature(path)
+        memo[path] = (signature, build_manifest.file_hash(path) if signature is not None else None)
+    return memo[path]
+
+def changed_dependencies(entry, memo):
+    """
+    Return the recorded dependencies of an output that changed since it was
+    built. The stat signature is compared first so unchanged files are not read.
+    """
+    changed = []
+    for path, (signature, sha256) in entry["deps"].items():
+        current_signature = build_manifest.file_signature(path)
+        if current_signature is not None and current_signature == signature:
+            continue
+        if dependency_state(path, memo)[1] != sha256:
+            changed.append(path)
+    return changed
+
+def build(out_dir, force=False, manifest_path=build_manifest.MANIFEST_PATH):
+    """
+    Build the stale pages. Returns {"pages", "built", "written", "changed", "errors"}.
+    """
+    manifest = build_manifest.load_manifest(manifest_path)
+    section = build_manifest.get_section(manifest, MANIFEST_SECTION)
+    pages = partials.find_pages()
+    memo = {}
+    changed = set()
+    built = []
+    written = []
+    errors = []
+
+    for page in pages:
+        out_path = output_path(page, out_dir)
+        entry = section.get(out_path)
+        if not force and entry and entry.get("page") == page and os.path.exists(out_path):
+            stale = changed_dependencies(entry, memo)
+            if not stale:
+                continue
+            changed.update(stale)
+
+        try:
+            content, deps = partials.render_page(page)
+        except (OSError, ValueError) as e:
+            errors.append((page, str(e)))
+            section.pop(out_path, None)
+            continue
+
+        built.append(page)
+        data = content.encode('utf-8')
+        try:
+            with open(out_path, 'rb') as f:
+                unchanged = f.read() == data
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, 'wb') as f:
+                f.write(data)
+            written.append(out_path)
+
+        section[out_path] = {
+            "page": page,
+            "deps": {path: list(dependency_state(path, memo)) for path in deps},
+        }
+
+    # Forget outputs of pages that were removed
+    for out_path in list(section):
+        if section[out_path].get("page") not in pages:
+            del section[out_path]
+    build_manifest.save_manifest(manifest, manifest_path)
+
+    return {"pages": pages, "built": built, "written": written, "changed": sorted(changed), "errors": errors}
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the email templates from their layouts and partials")
+    parser.add_argument("--out", default=default_out_dir, help=f"output directory (default: {default_out_dir})")
+    parser.add_argument("--force", action="store_true", help="rebuild every page even if nothing changed")
+    parser.add_argument("--dependents", nargs="+", metavar="FILE",
+                        help="list the pages that depend on these layouts/partials and exit")
+    parser.add_argument("--manifest", default=build_manifest.MANIFEST_PATH,
+                        help=f"manifest location (default: {build_manifest.MANIFEST_PATH})")
+    args = parser.parse_args()
+
+    if args.dependents:
+        try:
+            graph = partials.dependency_graph(partials.find_pages())
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            return 1
+        for page in partials.dependents(graph, args.dependents):
+            print(page)
+        return 0
+
+    if not partials.find_pages():
+        print(f"❌ No pages found in {partials.pages_dir}")
+        return 1
+
+    start = time.perf_counter()
+    result = build(args.out, args.force, args.manifest)
+    elapsed = time.perf_counter() - start
+
+    for path in result["changed"]:
+        print(f"🔄 {path} changed")
+    for path in result["written"]:
+        print(f"✅ Wrote {path}")
+    for page, error in result["errors"]:
+        print(f"❌ {page}: {error}")
+
+    print("=" * 50)
+    if result["errors"]:
+        print(f"❌ {len(result['errors'])} pages failed to build")
+    print(f"✅ Built {len(result['built'])} of {len(result['pages'])} pages "
+          f"({len(result['written'])} written) in {elapsed * 1000:.1f}ms")
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
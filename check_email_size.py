@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Email payload size budget analyzer and Gmail-clip guard.
+
+Gmail clips messages whose HTML is larger than about 102 KB, hiding
+everything after the cut - including the unsubscribe footer. For every
+template in emails/** this reports the HTML size as sent (merge tags expanded
+with realistic values, the preview-only scripts and toolbars removed as
+email_files.strip_preview_chrome removes them), a breakdown into head CSS,
+preview chrome and body, and the total size of the images the sent HTML
+references. The category listing pages are not emails and are skipped. It exits with status 1
+when any template exceeds the budget or when the unsubscribe link would fall
+past the clip point.
+
+Usage:
+    python check_email_size.py                        # every template in emails/**
+    python check_email_size.py --budget 90            # stricter HTML budget (KB)
+    python check_email_size.py --image-budget 500     # also budget referenced images (KB)
+    python check_email_size.py emails/newsletters/zomo-health-usi-template.html
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import html
+import argparse
+
+import email_files
+import render_merge_tags
+
+emails_dir = "emails"
+
+# Gmail clips message HTML beyond this size
+GMAIL_CLIP_KB = 102
+
+# Representative expansions of Mailchimp's built-in tags, so the sent size
+# accounts for the long tracking URLs they turn into
+SAMPLE_VALUES = {
+    "UNSUB": "https://zomohealth.us21.list-manage.com/unsubscribe?u=5f1e2d3c4b5a69788796a5b4c&id=0a1b2c3d4e&t=b&e=9f8e7d6c5b&c=1a2b3c4d5e",
+    "UPDATE_PROFILE": "https://zomohealth.us21.list-manage.com/profile?u=5f1e2d3c4b5a69788796a5b4c&id=0a1b2c3d4e&e=9f8e7d6c5b&c=1a2b3c4d5e",
+    "ARCHIVE": "https://us21.campaign-archive.com/?u=5f1e2d3c4b5a69788796a5b4c&id=1a2b3c4d5e",
+    "FNAME": "Alexandra",
+    "LNAME": "Montgomery-Smith",
+    "EMAIL": "alexandra.montgomery-smith@example.com",
+}
+
+HEAD_PATTERN = re.compile(r'<head\b.*?</head>', re.S | re.I)
+BODY_PATTERN = re.compile(r'<body\b.*</body>', re.S | re.I)
+STYLE_PATTERN = re.compile(r'<style\b[^>]*>.*?</style>', re.S | re.I)
+
+# File sizes of referenced images, shared across templates
+_image_sizes = {}
+
+def find_templates():
+    """
+    Return every email template in emails/** (listing pages and minified copies excluded)
+    """
+    templates = glob.glob(os.path.join(emails_dir, "**", "*.html"), recursive=True)
+    return sorted(t for t in templates
+                  if not t.endswith(".min.html") and os.path.basename(t) not in email_files.LISTING_PAGES)
+
+def byte_size(text):
+    return len(text.encode('utf-8'))
+
+def image_size(path):
+    size = _image_sizes.get(path)
+    if size is None:
+        size = os.path.getsize(path) if os.path.isfile(path) else -1
+        _image_sizes[path] = size
+    return size
+
+def analyze_content(content, template_path, values):
+    """
+    Measure one template. Returns a dict of byte counts plus the byte offset of
+    the unsubscribe link in the sent HTML (None when there is no *|UNSUB|* tag).
+    """
+    sendable = email_files.strip_preview_chrome(content)
+    compiled = render_merge_tags.compile_merge_text(sendable, template_path)
+    sent_text = render_merge_tags.render_message(compiled, values).decode('utf-8')
+    sent = sent_text.encode('utf-8')
+
+    head = HEAD_PATTERN.search(sent_text)
+    head_css = sum(byte_size(block) for block in STYLE_PATTERN.findall(head.group(0))) if head else 0
+    body = BODY_PATTERN.search(sent_text)
+
+    unsubscribe_at = None
+    if "UNSUB" in compiled["tags"] and values.get("UNSUB"):
+        position = sent.find(html.escape(str(values["UNSUB"])).encode('utf-8'))
+        unsubscribe_at = position if position >= 0 else None
+
+    images = 0
+    missing_images = []
+    external_images = 0
+    for url in email_files.image_references(sendable):
+        path = email_files.resolve_image(url, template_path)
+        if path is None:
+            external_images += 1
+            continue
+        size = image_size(path)
+        if size < 0:
+            missing_images.append(url)
+        else:
+            images += size
+
+    return {
+        "path": template_path,
+        "source": byte_size(content),
+        "sent": len(sent),
+        "head_css": head_css,
+        "preview": byte_size(content) - byte_size(sendable),
+        "body": byte_size(body.group(0)) if body else len(sent) - head_css,
+        "images": images,
+        "external_images": external_images,
+        "missing_images": missing_images,
+        "unsubscribe_at": unsubscribe_at,
+        "tags": compiled["tags"],
+    }
+
+def analyze_file(template_path, values):
+    with open(template_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return analyze_content(content, template_path, values)
+
+def kb(size):
+    return f"{size / 1024:.1f} KB"
+
+def main():
+    parser = argparse.ArgumentParser(description="Check email HTML and image sizes against a budget")
+    parser.add_argument("templates", nargs="*", help="templates to check (default: every email in emails/**)")
+    parser.add_argument("--budget", type=float, default=GMAIL_CLIP_KB,
+                        help=f"maximum sent HTML size in KB (default: {GMAIL_CLIP_KB}, Gmail's clip point)")
+    parser.add_argument("--image-budget", type=float,
+                        help="maximum total size of referenced images in KB (default: no limit)")
+    parser.add_argument("--set", action="append", metavar="TAG=VALUE",
+                        help="value used to expand a merge tag (e.g. FNAME=Jo)")
+    parser.add_argument("--defaults", help="JSON file of merge tag values")
+    parser.add_argument("--json", action="store_true", help="print the measurements as JSON")
+    args = parser.parse_args()
+
+    templates = args.templates or find_templates()
+    if not templates:
+        print(f"❌ No templates found in {emails_dir}")
+        return 1
+
+    values = dict(SAMPLE_VALUES)
+    if args.defaults:
+        with open(args.defaults, 'r', encoding='utf-8') as f:
+            values.update(render_merge_tags.normalize_keys(json.load(f)))
+    values.update(render_merge_tags.normalize_keys(render_merge_tags.parse_assignments(args.set)))
+
+    budget = int(args.budget * 1024)
+    image_budget = int(args.image_budget * 1024) if args.image_budget is not None else None
+
+    results = [analyze_file(path, values) for path in templates]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"📏 Checking {len(results)} templates against a {args.budget:g} KB HTML budget...")
+        print()
+
+    failures = 0
+    for result in sorted(results, key=lambda r: r["sent"], reverse=True):
+        problems = []
+        if result["sent"] > budget:
+            problems.append(f"HTML over budget by {kb(result['sent'] - budget)}")
+        if result["unsubscribe_at"] is not None and result["unsubscribe_at"] > budget:
+            problems.append("unsubscribe link falls past the clip point")
+        if image_budget is not None and result["images"] > image_budget:
+            problems.append(f"images over budget by {kb(result['images'] - image_budget)}")
+        if problems:
+            failures += 1
+
+        if args.json:
+            continue
+
+        icon = "❌" if problems else ("⚠️ " if result["sent"] > budget * 0.9 else "✅")
+        print(f"{icon} {result['path']}: {kb(result['sent'])} sent "
+              f"(head CSS {kb(result['head_css'])}, body {kb(result['body'])}, "
+              f"preview chrome {kb(result['preview'])} stripped), images {kb(result['images'])}")
+        for problem in problems:
+            print(f"   ❌ {problem}")
+        for url in result["missing_images"]:
+            print(f"   ⚠️  Missing image: {url}")
+
+    if not args.json:
+        print()
+        print("=" * 50)
+        largest = max(results, key=lambda r: r["sent"])
+        print(f"📦 Largest: {largest['path']} at {kb(largest['sent'])} "
+              f"({largest['sent'] / budget:.0%} of budget)")
+        if failures:
+            print(f"❌ {failures} of {len(results)} templates exceed the budget")
+        else:
+            print(f"✅ All {len(results)} templates are within budget")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Check every link and asset reference in the site.
+
+Extracts href/src/srcset references from index.html, emails/**,
+download-pages/** and code-pages/**. Relative paths and URLs under the
+Vercel deployment are resolved against this tree; other http(s) URLs are
+checked concurrently with asyncio (HEAD, falling back to GET) with a limit on
+connections per host. Remote results are cached in .cache/links.json for
+--ttl seconds, so repeated runs only re-check new, expired or failing URLs.
+
+Usage:
+    python check_links.py                    # whole site
+    python check_links.py --offline          # local references only
+    python check_links.py --ttl 0            # re-check every remote URL
+    python check_links.py emails/newsletters/zomo-health-usi-template.html
+"""
+
+import os
+import re
+import ssl
+import sys
+import glob
+import html
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urljoin, urlsplit, unquote
+
+# Base URL for the Vercel deployment
+BASE_URL = "https://zomo-emails.vercel.app"
+
+cache_path = ".cache/links.json"
+
+SITE_PATTERNS = ["index.html", "emails/**/*.html", "download-pages/**/*.html", "code-pages/**/*.html"]
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_TIMEOUT = 10
+DEFAULT_PER_HOST = 4
+DEFAULT_CONNECTIONS = 32
+MAX_REDIRECTS = 5
+
+USER_AGENT = "zomo-emails-link-checker/1.0"
+
+TAG_PATTERN = re.compile(r'<(?P<tag>[a-zA-Z][\w:-]*)\b(?P<attrs>[^>]*)>')
+ATTR_PATTERN = re.compile(r'''\s(?P<name>href|src|srcset|background)\s*=\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)')''', re.I)
+REL_PATTERN = re.compile(r'''\srel\s*=\s*["']([^"']*)["']''', re.I)
+
+# References that are not links to check
+SKIP_PATTERN = re.compile(r'^(?:#|mailto:|tel:|sms:|javascript:|data:)|\*\|[A-Z0-9_:]+\|\*|\[[A-Z0-9_]+\]', re.I)
+
+# <link rel> values whose href is a connection hint rather than a resource
+HINT_RELS = {"preconnect", "dns-prefetch"}
+
+def find_site_files():
+    files = []
+    for pattern in SITE_PATTERNS:
+        files.extend(glob.glob(pattern, recursive=True))
+    return sorted(f for f in set(files) if not f.endswith(".min.html"))
+
+def extract_references(content):
+    """
+    Return the (line, url) references of a document, in order
+    """
+    references = []
+    for tag in TAG_PATTERN.finditer(content):
+        attrs = tag.group("attrs")
+        if tag.group("tag").lower() == "link":
+            rel = REL_PATTERN.search(attrs)
+            if rel and HINT_RELS & set(rel.group(1).lower().split()):
+                continue
+        line = content.count("\n", 0, tag.start()) + 1
+        for attr in ATTR_PATTERN.finditer(attrs):
+            value = attr.group("dq") if attr.group("dq") is not None else attr.group("sq")
+            # Attribute values are HTML: "?a=1&amp;b=2" is the URL "?a=1&b=2"
+            value = html.unescape(value)
+            if attr.group("name").lower() == "srcset":
+                urls = [c.split()[0] for c in value.split(",") if c.strip()]
+            else:
+                urls = [value.strip()]
+            references.extend((line, url) for url in urls if url and not SKIP_PATTERN.search(url))
+    return references
+
+def local_target(url, source_path):
+    """
+    Return the file a reference points to in this tree, or None for remote URLs
+    """
+    if url.startswith(BASE_URL + "/") or url == BASE_URL:
+        path = url[len(BASE_URL):]
+    elif re.match(r'^[a-z][a-z0-9+.-]*:|^//', url, re.I):
+        return None
+    else:
+        path = url
+
+    path = unquote(urlsplit(path).path)
+    if path.startswith("/"):
+        target = path.lstrip("/")
+    else:
+        target = os.path.join(os.path.dirname(source_path), path)
+    target = os.path.normpath(target) if target else "."
+
+    if os.path.isdir(target):
+        target = os.path.join(target, "index.html")
+    return target
+
+def remote_key(url):
+    """
+    Cache key for a remote URL (the fragment never reaches the server)
+    """
+    url = url.split("#", 1)[0]
+    return "https:" + url if url.startswith("//") else url
+
+def load_cache():
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+async def request_status(url, method, timeout):
+    """
+    Send one request and return (status, location header)
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None),
+        timeout)
+    try:
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        writer.write((f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                      f"Accept: */*\r\nConnection: close\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        fields = status_line.decode('latin-1').split()
+        if len(fields) < 2 or not fields[1].isdigit():
+            raise ValueError(f"bad status line {status_line[:60]!r}")
+
+        location = None
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            if name.strip().lower() == "location":
+                location = value.strip()
+        return int(fields[1]), location
+    finally:
+        writer.close()
+
+async def check_remote(url, limits, timeout):
+    """
+    Check one URL, following redirects. Returns {"status", "ok", "error"}.
+    """
+    current = url
+    for _ in range(MAX_REDIRECTS + 1):
+        host = urlsplit(current).netloc
+        semaphore = limits["hosts"].setdefault(host, asyncio.Semaphore(limits["per_host"]))
+        try:
+            async with semaphore, limits["total"]:
+                status, location = await request_status(current, "HEAD", timeout)
+                if status in (403, 405, 501):
+                    # Some servers refuse HEAD; ask for the real thing
+                    status, location = await request_status(current, "GET", timeout)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            return {"status": None, "ok": False, "error": str(e) or type(e).__name__}
+
+        if status in (301, 302, 303, 307, 308) and location:
+            current = urljoin(current, location)
+            continue
+        return {"status": status, "ok": 200 <= status < 400, "error": None}
+
+    return {"status": None, "ok": False, "error": "too many redirects"}
+
+async def check_all_remote(urls, per_host, connections, timeout):
+    limits = {"total": asyncio.Semaphore(connections), "hosts": {}, "per_host": per_host}
+    results = await asyncio.gather(*(check_remote(url, limits, timeout) for url in urls))
+    return dict(zip(urls, results))
+
+def main():
+    parser = argparse.ArgumentParser(description="Check links and asset references across the site")
+    parser.add_argument("files", nargs="*", help="files to check (default: the whole site)")
+    parser.add_argument("--offline", action="store_true", help="only check references into this tree")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL,
+                        help="seconds a passing remote result is trusted (default: one day)")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                        help=f"concurrent connections per host (default: {DEFAULT_PER_HOST})")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help=f"concurrent connections in total (default: {DEFAULT_CONNECTIONS})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="per-request timeout in seconds")
+    args = parser.parse_args()
+
+    files = args.files or find_site_files()
+    if not files:
+        print("❌ No files to check")
+        return 1
+
+    references = []
+    for source_path in files:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        references.extend((source_path, line, url) for line, url in extract_references(content))
+
+    remote = sorted({remote_key(url) for path, _, url in references if local_target(url, path) is None})
+    print(f"🔗 Checking {len(references)} references in {len(files)} files "
+          f"({len(remote)} distinct remote URLs)...")
+    print()
+
+    cache = load_cache()
+    now = time.time()
+    if not args.offline:
+        stale = [url for url in remote
+                 if url not in cache or not cache[url]["ok"] or now - cache[url]["checked"] >= args.ttl]
+        if stale:
+            start = time.perf_counter()
+            results = asyncio.run(check_all_remote(stale, args.per_host, args.connections, args.timeout))
+            for url, result in results.items():
+                cache[url] = dict(result, checked=now)
+            save_cache(cache)
+            print(f"🌐 Checked {len(stale)} remote URLs in {time.perf_counter() - start:.2f}s "
+                  f"({len(remote) - len(stale)} cached)")
+        else:
+            print(f"🌐 All {len(remote)} remote URLs cached")
+
+    broken = 0
+    for source_path, line, url in references:
+        target = local_target(url, source_path)
+        if target is not None:
+            if not os.path.isfile(target):
+                broken += 1
+                print(f"❌ {source_path}:{line}: {url} → missing {target}")
+            continue
+        if args.offline:
+            continue
+        result = cache.get(remote_key(url))
+        if result and not result["ok"]:
+            broken += 1
+            print(f"❌ {source_path}:{line}: {url} → {result['status'] or result['error']}")
+
+    print()
+    print("=" * 50)
+    if broken:
+        print(f"❌ {broken} broken references")
+        return 1
+    print(f"✅ All {len(references)} references resolve")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
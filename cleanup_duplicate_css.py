@@ -1 +1,447 @@
- 
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+Remove duplicate and dead CSS from the <style> blocks of the templates.
+
+Each stylesheet is parsed (css_parser) and matched against its own document:
+    - rules whose selectors match no element are dropped, and dead selectors
+      are taken out of selector lists; a rule inside @media is dropped the
+      same way and an @media left empty goes with it
+    - a rule repeating an earlier selector list in the same block absorbs the
+      earlier rule, unless a rule in between sets one of the moved properties
+    - a declaration repeated with the same value in one rule is kept once
+    - a comment heading only removed rules is removed with them
+
+Edits are made in place, so the rest of the stylesheet keeps its formatting
+and comments. The conservative cases are kept as they are: selectors this
+parser cannot read, selectors for markup the inbox adds (Gmail's "u + #body",
+Outlook.com's [data-ogsc], .ExternalClass ...), classes and ids named in the
+document's scripts (theme toggles add them at runtime), @font-face, @import
+and other opaque at-rules, rules with a nested block in their body, and
+<style> blocks inside <!--[if mso]> comments.
+Declarations that set the same property to different values are fallbacks
+for older clients and are never merged away.
+
+Usage:
+    python cleanup_duplicate_css.py             # every template in emails/**
+    python cleanup_duplicate_css.py --check     # report the savings without writing
+    python cleanup_duplicate_css.py emails/newsletters/zomo-health-usi-template.html
+"""
+
+import os
+import re
+import sys
+import glob
+import argparse
+
+import css_parser
+import html_tokens
+
+emails_dir = "emails"
+
+# Selectors for elements or attributes the email client adds around the message
+CLIENT_HACK_PATTERN = re.compile(
+    r'\bu\s*\+\s*(?:#|\.)body|\[data-ogs[cb]\]|\.ExternalClass|\.ReadMsgBody|x-apple-data-detectors'
+    r'|#outlook|#MessageViewBody|#MessageWebViewDiv|\[owa\]|\.yshortcuts|\[class[~^*]?="x_|\bbody\[data-outlook',
+    re.I
+)
+
+# <!--[if mso]> ... <![endif]--> markers; the markup between them is scanned as part of the document
+CONDITIONAL_MARKER_PATTERN = re.compile(r'<!--\[if[^\]]*\]>(?:<!-->)?|(?:<!--)?<!\[endif\]-->', re.I)
+
+SCRIPT_WORD_PATTERN = re.compile(r'[A-Za-z_][\w-]*')
+
+def mask_comments(css):
+    """
+    Blank out comments, keeping every offset in place
+    """
+    return css_parser.COMMENT_PATTERN.sub(lambda m: " " * len(m.group(0)), css)
+
+def parse_items(css, pos, end):
+    """
+    Parse the comment-masked css[pos:end] like css_parser.parse_rules, keeping
+    offsets. Items are dicts with "kind" ("rule", "group" for @media/@supports,
+    "other" for everything else, rules with a nested block included), "start",
+    "end" and, for rules, the selector pieces and declaration texts.
+    """
+    items = []
+    while pos < end:
+        while pos < end and css[pos].isspace():
+            pos += 1
+        if pos >= end:
+            break
+
+        brace = css.find("{", pos, end)
+        semicolon = css.find(";", pos, end)
+        if css.startswith("@", pos) and semicolon != -1 and (brace == -1 or semicolon < brace):
+            items.append({"kind": "other", "start": pos, "end": semicolon + 1})
+            pos = semicolon + 1
+            continue
+        if brace == -1:
+            break
+
+        close = min(css_parser.find_block_end(css, brace), end)
+        head = css[pos:brace]
+        item = {"start": pos, "end": min(close + 1, end), "body": (brace + 1, close)}
+        if head.startswith("@"):
+            name = head[1:].split(None, 1)[0].lower() if head[1:].strip() else ""
+            if name in css_parser.NESTED_AT_RULES:
+                item.update(kind="group", rules=parse_items(css, brace + 1, close))
+            else:
+                item["kind"] = "other"
+        elif "{" in css[brace + 1:close]:
+            # A rule body holding a nested block (a stray @media) is not a declaration list
+            item.update(kind="other", nested=True)
+        else:
+            item.update(kind="rule", selectors=css_parser.split_top_level(head.rstrip(), ","),
+                        declarations=declaration_texts(css[brace + 1:close]))
+        items.append(item)
+        pos = item["end"]
+    return items
+
+def declaration_texts(body):
+    """
+    Return [(key, text)] for the declarations of a rule body; key is
+    (prop, value, important) as parsed by css_parser, or None when unparsable
+    """
+    declarations = []
+    for part in css_parser.split_top_level(body, ";"):
+        text = part.strip()
+        if not text:
+            continue
+        parsed = css_parser.parse_declarations(text)
+        declarations.append((parsed[0] if parsed else None, text))
+    return declarations
+
+def property_family(prop):
+    """
+    margin-top → margin, -webkit-text-size-adjust → text: shorthands and
+    longhands of one property share a family
+    """
+    return re.sub(r'^-[a-z]+-', '', prop).split("-")[0]
+
+class DocumentIndex:
+    """
+    The document's elements, indexed by the key parts a selector must match
+    """
+
+    def __init__(self, content, selectors):
+        scan_text = CONDITIONAL_MARKER_PATTERN.sub(lambda m: " " * len(m.group(0)), content)
+        self.elements = css_parser.scan_elements(scan_text, css_parser.referenced_attributes(selectors))
+        self.by_id = {}
+        self.by_class = {}
+        self.by_tag = {}
+        for element in self.elements:
+            if element["attrs"].get("id"):
+                self.by_id.setdefault(element["attrs"]["id"], []).append(element)
+            for name in element["classes"]:
+                self.by_class.setdefault(name, []).append(element)
+            self.by_tag.setdefault(element["tag"], []).append(element)
+
+        self.script_words = set()
+        for tag in html_tokens.iter_tags(content, {"script"}):
+            start, end = html_tokens.raw_text(tag)
+            self.script_words.update(SCRIPT_WORD_PATTERN.findall(content, start, end))
+
+    def candidates(self, compound):
+        if compound["id"]:
+            return self.by_id.get(compound["id"], [])
+        if compound["classes"]:
+            return self.by_class.get(compound["classes"][0], [])
+        if compound["type"] and compound["type"] != "*":
+            return self.by_tag.get(compound["type"], [])
+        return self.elements
+
+    def is_live(self, selector):
+        """
+        Whether a selector may apply to the document. Pseudo-classes are
+        ignored, so :hover or :not() rules are kept for any element that
+        matches the rest of the selector.
+        """
+        selector = selector.strip()
+        if CLIENT_HACK_PATTERN.search(selector):
+            return True
+        parts = css_parser.parse_selector(selector)
+        if not parts:
+            return True
+        for _, compound in parts:
+            names = compound["classes"] + [compound["id"]] + [a[0] for a in compound["attrs"]]
+            if any(name in self.script_words for name in names if name):
+                return True
+        return any(css_parser.matches(self.elements, element, selector)
+                   for element in self.candidates(parts[-1][1]))
+
+def removal_span(css, start, end):
+    """
+    Widen [start, end) to whole lines when the item sits on lines of its own
+    """
+    line_start = start
+    while line_start > 0 and css[line_start - 1] in " \t":
+        line_start -= 1
+    line_end = end
+    while line_end < len(css) and css[line_end] in " \t":
+        line_end += 1
+    if (line_start == 0 or css[line_start - 1] == "\n") and (line_end == len(css) or css[line_end] in "\r\n"):
+        if css.startswith("\r\n", line_end):
+            line_end += 2
+        elif line_end < len(css):
+            line_end += 1
+        return line_start, line_end
+    return start, end
+
+def format_body(css, rule, declarations):
+    """
+    Serialize declaration texts in the layout of the rule's current body
+    """
+    body_start, body_end = rule["body"]
+    body = css[body_start:body_end]
+    lines = [line for line in body.split("\n")[1:] if line.strip()]
+    if not lines:
+        return " " + "; ".join(declarations) + "; "
+    indent = lines[0][:len(lines[0]) - len(lines[0].lstrip())]
+    closing = body[body.rfind("\n") + 1:]
+    return "\n" + "".join(f"{indent}{text};\n" for text in declarations) + closing
+
+def unique_declarations(declarations):
+    """
+    Drop earlier repeats of a declaration with the same property, value and priority
+    """
+    kept = []
+    for index, (key, text) in enumerate(declarations):
+        if key is not None and any(later == key for later, _ in declarations[index + 1:]):
+            continue
+        kept.append((key, text))
+    return kept
+
+def declared_families(items):
+    families = set()
+    for item in items:
+        if item["kind"] == "rule":
+            families.update(property_family(key[0]) for key, _ in item["declarations"] if key)
+        elif item["kind"] == "group":
+            families |= declared_families(item["rules"])
+    return families
+
+class StylesheetCleaner:
+    """
+    Collect the edits for one stylesheet
+    """
+
+    def __init__(self, css, index):
+        self.css = css
+        self.masked = mask_comments(css)
+        self.index = index
+        self.edits = []
+        self.removed = []
+        self.stats = {"rules": 0, "selectors": 0, "merged": 0, "declarations": 0}
+
+    def remove(self, item):
+        self.removed.append((item["start"], item["end"]))
+
+    def clean(self):
+        items = parse_items(self.masked, 0, len(self.masked))
+        self.clean_items(items)
+        self.remove_orphan_comments()
+        edits = [removal_span(self.css, start, end) + ("",) for start, end in self.removed] + self.edits
+        # Edits inside a removed @media block (or comments inside removed rules) go with it
+        kept = []
+        for edit in sorted(edits, key=lambda e: (e[0], -e[1])):
+            if kept and edit[0] < kept[-1][1]:
+                continue
+            kept.append(edit)
+        return html_tokens.apply_edits(self.css, kept)
+
+    def clean_items(self, items):
+        """
+        Clean a list of sibling items. Returns the number of items left.
+        """
+        live = []
+        for item in items:
+            if item["kind"] == "group":
+                if self.clean_items(item["rules"]) == 0:
+                    self.remove(item)
+                    self.stats["rules"] += 1
+                    continue
+            elif item["kind"] == "rule":
+                selectors = [s for s in item["selectors"] if s.strip()]
+                kept = [s for s in selectors if self.index.is_live(s)]
+                kept = [s for i, s in enumerate(kept) if s.strip() not in {k.strip() for k in kept[:i]}]
+                if not kept or not item["declarations"]:
+                    self.remove(item)
+                    self.stats["rules"] += 1
+                    continue
+                if len(kept) < len(item["selectors"]):
+                    self.stats["selectors"] += len(selectors) - len(kept)
+                    item["selectors"] = kept
+                    item["head_changed"] = True
+            live.append(item)
+
+        self.merge_duplicates(live)
+        for item in live:
+            if item["kind"] == "rule" and item["start"] not in {start for start, _ in self.removed}:
+                self.rewrite_rule(item)
+        return sum(1 for item in live if (item["start"], item["end"]) not in self.removed)
+
+    def merge_duplicates(self, items):
+        """
+        Fold a rule into the next rule with the same selector list when no
+        rule in between sets any of the properties that move
+        """
+        for position, item in enumerate(items):
+            if item["kind"] != "rule":
+                continue
+            key = tuple(s.strip() for s in item["selectors"])
+            for later_position in range(position + 1, len(items)):
+                later = items[later_position]
+                if later["kind"] != "rule" or tuple(s.strip() for s in later["selectors"]) != key:
+                    continue
+                moved = [(k, text) for k, text in item["declarations"] if k is None or k not in
+                         {lk for lk, _ in later["declarations"]}]
+                families = {property_family(k[0]) if k else None for k, _ in moved}
+                between = items[position + 1:later_position]
+                if (None in families or families & declared_families(between)
+                        or any(other.get("nested") for other in between)):
+                    break
+                later["declarations"] = moved + later["declarations"]
+                later["body_changed"] = True
+                self.stats["declarations"] += len(item["declarations"]) - len(moved)
+                self.stats["merged"] += 1
+                self.remove(item)
+                break
+
+    def rewrite_rule(self, rule):
+        declarations = unique_declarations(rule["declarations"])
+        if len(declarations) < len(rule["declarations"]):
+            self.stats["declarations"] += len(rule["declarations"]) - len(declarations)
+            rule["body_changed"] = True
+        if rule.get("head_changed"):
+            pieces = list(rule["selectors"])
+            pieces[0] = pieces[0].lstrip()
+            head_end = rule["body"][0] - 1
+            trailing = self.css[rule["start"]:head_end]
+            trailing = trailing[len(trailing.rstrip()):]
+            self.edits.append((rule["start"], head_end, ",".join(pieces).rstrip() + trailing))
+        if rule.get("body_changed"):
+            body_start, body_end = rule["body"]
+            self.edits.append((body_start, body_end,
+                               format_body(self.css, rule, [text for _, text in declarations])))
+
+    def remove_orphan_comments(self):
+        """
+        Remove comments that only headed removed rules
+        """
+        removed_starts = {start for start, _ in self.removed}
+        for match in css_parser.COMMENT_PATTERN.finditer(self.css):
+            pos = match.end()
+            heads_removed = False
+            while True:
+                while pos < len(self.css) and self.css[pos].isspace():
+                    pos += 1
+                if pos not in removed_starts:
+                    break
+                heads_removed = True
+                pos = next(end for start, end in self.removed if start == pos)
+            # The next thing left is another comment, the end of a block or the end of the sheet
+            if heads_removed and (pos >= len(self.css) or self.css[pos] == "}" or self.css.startswith("/*", pos)):
+                self.removed.append((match.start(), match.end()))
+
+def stylesheet_spans(content):
+    """
+    Return the (start, end) offsets of every stylesheet outside conditional comments
+    """
+    spans = []
+    in_style = False
+    for token in html_tokens.tokenize(content):
+        if token.kind == "start":
+            in_style = token.name == "style"
+        elif token.kind == "raw" and in_style:
+            spans.append((token.start, token.end))
+    return spans
+
+def clean_css(content):
+    """
+    Clean the stylesheets of one document. Returns (new content, stats).
+    """
+    stats = {"rules": 0, "selectors": 0, "merged": 0, "declarations": 0}
+    spans = stylesheet_spans(content)
+    if not spans:
+        return content, stats
+
+    selectors = []
+    masked = [mask_comments(content[start:end]) for start, end in spans]
+    for css in masked:
+        selectors.extend(re.findall(r'([^{};]+)\{', css))
+    index = DocumentIndex(content, [s for group in selectors
+                                    for s in css_parser.split_top_level(group, ",") if s.strip()])
+
+    edits = []
+    for start, end in spans:
+        cleaner = StylesheetCleaner(content[start:end], index)
+        cleaned = cleaner.clean()
+        if cleaned != content[start:end]:
+            edits.append((start, end, cleaned))
+        for key, value in cleaner.stats.items():
+            stats[key] += value
+    return html_tokens.apply_edits(content, edits), stats
+
+def find_templates():
+    """
+    Return every HTML file in emails/** (minified outputs excluded)
+    """
+    templates = glob.glob(os.path.join(emails_dir, "**", "*.html"), recursive=True)
+    return sorted(t for t in templates if not t.endswith(".min.html"))
+
+def clean_file(file_path, write=True):
+    """
+    Clean one template. Returns (bytes before, bytes after, stats).
+    """
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        content = f.read()
+
+    cleaned, stats = clean_css(content)
+
+    if write and cleaned != content:
+        with open(file_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(cleaned)
+
+    return len(content.encode('utf-8')), len(cleaned.encode('utf-8')), stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate and dead CSS from the templates")
+    parser.add_argument("templates", nargs="*", help="templates to clean (default: every file in emails/**)")
+    parser.add_argument("--check", action="store_true", help="report the savings without writing files")
+    args = parser.parse_args()
+
+    templates = args.templates or find_templates()
+    if not templates:
+        print(f"❌ No templates found in {emails_dir}")
+        return 1
+
+    print(f"🧹 Cleaning the CSS of {len(templates)} templates...")
+    print()
+
+    total_before = 0
+    total_after = 0
+    for file_path in templates:
+        try:
+            before, after, stats = clean_file(file_path, write=not args.check)
+        except Exception as e:
+            print(f"❌ Error cleaning {file_path}: {e}")
+            continue
+        total_before += before
+        total_after += after
+        if before == after:
+            print(f"ℹ️  {file_path}: nothing to remove")
+            continue
+        print(f"✅ {file_path}: -{before - after:,} bytes ({stats['rules']} rules and "
+              f"{stats['selectors']} selectors removed, {stats['merged']} rules merged, "
+              f"{stats['declarations']} declarations deduplicated)")
+
+    print()
+    print("=" * 50)
+    if total_before:
+        print(f"✅ Saved {(total_before - total_after) / 1024:.1f} KB of {total_before / 1024:.1f} KB "
+              f"({1 - total_after / total_before:.1%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Compile the partner newsletters from docs/versions/Newsletter-*.md.
+
+The shared layout in templates/newsletter.html is compiled once into a cached,
+precompiled form (see template_engine.py) and loaded once per batch. Each
+Markdown file is parsed into its subject, greeting, intro and sections,
+combined with the partner's name, logo and call to action from
+docs/versions/partners.json, and rendered into newsletter HTML: an "In This
+Issue" box listing the sections, one card per section, the "What's New"
+items as a row of feature cards and "👉" lines as links. All partners are
+rendered in one batch across a process pool.
+
+The hand-kept copies in emails/newsletters carry editorial extras the
+Markdown does not (shortened card copy, per-resource icons); the compiled
+variants render the Markdown as written.
+
+Usage:
+    python compile_newsletters.py                          # write to build/newsletters
+    python compile_newsletters.py --out emails/newsletters # publish over the hand-kept copies
+    python compile_newsletters.py docs/versions/Newsletter-USI.md
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import html
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import template_engine
+
+# Base URL for the Vercel deployment
+BASE_URL = "https://zomo-emails.vercel.app"
+
+versions_dir = "docs/versions"
+layout_path = "templates/newsletter.html"
+registry_path = os.path.join(versions_dir, "partners.json")
+default_out_dir = "build/newsletters"
+
+# Sections whose content the layout already provides (contact card, social bar)
+LAYOUT_SECTIONS = {"Your Zomo Health Contact", "Stay Connected"}
+
+LINK_STYLE = 'style="color:#0d9488; text-decoration:none;" class="btn-link btn-link-dark"'
+
+# Icons for the "In This Issue" entries, by the first pattern the section heading matches
+SECTION_ICONS = [
+    (re.compile(r'support|partner', re.I), "handshake"),
+    (re.compile(r'what.s new', re.I), "new_releases"),
+    (re.compile(r'team', re.I), "person"),
+    (re.compile(r'health news|resources', re.I), "health_and_safety"),
+    (re.compile(r'client|success', re.I), "emoji_events"),
+]
+DEFAULT_SECTION_ICON = "article"
+
+# Sections whose "**Title:** text" list is shown as a row of feature cards
+CARD_SECTION_PATTERN = re.compile(r'^what.s new', re.I)
+CARD_ITEM_PATTERN = re.compile(r'^\*\*(.+?):?\*\*:?\s*(.+)$')
+CARD_ICONS = [
+    (re.compile(r'soc ?2|security', re.I), "security"),
+    (re.compile(r'implementation|faster', re.I), "speed"),
+    (re.compile(r'hris|integration', re.I), "integration_instructions"),
+]
+DEFAULT_CARD_ICON = "new_releases"
+CARDS_PER_ROW = 3
+
+# List lines pointing the reader at a link ("👉 Read the full article [here](...)")
+POINTER = "👉"
+
+# Section markup, matching the hand-built newsletter cards
+SECTION_TEMPLATE = template_engine.compile_template('''
+          <!-- {{title}} -->
+          <tr><td style="line-height:32px;height:32px;">&nbsp;</td></tr>
+          <tr>
+            <td style="padding:0 20px;" class="dm-bg mobile-padding">
+              <table role="presentation" cellpadding="0" cellspacing="0" border="0" width="100%" style="background:#FFFFFF; border:1px solid #e2e8f0; border-radius:8px;" class="dm-box">
+                <tr>
+                  <td style="padding:24px;" class="mobile-padding-small">
+                    <table role="presentation" cellpadding="0" cellspacing="0" border="0" width="100%">
+                      <tr>
+                        <td style="border-left:4px solid #0d9488; padding-left:12px; vertical-align:middle;" class="dm-accent-bar">
+                          <h2 style="margin:0; font-size:24px; font-weight:400; line-height:1.35;" class="dm-text mobile-text-medium">
+                            {{{heading}}}
+                          </h2>
+                        </td>
+                      </tr>
+                      <tr>
+                        <td style="padding-top:12px;">
+{{{body}}}
+                        </td>
+                      </tr>
+                    </table>
+                  </td>
+                </tr>
+              </table>
+            </td>
+          </tr>
+''')
+
+GREETING_TEMPLATE = template_engine.compile_template('''<!-- Greeting & Intro -->
+          <tr>
+            <td style="padding:0 20px;" class="dm-bg mobile-padding">
+              <p style="margin:0; font-size:18px; font-weight:400; line-height:1.7;" class="dm-text mobile-text-medium">
+                {{{greeting}}}
+              </p>
+{{{intro}}}
+            </td>
+          </tr>
+''')
+
+LOGO_TEMPLATE = template_engine.compile_template(
+    '                          <img src="{{logo}}" alt="ZOMO Health and {{name}} Partnership" '
+    'style="width:100%; height:200px; border-radius:8px; margin-bottom:16px; object-fit:cover;" '
+    'class="dm-bg mobile-content-image">\n'
+)
+
+ISSUE_ITEM_TEMPLATE = template_engine.compile_template(
+    '                      <li style="margin:4px 0;"><img src="{{icon}}" alt="{{name}}" '
+    'style="width:16px; height:16px; vertical-align:middle; margin-right:8px">{{{text}}}</li>'
+)
+
+CARD_TEMPLATE = template_engine.compile_template('''
+                              <td style="width:180px; vertical-align:top;{{padding}}" class="card-cell">
+                                <table role="presentation" cellpadding="0" cellspacing="0" border="0" width="100%" style="background:#f8fafc; border:1px solid #e2e8f0; border-radius:8px;" class="dm-box">
+                                  <tr>
+                                    <td style="padding:16px; vertical-align:top;">
+                                      <div style="text-align:center; margin-bottom:12px;">
+                                        <img src="{{icon}}" alt="{{name}}" style="width:32px; height:32px; vertical-align:middle">
+                                      </div>
+                                      <h3 style="margin:0 0 8px; font-size:15px; font-weight:600; text-align:center;" class="dm-text">{{{title}}}</h3>
+                                      <p style="margin:0; font-size:13px; font-weight:400; line-height:1.5; color:#64748b; text-align:center;" class="dm-muted">{{{text}}}</p>
+                                    </td>
+                                  </tr>
+                                </table>
+                              </td>''')
+
+CARD_ROW_TEMPLATE = template_engine.compile_template('''                          <table role="presentation" cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom:12px;" class="cards-container">
+                            <tr>{{{cards}}}
+                            </tr>
+                          </table>''')
+
+CTA_TEMPLATE = template_engine.compile_template('''
+                          <div style="margin-top:16px;">
+                            <!--[if mso]>
+                            <v:roundrect xmlns:v="urn:schemas-microsoft-com:vml" href="{{url}}" style="height:44px;v-text-anchor:middle;width:260px;" arcsize="12%" fillcolor="#0d9488" stroke="f">
+                              <w:anchorlock/><center style="color:#FFFFFF;font-family:Arial,sans-serif;font-size:16px;">{{text}}</center>
+                            </v:roundrect>
+                            <![endif]-->
+                            <!--[if !mso]><!-- -->
+                            <a href="{{url}}" target="_blank" style="background:#0d9488;color:#FFFFFF;display:block;padding:12px 20px;border-radius:6px;text-decoration:none;font-size:16px;font-weight:500;text-align:center;" class="dm-cta btn-primary btn-primary-dark">
+                              {{text}}
+                            </a>
+                            <!--<![endif]-->
+                          </div>''')
+
+INLINE_PATTERN = re.compile(r'\\(.)|\*\*(.+?)\*\*|\[([^\]]+)\]\(([^)\s]+)\)')
+
+def render_inline(text):
+    """
+    Render inline Markdown (backslash escapes, **bold**, [links](url)) to HTML
+    """
+    parts = []
+    pos = 0
+
+    for match in INLINE_PATTERN.finditer(text):
+        parts.append(html.escape(text[pos:match.start()], quote=False))
+        escaped, bold, link_text, link_url = match.groups()
+        if escaped is not None:
+            parts.append(html.escape(escaped, quote=False))
+        elif bold is not None:
+            parts.append(f"<strong>{render_inline(bold)}</strong>")
+        else:
+            parts.append(f'<a href="{html.escape(link_url)}" target="_blank" {LINK_STYLE}>{render_inline(link_text)}</a>')
+        pos = match.end()
+
+    parts.append(html.escape(text[pos:], quote=False))
+    return "".join(parts)
+
+def plain_text(text):
+    """
+    Return inline Markdown as plain text: markup and link targets dropped
+    """
+    text = re.sub(r'\[([^\]]+)\]\([^)\s]+\)', r'\1', text)
+    return re.sub(r'\\(.)', r'\1', text.replace("**", ""))
+
+def render_pointer(text):
+    """
+    Render a "👉 ..." line: the whole line links to its one Markdown link, as
+    in the hand-built newsletters
+    """
+    text = text[len(POINTER):].strip()
+    links = re.findall(r'\[[^\]]+\]\(([^)\s]+)\)', text)
+    if len(links) != 1:
+        return f"{POINTER} {render_inline(text)}"
+    return (f'{POINTER} <a href="{html.escape(links[0])}" target="_blank" style="font-weight:500;" '
+            f'class="btn-link btn-link-dark">{html.escape(plain_text(text), quote=False)} →</a>')
+
+def section_icon(heading, icons=SECTION_ICONS, default=DEFAULT_SECTION_ICON):
+    name = next((icon for pattern, icon in icons if pattern.search(heading)), default)
+    return name, f"{BASE_URL}/assets/images/icons/{name}.png"
+
+def strip_bold(text):
+    """
+    Return the text of a line that is entirely **bold**, or None
+    """
+    match = re.fullmatch(r'\*\*(.+)\*\*', text.strip())
+    return match.group(1) if match else None
+
+def parse_blocks(lines):
+    """
+    Group Markdown lines into paragraph and list blocks.
+    Returns [("p", text)] and [("ul", [(text, [child texts])])] entries.
+    """
+    blocks = []
+    paragraph = []
+    items = None
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(("p", " ".join(paragraph)))
+            paragraph.clear()
+
+    for line in lines:
+        stripped = line.strip()
+        item = re.match(r'^(\s*)[*-]\s+(.*)$', line)
+
+        if not stripped or stripped == "---":
+            flush_paragraph()
+            items = None
+        elif item:
+            flush_paragraph()
+            indent, text = item.groups()
+            if indent and items:
+                items[-1][1].append(text.strip())
+            else:
+                if items is None:
+                    items = []
+                    blocks.append(("ul", items))
+                items.append((text.strip(), []))
+        else:
+            items = None
+            paragraph.append(stripped)
+
+    flush_paragraph()
+    return blocks
+
+def parse_newsletter(text):
+    """
+    Parse a partner newsletter into its subject, greeting, intro blocks and
+    (heading, blocks) sections
+    """
+    chunks = re.split(r'^###\s+(.+)$', text, flags=re.M)
+    # chunks: [preamble, heading1, body1, heading2, body2, ...]
+    headings = [strip_bold(h) or h.strip() for h in chunks[1::2]]
+    bodies = chunks[2::2]
+
+    if not headings:
+        raise ValueError("no '###' headings found")
+
+    intro_lines = bodies[0].splitlines()
+    subject = ""
+    greeting = ""
+    rest = []
+
+    for line in intro_lines:
+        subject_match = re.match(r'^\*\*Subject:\*\*\s*(.+)$', line.strip())
+        if subject_match and not subject:
+            subject = subject_match.group(1).strip()
+        elif not greeting and strip_bold(line):
+            greeting = strip_bold(line)
+        else:
+            rest.append(line)
+
+    sections = [(heading, parse_blocks(body.splitlines()))
+                for heading, body in zip(headings[1:], bodies[1:])]
+
+    return {
+        "title": headings[0],
+        "subject": subject,
+        "greeting": greeting,
+        "intro": parse_blocks(rest),
+        "sections": sections,
+    }
+
+def render_blocks(blocks, indent="                          "):
+    """
+    Render paragraph and list blocks with the newsletter's inline styles
+    """
+    out = []
+    for kind, value in blocks:
+        if kind == "p":
+            out.append(f'{indent}<p style="margin:0 0 12px; font-size:16px; font-weight:400; line-height:1.6; color:#64748b;" class="dm-muted">\n'
+                       f'{indent}  {render_inline(value)}\n'
+                       f'{indent}</p>')
+        else:
+            out.append(f'{indent}<ul style="margin:0 0 12px; padding-left:18px; color:#64748b; font-size:15px; font-weight:400; line-height:1.7;" class="dm-muted">')
+            for text, children in value:
+                child_html = "".join(f'<p style="margin:8px 0 0;">{render_pointer(c)}</p>'
+                                     for c in children if c.startswith(POINTER))
+                nested = [c for c in children if not c.startswith(POINTER)]
+                if nested:
+                    child_items = "".join(f'<li style="margin:4px 0; list-style:none;">{render_inline(c)}</li>' for c in nested)
+                    child_html += f'<ul style="margin:4px 0 0; padding-left:0;">{child_items}</ul>'
+                out.append(f'{indent}  <li style="margin:8px 0;">{render_inline(text)}{child_html}</li>')
+            out.append(f'{indent}</ul>')
+    return "\n".join(out)
+
+def card_items(blocks):
+    """
+    Return [(title, text)] when the blocks end in a list whose items all lead
+    with a bold "**Title:**", else None
+    """
+    if not blocks or blocks[-1][0] != "ul":
+        return None
+    items = [CARD_ITEM_PATTERN.match(text) for text, _ in blocks[-1][1]]
+    if not all(items):
+        return None
+    return [(match.group(1).strip(), match.group(2).strip()) for match in items]
+
+def render_cards(items):
+    rows = []
+    for start in range(0, len(items), CARDS_PER_ROW):
+        row = items[start:start + CARDS_PER_ROW]
+        cards = []
+        for position, (title, text) in enumerate(row):
+            name, icon = section_icon(title, CARD_ICONS, DEFAULT_CARD_ICON)
+            cards.append(template_engine.render(CARD_TEMPLATE, {
+                "padding": " padding-right:12px;" if position < len(row) - 1 else "",
+                "icon": icon,
+                "name": name,
+                "title": render_inline(title),
+                "text": render_inline(text),
+            }))
+        rows.append(template_engine.render(CARD_ROW_TEMPLATE, {"cards": "".join(cards)}))
+    return "\n".join(rows)
+
+def render_section_body(heading, blocks):
+    cards = card_items(blocks) if CARD_SECTION_PATTERN.search(heading) else None
+    if cards is None:
+        return render_blocks(blocks)
+    return "\n".join(part for part in (render_blocks(blocks[:-1]), render_cards(cards)) if part)
+
+def headline_parts(subject):
+    """
+    Split the subject into the accented lead-in and the rest of the headline
+    """
+    if ":" in subject:
+        accent, rest = subject.split(":", 1)
+        return accent.strip() + ":", rest.strip()
+    return "", subject
+
+def partner_key(md_path):
+    """
+    Return the registry key for a Newsletter-<Key>.md file
+    """
+    name = os.path.splitext(os.path.basename(md_path))[0]
+    return name[len("Newsletter-"):] if name.startswith("Newsletter-") else name
+
+def load_registry(path=registry_path):
+    """
+    Load the partner registry
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def partner_info(registry, key):
+    """
+    Return the registry entry for a partner, falling back to values derived
+    from the file name so new partners work before they are registered
+    """
+    info = dict(registry.get("defaults", {}))
+    info.update({
+        "name": key,
+        "slug": f"zomo-health-{re.sub(r'[^a-z0-9]+', '-', key.lower()).strip('-')}-template",
+        "logo": "",
+    })
+    info.update(registry.get("partners", {}).get(key, {}))
+    return info
+
+def build_values(newsletter, partner):
+    """
+    Build the layout slot values for one partner newsletter
+    """
+    subject = newsletter["subject"] or newsletter["title"]
+    accent, headline = headline_parts(subject)
+    month = re.match(r'Your (\w+) Partner Update', subject)
+
+    sections = []
+    issue_items = []
+    for index, (heading, blocks) in enumerate(newsletter["sections"]):
+        if heading in LAYOUT_SECTIONS:
+            continue
+        body = render_section_body(heading, blocks)
+        if index == 0 and partner.get("logo"):
+            body = template_engine.render(LOGO_TEMPLATE, partner) + body
+        if index == 0 and partner.get("cta"):
+            body += template_engine.render(CTA_TEMPLATE, partner["cta"])
+        sections.append(template_engine.render(SECTION_TEMPLATE, {
+            "title": heading,
+            "heading": render_inline(heading),
+            "body": body,
+        }))
+        name, icon = section_icon(heading)
+        issue_items.append(template_engine.render(ISSUE_ITEM_TEMPLATE, {
+            "icon": icon,
+            "name": name,
+            "text": render_inline(heading),
+        }))
+
+    greeting = template_engine.render(GREETING_TEMPLATE, {
+        "greeting": render_inline(newsletter["greeting"] or "Dear Valued Partner,"),
+        "intro": render_blocks(newsletter["intro"], indent="              "),
+    })
+
+    return {
+        "subject": subject,
+        "preheader": partner.get("preheader") or
+            f"Your {month.group(1) if month else 'latest'} partner update from ZOMO Health—news, wins, and resources inside.",
+        "issue_date": partner.get("issue_date", ""),
+        "headline_accent": accent,
+        "headline": headline,
+        "hero_image": partner.get("hero_image", ""),
+        "slug": partner["slug"],
+        "greeting": greeting,
+        "issue_items": "\n".join(issue_items),
+        "sections": "".join(sections),
+    }
+
+def compile_newsletter(md_path, out_dir, registry, layout):
+    """
+    Render one Markdown newsletter through the compiled layout and write it to
+    out_dir. Returns a result dict; errors are reported rather than raised.
+    """
+    result = {"source": md_path, "output": None, "error": None}
+
+    try:
+        partner = partner_info(registry, partner_key(md_path))
+
+        with open(md_path, 'r', encoding='utf-8') as f:
+            newsletter = parse_newsletter(f.read())
+
+        content = template_engine.render(layout, build_values(newsletter, partner))
+
+        out_path = os.path.join(out_dir, f"{partner['slug']}.html")
+        with open(out_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        result["output"] = out_path
+    except Exception as e:
+        result["error"] = str(e)
+
+    return result
+
+def compile_all(md_paths, out_dir, workers=None):
+    """
+    Compile every newsletter, in parallel when there is more than one
+    """
+    registry = load_registry()
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Loaded once for the batch; workers get the compiled fragments, not the file
+    layout = template_engine.load_template(layout_path)
+
+    if workers == 1 or len(md_paths) == 1:
+        return [compile_newsletter(p, out_dir, registry, layout) for p in md_paths]
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(md_paths) // (workers * 4))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(compile_newsletter, md_paths,
+                                 [out_dir] * len(md_paths),
+                                 [registry] * len(md_paths),
+                                 [layout] * len(md_paths),
+                                 chunksize=chunksize))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile partner newsletters from docs/versions/*.md")
+    parser.add_argument("sources", nargs="*", help="Markdown files (default: docs/versions/Newsletter-*.md)")
+    parser.add_argument("--out", default=default_out_dir, help=f"output directory (default: {default_out_dir})")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    sources = args.sources or sorted(glob.glob(os.path.join(versions_dir, "Newsletter-*.md")))
+
+    if not sources:
+        print(f"❌ No newsletter sources found in {versions_dir}")
+        return 1
+
+    print(f"📰 Compiling {len(sources)} partner newsletters into {args.out}...")
+    results = compile_all(sources, args.out, args.workers)
+
+    errors = [r for r in results if r["error"]]
+    for r in results:
+        if r["error"]:
+            print(f"❌ Error compiling {r['source']}: {r['error']}")
+        else:
+            print(f"✅ {r['source']} → {r['output']}")
+
+    print("=" * 50)
+    print(f"✅ Compiled {len(results) - len(errors)} of {len(results)} newsletters")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
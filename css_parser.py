@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Small CSS parser and selector matcher shared by the CSS build stages.
+
+It understands what the email templates actually use: plain rules, nested
+at-rules such as @media, opaque at-rules such as @font-face, and selectors
+built from type, class, id and attribute selectors joined by descendant,
+child and sibling combinators. Selectors with pseudo-classes or
+pseudo-elements are parsed but reported as not statically matchable.
+
+Parsed stylesheets are cached by content hash, so templates that share the
+same CSS only pay for one parse.
+"""
+
+import re
+import hashlib
+from html.parser import HTMLParser
+
+# In-process cache of parsed stylesheets, keyed by content hash
+_stylesheet_cache = {}
+
+# Cache counters, reported by the build stages
+cache_stats = {"parses": 0, "parse_hits": 0}
+
+COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+
+# At-rules whose block contains nested rules rather than declarations
+NESTED_AT_RULES = {"media", "supports", "document", "-moz-document"}
+
+def strip_comments(css):
+    """
+    Remove /* ... */ comments
+    """
+    return COMMENT_PATTERN.sub('', css)
+
+def split_top_level(text, separator):
+    """
+    Split text on a separator that is not inside quotes, parentheses or brackets
+    """
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote and text[i - 1] != "\\":
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth = max(0, depth - 1)
+        elif ch == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+
+    parts.append(text[start:])
+    return parts
+
+def parse_declarations(text):
+    """
+    Parse "prop: value; ..." into [(prop, value, important)]
+    """
+    declarations = []
+    for part in split_top_level(text, ";"):
+        if ":" not in part:
+            continue
+        prop, value = part.split(":", 1)
+        prop = prop.strip().lower()
+        value = value.strip()
+        if not prop or not value:
+            continue
+        important = False
+        lowered = value.lower()
+        if lowered.endswith("!important"):
+            important = True
+            value = value[:lowered.rindex("!important")].rstrip()
+        declarations.append((prop, value, important))
+    return declarations
+
+def serialize_declarations(declarations, separator="; "):
+    """
+    Serialize [(prop, value, important)] back into declaration text
+    """
+    return separator.join(f"{prop}:{value}{' !important' if important else ''}"
+                          for prop, value, important in declarations)
+
+def find_block_end(css, open_index):
+    """
+    Return the index of the brace closing the block opened at open_index
+    """
+    depth = 0
+    quote = None
+    for i in range(open_index, len(css)):
+        ch = css[i]
+        if quote:
+            if ch == quote and css[i - 1] != "\\":
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(css)
+
+def parse_rules(css):
+    """
+    Parse comment-free CSS into a list of items:
+      {"type": "rule", "selectors": [...], "declarations": [...]}
+      {"type": "at", "name": ..., "prelude": ..., "rules": [...]}   nested at-rule
+      {"type": "at", "name": ..., "prelude": ..., "block": "..."}   opaque at-rule
+      {"type": "at", "name": ..., "prelude": ..., "block": None}    statement (@import)
+    """
+    items = []
+    pos = 0
+    length = len(css)
+
+    while pos < length:
+        brace = css.find("{", pos)
+        semicolon = css.find(";", pos)
+
+        head = css[pos:brace if brace != -1 else length].strip()
+
+        # Statement at-rules (@import, @charset) end at the semicolon
+        if css[pos:].lstrip().startswith("@") and semicolon != -1 and (brace == -1 or semicolon < brace):
+            statement = css[pos:semicolon].strip()
+            name, _, prelude = statement[1:].partition(" ")
+            items.append({"type": "at", "name": name.lower(), "prelude": prelude.strip(), "block": None})
+            pos = semicolon + 1
+            continue
+
+        if brace == -1:
+            break
+
+        end = find_block_end(css, brace)
+        body = css[brace + 1:end]
+
+        if head.startswith("@"):
+            name, _, prelude = head[1:].partition(" ")
+            name = name.lower()
+            if name in NESTED_AT_RULES:
+                items.append({"type": "at", "name": name, "prelude": prelude.strip(), "rules": parse_rules(body)})
+            else:
+                items.append({"type": "at", "name": name, "prelude": prelude.strip(), "block": body.strip()})
+        elif head:
+            selectors = [s.strip() for s in split_top_level(head, ",") if s.strip()]
+            items.append({"type": "rule", "selectors": selectors, "declarations": parse_declarations(body)})
+
+        pos = end + 1
+
+    return items
+
+def parse_stylesheet(css):
+    """
+    Parse a stylesheet, reusing the cached result for identical CSS text.
+    Callers must treat the result as read-only.
+    """
+    key = hashlib.sha256(css.encode('utf-8')).hexdigest()
+    cached = _stylesheet_cache.get(key)
+    if cached is None:
+        cache_stats["parses"] += 1
+        cached = parse_rules(strip_comments(css))
+        _stylesheet_cache[key] = cached
+    else:
+        cache_stats["parse_hits"] += 1
+    return cached
+
+def serialize_rules(items, indent="    "):
+    """
+    Serialize parsed items back to CSS, one rule per line
+    """
+    lines = []
+    for item in items:
+        if item["type"] == "rule":
+            lines.append(f"{indent}{', '.join(item['selectors'])} {{ {serialize_declarations(item['declarations'])}; }}")
+        elif item.get("rules") is not None:
+            lines.append(f"{indent}@{item['name']} {item['prelude']} {{")
+            lines.append(serialize_rules(item["rules"], indent + "  "))
+            lines.append(f"{indent}}}")
+        elif item.get("block") is not None:
+            lines.append(f"{indent}@{item['name']} {item['prelude']} {{ {item['block']} }}".replace("  ", " "))
+        else:
+            lines.append(f"{indent}@{item['name']} {item['prelude']};")
+    return "\n".join(line for line in lines if line.strip())
+
+# --- Selectors ---------------------------------------------------------------
+
+SIMPLE_SELECTOR_PATTERN = re.compile(r'''
+    (?P<type>\*|[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<val>"[^"]*"|'[^']*'|[^\]\s]+)\s*(?P<flag>i)?\s*)?\]
+  | (?P<pseudo>::?[\w-]+(?:\([^)]*\))?)
+''', re.X)
+
+COMBINATOR_PATTERN = re.compile(r'\s*([>+~])\s*|\s+')
+
+_selector_cache = {}
+
+def parse_selector(selector):
+    """
+    Parse a selector into [(combinator, compound), ...] from left to right.
+    A compound is {"type", "id", "classes", "attrs", "pseudo"}. Returns None
+    for selectors this parser cannot represent.
+    """
+    cached = _selector_cache.get(selector)
+    if cached is not None or selector in _selector_cache:
+        return cached
+
+    parts = []
+    combinator = None
+    pos = 0
+    text = selector.strip()
+    compound = None
+
+    while pos < len(text):
+        match = SIMPLE_SELECTOR_PATTERN.match(text, pos)
+        if match:
+            if compound is None:
+                compound = {"type": None, "id": None, "classes": [], "attrs": [], "pseudo": []}
+            if match.group("type"):
+                compound["type"] = match.group("type").lower()
+            elif match.group("id"):
+                compound["id"] = match.group("id")
+            elif match.group("cls"):
+                compound["classes"].append(match.group("cls"))
+            elif match.group("attr"):
+                value = match.group("val")
+                if value and value[0] in "\"'":
+                    value = value[1:-1]
+                compound["attrs"].append((match.group("attr").lower(), match.group("op"), value,
+                                          bool(match.group("flag"))))
+            else:
+                compound["pseudo"].append(match.group("pseudo"))
+            pos = match.end()
+            continue
+
+        comb = COMBINATOR_PATTERN.match(text, pos)
+        if comb and comb.end() > pos and compound is not None:
+            parts.append((combinator, compound))
+            combinator = comb.group(1) or " "
+            compound = None
+            pos = comb.end()
+            continue
+
+        _selector_cache[selector] = None
+        return None
+
+    if compound is None:
+        _selector_cache[selector] = None
+        return None
+
+    parts.append((combinator, compound))
+    _selector_cache[selector] = parts
+    return parts
+
+def specificity(selector):
+    """
+    Return the (ids, classes/attributes/pseudo-classes, types) specificity
+    """
+    parts = parse_selector(selector)
+    if not parts:
+        return (0, 0, 0)
+    ids = classes = types = 0
+    for _, compound in parts:
+        ids += 1 if compound["id"] else 0
+        classes += len(compound["classes"]) + len(compound["attrs"])
+        for pseudo in compound["pseudo"]:
+            if pseudo.startswith("::"):
+                types += 1
+            else:
+                classes += 1
+        if compound["type"] and compound["type"] != "*":
+            types += 1
+    return (ids, classes, types)
+
+def is_static_selector(selector):
+    """
+    True if the selector can be matched against a static document
+    (no pseudo-classes or pseudo-elements)
+    """
+    parts = parse_selector(selector)
+    return parts is not None and not any(compound["pseudo"] for _, compound in parts)
+
+def _match_attr(element, name, op, expected, ignore_case):
+    value = element["attrs"].get(name)
+    if value is None:
+        return False
+    if op is None:
+        return True
+    if ignore_case:
+        value = value.lower()
+        expected = expected.lower()
+    if op == "=":
+        return value == expected
+    if op == "~=":
+        return expected in value.split()
+    if op == "|=":
+        return value == expected or value.startswith(expected + "-")
+    if op == "^=":
+        return bool(expected) and value.startswith(expected)
+    if op == "$=":
+        return bool(expected) and value.endswith(expected)
+    if op == "*=":
+        return bool(expected) and expected in value
+    return False
+
+def match_compound(element, compound):
+    """
+    Match one compound selector against an element (pseudo-classes ignored)
+    """
+    if compound["type"] and compound["type"] != "*" and element["tag"] != compound["type"]:
+        return False
+    if compound["id"] and element["attrs"].get("id") != compound["id"]:
+        return False
+    if compound["classes"]:
+        classes = element["classes"]
+        if not all(c in classes for c in compound["classes"]):
+            return False
+    for name, op, expected, ignore_case in compound["attrs"]:
+        if not _match_attr(element, name, op, expected, ignore_case):
+            return False
+    return True
+
+def _match_from(elements, parts, index, element):
+    """
+    Match parts[:index + 1] with parts[index] anchored on element
+    """
+    combinator, compound = parts[index]
+    if not match_compound(element, compound):
+        return False
+    if index == 0:
+        return True
+
+    if combinator == ">":
+        parent = element["parent"]
+        return parent is not None and _match_from(elements, parts, index - 1, elements[parent])
+
+    if combinator == " ":
+        parent = element["parent"]
+        while parent is not None:
+            if _match_from(elements, parts, index - 1, elements[parent]):
+                return True
+            parent = elements[parent]["parent"]
+        return False
+
+    if combinator == "+":
+        prev = element["prev"]
+        return prev is not None and _match_from(elements, parts, index - 1, elements[prev])
+
+    if combinator == "~":
+        prev = element["prev"]
+        while prev is not None:
+            if _match_from(elements, parts, index - 1, elements[prev]):
+                return True
+            prev = elements[prev]["prev"]
+        return False
+
+    return False
+
+def matches(elements, element, selector):
+    """
+    True if the element (from an element list built by the HTML scanner)
+    matches the selector
+    """
+    parts = parse_selector(selector)
+    if not parts:
+        return False
+    return _match_from(elements, parts, len(parts) - 1, element)
+
+def uses_siblings(selector):
+    """
+    True if the selector depends on an element's siblings, not just its ancestors
+    """
+    parts = parse_selector(selector) or []
+    return any(combinator in ("+", "~") for combinator, _ in parts)
+
+def referenced_attributes(selectors):
+    """
+    Return the attribute names (besides id and class) tested by the selectors
+    """
+    names = set()
+    for selector in selectors:
+        for _, compound in parse_selector(selector) or []:
+            names.update(name for name, _, _, _ in compound["attrs"])
+    names.discard("id")
+    names.discard("class")
+    return names
+
+# --- HTML scanning -----------------------------------------------------------
+
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+                 "link", "meta", "param", "source", "track", "wbr"}
+
+# Interned ancestor-path ids shared across documents, so match results for
+# structurally identical elements can be reused between templates
+_path_ids = {}
+
+class _ElementScanner(HTMLParser):
+    """
+    Build a flat element list with parent/sibling links and start-tag offsets
+    """
+
+    def __init__(self, text, relevant_attrs):
+        super().__init__(convert_charrefs=True)
+        self.text = text
+        self.relevant_attrs = relevant_attrs
+        self.line_offsets = [0]
+        for match in re.finditer("\n", text):
+            self.line_offsets.append(match.end())
+        self.elements = []
+        self.stack = []
+        self.last_child = {None: None}
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self.line_offsets[line - 1] + column
+
+    def _add(self, tag, attrs):
+        start = self._offset()
+        raw = self.get_starttag_text() or ""
+        attr_map = {}
+        for name, value in attrs:
+            attr_map.setdefault(name.lower(), value if value is not None else "")
+
+        parent = self.stack[-1] if self.stack else None
+        parent_path = self.elements[parent]["path"] if parent is not None else 0
+        classes = frozenset(attr_map.get("class", "").split())
+        signature = (tag, attr_map.get("id"), classes,
+                     tuple(sorted((k, v) for k, v in attr_map.items() if k in self.relevant_attrs)))
+        path = _path_ids.setdefault((parent_path, signature), len(_path_ids) + 1)
+
+        index = len(self.elements)
+        self.elements.append({
+            "index": index,
+            "tag": tag,
+            "attrs": attr_map,
+            "classes": classes,
+            "parent": parent,
+            "prev": self.last_child.get(parent),
+            "start": start,
+            "end": start + len(raw),
+            "path": path,
+        })
+        self.last_child[parent] = index
+        return index
+
+    def handle_starttag(self, tag, attrs):
+        index = self._add(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(index)
+            self.last_child[index] = None
+
+    def handle_startendtag(self, tag, attrs):
+        self._add(tag, attrs)
+
+    def parse_html_declaration(self, i):
+        # A stray <![endif]--> ends at its own ">"; the base class would scan
+        # ahead to the next "]>" and swallow everything in between
+        if self.rawdata.startswith("<![", i) and not self.rawdata.startswith("<![CDATA[", i):
+            end = self.rawdata.find(">", i)
+            return end + 1 if end >= 0 else -1
+        return super().parse_html_declaration(i)
+
+    def handle_endtag(self, tag):
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.elements[self.stack[depth]]["tag"] == tag:
+                del self.stack[depth:]
+                return
+
+def scan_elements(text, relevant_attrs=()):
+    """
+    Return the document's elements in source order. Each element has its tag,
+    attributes, classes, parent and previous-sibling indexes, the offsets of
+    its start tag and an interned ancestor-path id covering the tag, id,
+    classes and the given relevant attributes of it and its ancestors.
+    """
+    scanner = _ElementScanner(text, set(relevant_attrs))
+    scanner.feed(text)
+    scanner.close()
+    return scanner.elements
@@ -1,118 +1,256 @@
 #!/usr/bin/env python3
 """
-Script to download Material Icons as PNG files for email templates.
+Script to download Material Icons as SVG files for email templates.
 This solves the issue where Gmail and other email clients don't support external font loading.
+
+The icon list is derived from the icons the templates in emails/** actually
+reference (icon images, baked icons and any Material Icons spans still left).
+Downloads share one pooled session with bounded concurrency. Responses are
+kept in a content-addressed cache under .cache/icons with their ETag and
+Last-Modified headers, so a refresh sends conditional requests and unchanged
+icons cost a 304 (or nothing, while the cached copy is younger than --max-age).
+
+Usage:
+    python download_material_icons.py
+    python download_material_icons.py --refresh                  # revalidate every icon now
+    python download_material_icons.py --base-url http://127.0.0.1:8000 --workers 4
 """
 
 import os
+import re
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from urllib.parse import quote
+from requests.adapters import HTTPAdapter
 
-# Create icons directory if it doesn't exist
+# Where the templates load icons from
 icons_dir = "assets/images/icons"
-os.makedirs(icons_dir, exist_ok=True)
-
-# List of Material Icons used in the email templates
-icons_to_download = [
-    "handshake",
-    "business", 
-    "new_releases",
-    "person",
-    "emoji_events",
-    "health_and_safety",
-    "security",
-    "speed",
-    "integration_instructions",
-    "favorite",
-    "trending_up",
-    "article",
-    "linkedin",
-    "download",
-    "arrow_back",
-    "monitor",
-    "keyboard_arrow_down",
-    "light_mode",
-    "dark_mode"
-]
-
-def download_icon(icon_name, size=24, color="black"):
+
+cache_dir = ".cache/icons"
+index_path = os.path.join(cache_dir, "index.json")
+
+# Google Material Icons endpoint; override with --base-url (e.g. a local stand-in server)
+DEFAULT_BASE_URL = "https://fonts.gstatic.com/s/i"
+
+# Icon families tried in order; the one that worked is remembered per icon
+FAMILIES = ["materialicons", "materialiconsoutlined", "materialiconsround"]
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 10
+
+# Cached icons younger than this are used without contacting the server
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+ICON_REFERENCE_PATTERN = re.compile(
+    r'assets/images/icons/(?:baked/)?([a-z0-9_]+)(?:-\d+-[0-9a-f]{6}@\dx\.[0-9a-f]+)?\.(?:svg|png)'
+)
+MATERIAL_ICON_SPAN_PATTERN = re.compile(
+    r'<span\s+class="material-icons"[^>]*>\s*([a-z0-9_]+)\s*</span>'
+)
+
+def find_used_icons():
+    """
+    Return the sorted names of every icon referenced by the templates in emails/**
+    """
+    icons = set()
+    for template in glob.glob(os.path.join("emails", "**", "*.html"), recursive=True):
+        if template.endswith(".min.html"):
+            continue
+        with open(template, 'r', encoding='utf-8') as f:
+            content = f.read()
+        icons.update(ICON_REFERENCE_PATTERN.findall(content))
+        icons.update(MATERIAL_ICON_SPAN_PATTERN.findall(content))
+    return sorted(icons)
+
+def icon_url(base_url, family, icon_name):
+    return f"{base_url.rstrip('/')}/{family}/{icon_name}/v1/24px.svg"
+
+def load_index():
+    """
+    Load the {icon: {url, etag, last_modified, sha256, checked}} cache index
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_index(index):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+def object_path(digest):
+    return os.path.join(cache_dir, "objects", f"{digest}.svg")
+
+def store_object(data):
+    """
+    Add content to the content-addressed cache and return its hash
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return digest
+
+def make_session(workers):
+    """
+    One session for every download, with a connection pool sized to the worker count
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def fetch_icon(session, icon_name, entry, base_url, timeout, max_age):
     """
-    Download a Material Icon as PNG from Google's Material Icons API
+    Fetch one icon, revalidating the cached copy when there is one.
+    Returns (status, entry) where status is "fresh", "not-modified",
+    "downloaded" or an error message.
     """
-    # Google Material Icons API endpoint
-    base_url = "https://fonts.gstatic.com/s/i/materialicons"
-    
-    # Try different approaches to get the icon
-    urls_to_try = [
-        # Direct PNG approach
-        f"https://fonts.gstatic.com/s/i/materialicons/{icon_name}/v1/24px.svg",
-        # Alternative approach
-        f"https://fonts.gstatic.com/s/i/materialiconsoutlined/{icon_name}/v1/24px.svg",
-        # Another alternative
-        f"https://fonts.gstatic.com/s/i/materialiconsround/{icon_name}/v1/24px.svg",
-    ]
-    
-    for url in urls_to_try:
+    cached = entry is not None and os.path.exists(object_path(entry["sha256"]))
+    if cached and entry.get("base_url") == base_url and time.time() - entry.get("checked", 0) < max_age:
+        return "fresh", entry
+
+    # Try the family that worked last time first
+    families = list(FAMILIES)
+    if cached and entry.get("family") in families:
+        families.remove(entry["family"])
+        families.insert(0, entry["family"])
+
+    errors = []
+    for family in families:
+        url = icon_url(base_url, family, icon_name)
+        headers = {}
+        if cached and entry.get("url") == url:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
         try:
-            print(f"Trying to download {icon_name} from: {url}")
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                # Save as SVG first
-                svg_path = os.path.join(icons_dir, f"{icon_name}.svg")
-                with open(svg_path, 'wb') as f:
-                    f.write(response.content)
-                print(f"✅ Downloaded {icon_name}.svg")
-                return True
-            else:
-                print(f"❌ Failed to download {icon_name} (status: {response.status_code})")
-                
-        except Exception as e:
-            print(f"❌ Error downloading {icon_name}: {e}")
+            response = session.get(url, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            errors.append(f"{url}: {e}")
             continue
-    
-    return False
 
-def create_png_from_svg(svg_path, png_path, size=24):
+        if response.status_code == 304 and headers:
+            return "not-modified", dict(entry, checked=time.time())
+
+        if response.status_code == 200:
+            return "downloaded", {
+                "url": url,
+                "base_url": base_url,
+                "family": family,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": store_object(response.content),
+                "checked": time.time(),
+            }
+
+        errors.append(f"{url}: status {response.status_code}")
+
+    return "; ".join(errors) or "no URL to try", entry
+
+def install_icon(icon_name, entry):
     """
-    Convert SVG to PNG using a simple approach
-    For now, we'll just copy the SVG and let the browser handle it
+    Copy a cached icon into assets/images/icons if its content differs.
+    Returns True when the file was written.
     """
+    with open(object_path(entry["sha256"]), 'rb') as f:
+        data = f.read()
+
+    svg_path = os.path.join(icons_dir, f"{icon_name}.svg")
     try:
-        # For email compatibility, we'll use SVG directly
-        # Most modern email clients support SVG
-        return True
-    except Exception as e:
-        print(f"Error converting {svg_path} to PNG: {e}")
-        return False
+        with open(svg_path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+
+    os.makedirs(icons_dir, exist_ok=True)
+    with open(svg_path, 'wb') as f:
+        f.write(data)
+    return True
 
 def main():
+    parser = argparse.ArgumentParser(description="Download the Material Icons used by the email templates")
+    parser.add_argument("icons", nargs="*", help="icons to download (default: every icon used in emails/**)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL,
+                        help=f"icon server root (default: {DEFAULT_BASE_URL})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent downloads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="per-request timeout in seconds")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE,
+                        help="seconds a cached icon is used without revalidating (default: one day)")
+    parser.add_argument("--refresh", action="store_true", help="revalidate every cached icon now")
+    args = parser.parse_args()
+
+    icons = args.icons or find_used_icons()
+    if not icons:
+        print("❌ No icons referenced in emails/**")
+        return 1
+
     print("🎨 Downloading Material Icons for email templates...")
-    print(f"📁 Saving to: {icons_dir}")
+    print(f"📁 Saving to: {icons_dir} ({len(icons)} icons, {args.workers} workers, {args.base_url})")
     print()
-    
-    successful_downloads = 0
+
+    index = load_index()
+    max_age = 0 if args.refresh else args.max_age
+    counts = {"fresh": 0, "not-modified": 0, "downloaded": 0}
     failed_downloads = []
-    
-    for icon_name in icons_to_download:
-        print(f"Downloading {icon_name}...")
-        if download_icon(icon_name):
-            successful_downloads += 1
-        else:
-            failed_downloads.append(icon_name)
-        print()
-    
+    installed = 0
+    start = time.perf_counter()
+
+    with make_session(args.workers) as session, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            icon_name: executor.submit(fetch_icon, session, icon_name, index.get(icon_name),
+                                       args.base_url, args.timeout, max_age)
+            for icon_name in icons
+        }
+        for icon_name, future in futures.items():
+            status, entry = future.result()
+            if status not in counts:
+                print(f"❌ Failed to download {icon_name}: {status}")
+                failed_downloads.append(icon_name)
+                continue
+
+            counts[status] += 1
+            index[icon_name] = entry
+            if install_icon(icon_name, entry):
+                installed += 1
+                print(f"✅ Downloaded {icon_name}.svg")
+
+    save_index(index)
+    elapsed = time.perf_counter() - start
+
     print("=" * 50)
-    print(f"✅ Successfully downloaded: {successful_downloads} icons")
+    print(f"✅ {counts['downloaded']} downloaded, {counts['not-modified']} not modified (304), "
+          f"{counts['fresh']} fresh in cache; {installed} icon files updated in {elapsed:.2f}s")
     if failed_downloads:
         print(f"❌ Failed to download: {len(failed_downloads)} icons")
         print("Failed icons:", ", ".join(failed_downloads))
-    
-    print(f"\n📁 Icons saved to: {icons_dir}")
-    print("\nNext steps:")
-    print("1. Review the downloaded SVG files")
-    print("2. Run the template update script to replace Material Icons with local images")
-    print("3. Test in Gmail to ensure icons display correctly")
+        return 1
+
+    if installed:
+        print("\nNext steps:")
+        print("1. Review the downloaded SVG files")
+        print("2. Run rasterize_icons.py to rebuild the baked PNG icons")
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
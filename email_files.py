@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+What the tools that send or measure an email share about its HTML.
+
+The size analyzer, the MIME builder and the Mailchimp packager all need the
+HTML as a recipient gets it (the preview toolbars and scripts removed) and
+the local images it points at, and they and the linter skip the same
+category listing pages. They find all of it here rather than in each other,
+so none of those tools depends on another.
+"""
+
+import os
+import re
+
+import html_tokens
+
+# Base URL for the Vercel deployment
+BASE_URL = "https://zomo-emails.vercel.app"
+
+# Pages in a category directory that list templates rather than being one
+LISTING_PAGES = {"index.html", "templates.html"}
+
+# Image references: src/background attributes, srcset candidates and CSS url()
+IMAGE_ATTR_PATTERN = re.compile(r'''\s(?:src|background)\s*=\s*["']([^"']+)["']''', re.I)
+SRCSET_PATTERN = re.compile(r'''\ssrcset\s*=\s*["']([^"']+)["']''', re.I)
+CSS_URL_PATTERN = re.compile(r'''url\(\s*["']?([^"')]+)["']?\s*\)''', re.I)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp")
+
+# Preview toolbars (view switcher, download button) that never reach a recipient
+PREVIEW_CHROME_CLASSES = {"view-switcher", "bottom-nav"}
+
+def strip_preview_chrome(content):
+    """
+    Remove what only the browser preview needs: scripts, the view switcher
+    toolbar and the download button bar
+    """
+    edits = []
+    toolbar_depth = 0
+    toolbar_start = None
+    script_start = None
+    for token in html_tokens.tokenize(content):
+        if token.kind == "start" and token.name == "script":
+            script_start = token.start
+        elif token.kind == "end" and token.name == "script" and script_start is not None:
+            if toolbar_start is None:
+                edits.append((script_start, token.end, ""))
+            script_start = None
+        elif token.name != "div":
+            continue
+        elif token.kind == "start" and not token.self_closing:
+            if toolbar_start is None and PREVIEW_CHROME_CLASSES.intersection(token.classes()):
+                toolbar_start = token.start
+            if toolbar_start is not None:
+                toolbar_depth += 1
+        elif token.kind == "end" and toolbar_start is not None:
+            toolbar_depth -= 1
+            if toolbar_depth == 0:
+                edits.append((toolbar_start, token.end, ""))
+                toolbar_start = None
+    return html_tokens.apply_edits(content, edits)
+
+def image_references(content):
+    """
+    Return the distinct image URLs referenced by a document, in order
+    """
+    urls = IMAGE_ATTR_PATTERN.findall(content) + CSS_URL_PATTERN.findall(content)
+    for srcset in SRCSET_PATTERN.findall(content):
+        urls.extend(candidate.split()[0] for candidate in srcset.split(",") if candidate.strip())
+    return [url for url in dict.fromkeys(urls)
+            if url.split("?")[0].lower().endswith(IMAGE_EXTENSIONS)]
+
+def resolve_image(url, template_path):
+    """
+    Map an image URL to a file in this repository, or None for external images
+    """
+    if url.startswith(BASE_URL + "/"):
+        local = url[len(BASE_URL) + 1:]
+    elif re.match(r'^[a-z][a-z0-9+.-]*:|^//', url, re.I):
+        return None
+    elif url.startswith("/"):
+        local = url.lstrip("/")
+    else:
+        local = os.path.join(os.path.dirname(template_path), url)
+    return os.path.normpath(local.split("?")[0])
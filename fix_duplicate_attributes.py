@@ -7,6 +7,51 @@ import os
 import re
 import glob
 
+import html_tokens
+import transform_metrics
+
+# Attribute names as written by hand; anything else is debris of a broken edit (font-size:16px;")
+ATTRIBUTE_NAME_PATTERN = re.compile(r'^[a-zA-Z_:][\w:.-]*$')
+
+def clean_style(style):
+    """
+    Remove font-size declarations (meaningless on an img) from an inline style
+    """
+    style = re.sub(r'font-size:[^;]*;?', '', style)
+    style = re.sub(r';;+', ';', style)  # Remove double semicolons
+    return style.strip().strip(';').strip()
+
+def clean_img_tag(tag):
+    """
+    Fix one img tag that picked up font-size declarations: keep the first of
+    each duplicated attribute, drop malformed attribute debris and remove
+    font-size from the style
+    """
+    # Most tags are fine; checking the raw tag first avoids parsing their attributes
+    if "font-size:" not in tag.text:
+        return
+    
+    seen = set()
+    
+    def keep(attr):
+        name = attr.name.lower()
+        if name in seen or not ATTRIBUTE_NAME_PATTERN.match(attr.name):
+            return False
+        seen.add(name)
+        return True
+    
+    tag.keep_attributes(keep)
+    style = tag.get("style")
+    if style is not None and "font-size:" in style:
+        tag.set("style", clean_style(style))
+
+def clean_duplicate_attributes(content):
+    """
+    Collapse img tags that picked up duplicate or malformed attributes
+    """
+    return html_tokens.rewrite_tags(content, clean_img_tag, {"img"})
+
+@transform_metrics.instrumented("duplicate_attributes")
 def fix_duplicate_attributes(file_path):
     """
     Fix duplicate attributes in a template file
@@ -18,43 +63,7 @@ def fix_duplicate_attributes(file_path):
             content = f.read()
         
         original_content = content
-        
-        # Pattern to match img tags with duplicate attributes
-        # Look for img tags that have duplicate style attributes or malformed attributes
-        pattern = r'<img src="assets/images/icons/[^"]*\.svg"[^>]*style="[^"]*"[^>]*font-size:[^>]*>'
-        
-        def fix_img_tag(match):
-            img_tag = match.group(0)
-            
-            # Extract the src and alt attributes
-            src_match = re.search(r'src="([^"]*)"', img_tag)
-            alt_match = re.search(r'alt="([^"]*)"', img_tag)
-            
-            if not src_match:
-                return img_tag  # Return original if we can't parse it
-            
-            src = src_match.group(1)
-            alt = alt_match.group(1) if alt_match else ""
-            
-            # Extract the clean style attribute (the first one)
-            style_match = re.search(r'style="([^"]*)"', img_tag)
-            if style_match:
-                style = style_match.group(1)
-                # Clean up the style - remove any malformed parts
-                style = re.sub(r'font-size:[^;]*;?', '', style)
-                style = re.sub(r';;+', ';', style)  # Remove double semicolons
-                style = style.strip(';')
-            else:
-                style = "width:16px; height:16px; vertical-align:middle;"
-            
-            return f'<img src="{src}" alt="{alt}" style="{style}">'
-        
-        # Fix the img tags
-        content = re.sub(pattern, fix_img_tag, content)
-        
-        # Also fix any remaining malformed img tags
-        content = re.sub(r'<img src="([^"]*)" alt="([^"]*)" style="([^"]*)"[^>]*font-size:[^>]*>', 
-                        r'<img src="\1" alt="\2" style="\3">', content)
+        content = clean_duplicate_attributes(content)
         
         # Only write if content changed
         if content != original_content:
@@ -7,6 +7,9 @@ import os
 import re
 import glob
 
+import html_tokens
+import transform_metrics
+
 # Base URL for the Vercel deployment
 BASE_URL = "https://zomo-emails.vercel.app"
 
@@ -35,20 +38,20 @@ icon_mapping = {
     "content_copy": "assets/images/icons/content_copy.svg"
 }
 
-def create_icon_img_tag(icon_name, style_attrs=""):
+def create_icon_img_tag(icon_name, style=None):
     """
-    Create an img tag for the icon with proper styling
+    Create an img tag for the icon with proper styling, from the inline style
+    of the span it replaces
     """
     if icon_name not in icon_mapping:
         print(f"⚠️  Warning: No local icon found for '{icon_name}'")
-        return f'<span class="material-icons" {style_attrs}>{icon_name}</span>'
+        style_attr = f' style="{style}"' if style is not None else ""
+        return f'<span class="material-icons"{style_attr}>{icon_name}</span>'
     
     svg_path = f"{BASE_URL}/{icon_mapping[icon_name]}"
     
-    # Extract style attributes from the original span
-    style_match = re.search(r'style="([^"]*)"', style_attrs)
-    if style_match:
-        original_style = style_match.group(1)
+    if style is not None:
+        original_style = style
         # Convert font-size to width/height for img tag
         width_height = "16px"  # default
         if "font-size:24px" in original_style:
@@ -74,6 +77,28 @@ def create_icon_img_tag(icon_name, style_attrs=""):
     
     return f'<img src="{svg_path}" alt="{icon_name}" style="{new_style}">'
 
+def is_icon_span(tag):
+    return tag.name == "span" and "material-icons" in tag.classes()
+
+def replace_remaining_icons(content):
+    """
+    Replace any Material Icons spans left in the content with img tags
+    """
+    # Matches <span class="material-icons ..." ...>icon_name</span> whatever the attribute order
+    edits = []
+    for start, text, end in html_tokens.text_elements(content, {"span"}, is_icon_span):
+        icon_name = text.text.strip()
+        
+        # Skip if it's not a known icon
+        if icon_name not in icon_mapping:
+            continue
+        
+        edits.append((start.start, end.end, create_icon_img_tag(icon_name, start.get("style"))))
+    
+    # Replace all remaining Material Icons with local SVG images
+    return html_tokens.apply_edits(content, edits)
+
+@transform_metrics.instrumented("remaining_icons")
 def fix_remaining_icons(file_path):
     """
     Fix remaining Material Icons in a template file
@@ -85,23 +110,7 @@ def fix_remaining_icons(file_path):
             content = f.read()
         
         original_content = content
-        
-        # Pattern to match remaining Material Icons spans
-        # Matches: <span class="material-icons" ...>icon_name</span>
-        pattern = r'<span class="material-icons([^>]*)>([^<]+)</span>'
-        
-        def replace_icon(match):
-            style_attrs = match.group(1)
-            icon_name = match.group(2).strip()
-            
-            # Skip if it's not a known icon
-            if icon_name not in icon_mapping:
-                return match.group(0)  # Return original
-            
-            return create_icon_img_tag(icon_name, style_attrs)
-        
-        # Replace all remaining Material Icons with local SVG images
-        content = re.sub(pattern, replace_icon, content)
+        content = replace_remaining_icons(content)
         
         # Only write if content changed
         if content != original_content:
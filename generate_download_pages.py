@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Generate download-pages/*-download.html from the email templates.
+
+Each download page is the shared page shell from code-pages/template.html with
+the HTML-escaped source of one emails/** template inside <pre id="code-content">.
+The source is escaped in a single streaming pass, and only pages whose source,
+shell or generator changed since the last run are rebuilt (tracked in the
+build manifest).
+
+Usage:
+    python generate_download_pages.py            # rebuild stale pages
+    python generate_download_pages.py --force    # rebuild every page
+    python generate_download_pages.py --check    # verify pages match their sources
+"""
+
+import os
+import re
+import sys
+import glob
+import html
+import argparse
+
+import build_manifest
+
+emails_dir = "emails"
+download_dir = "download-pages"
+shell_path = "code-pages/template.html"
+
+# Manifest section holding the per-page records of this generator
+MANIFEST_SECTION = "download_pages"
+
+# Bump when the page layout changes in a way the shell hash does not capture
+GENERATOR_VERSION = "1"
+
+# Read size for the streaming escape
+CHUNK_SIZE = 1 << 16
+
+PRE_OPEN = '<pre id="code-content">'
+PRE_CLOSE = '</pre>'
+SHELL_PLACEHOLDER = PRE_OPEN + '<!-- HTML code will be inserted here -->' + PRE_CLOSE
+
+def find_sources():
+    """
+    Return every email template that gets a download page (catalog index pages excluded)
+    """
+    sources = glob.glob(os.path.join(emails_dir, "**", "*.html"), recursive=True)
+    return sorted(s for s in sources if is_source(s))
+
+def is_source(path):
+    """
+    Whether a file under emails/ gets a download page
+    """
+    return os.path.basename(path) != "index.html" and not path.endswith(".min.html")
+
+def download_page_path(source_path):
+    """
+    Map an email template to its download page
+    """
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(download_dir, f"{name}-download.html")
+
+def read_title(source_path):
+    """
+    Read the <title> of an email template without loading the whole file
+    """
+    with open(source_path, 'r', encoding='utf-8') as f:
+        head = f.read(4096)
+    match = re.search(r'<title>(.*?)</title>', head, re.S)
+    if match:
+        return html.unescape(match.group(1).strip())
+    return os.path.splitext(os.path.basename(source_path))[0].replace("-", " ").title()
+
+def load_shell(path=shell_path):
+    """
+    Split the page shell into the parts around the <pre> placeholder.
+    Returns (prefix, suffix); the title, heading and back link are filled per page.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        shell = f.read()
+
+    if SHELL_PLACEHOLDER not in shell:
+        raise ValueError(f"{path} has no {SHELL_PLACEHOLDER} placeholder")
+
+    prefix, suffix = shell.split(SHELL_PLACEHOLDER, 1)
+    return prefix + PRE_OPEN, PRE_CLOSE + suffix
+
+def fill_shell(prefix, source_path):
+    """
+    Fill in the per-page title, heading and back link of the shell prefix
+    """
+    heading = html.escape(f"{read_title(source_path)} - HTML Code", quote=False)
+    back_href = os.path.relpath(source_path, download_dir).replace(os.sep, "/")
+
+    prefix = prefix.replace('<title>Email HTML Code - ZOMO Health</title>', f'<title>{heading}</title>', 1)
+    prefix = prefix.replace('<h1>Email HTML Code</h1>', f'<h1>{heading}</h1>', 1)
+    prefix = prefix.replace('href="javascript:history.back()"', f'href="{html.escape(back_href)}"', 1)
+    return prefix
+
+def write_page(src, out, shell, source_path):
+    """
+    Write the page for the source text read from src to out, escaping it in a
+    single streaming pass
+    """
+    prefix, suffix = shell
+    out.write(fill_shell(prefix, source_path))
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), ""):
+        out.write(html.escape(chunk))
+    out.write(suffix)
+
+def render_page(source_path, page_path, shell):
+    """
+    Write one download page
+    """
+    tmp_path = f"{page_path}.tmp"
+
+    with open(source_path, 'r', encoding='utf-8', newline='') as src, \
+         open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+        write_page(src, out, shell, source_path)
+
+    os.replace(tmp_path, page_path)
+
+def extract_pre(page_content):
+    """
+    Return the escaped code inside <pre id="code-content">, or None if missing
+    """
+    start = page_content.find(PRE_OPEN)
+    if start == -1:
+        return None
+    start += len(PRE_OPEN)
+    end = page_content.find(PRE_CLOSE, start)
+    if end == -1:
+        return None
+    return page_content[start:end]
+
+def check_page(source_path, page_path):
+    """
+    Verify that html.unescape of the page's <pre> is byte-identical to its source.
+    Returns an error message, or None if the page is in sync.
+    """
+    try:
+        with open(page_path, 'r', encoding='utf-8', newline='') as f:
+            escaped = extract_pre(f.read())
+    except OSError:
+        return "download page is missing"
+
+    if escaped is None:
+        return "no <pre id=\"code-content\"> block"
+
+    with open(source_path, 'rb') as f:
+        source = f.read()
+
+    if html.unescape(escaped).encode('utf-8') != source:
+        return "escaped code differs from source"
+
+    return None
+
+def generator_fingerprints(shell):
+    """
+    Fingerprint everything besides the source that determines a page's bytes
+    """
+    return {
+        "generator": build_manifest.pass_fingerprint(render_page, GENERATOR_VERSION),
+        "shell": build_manifest.content_hash(shell[0] + shell[1]),
+    }
+
+def is_page_current(entry, source_path, page_path, fingerprints):
+    """
+    A page is current when its source and generator are unchanged and the
+    page itself has not been edited or removed since it was written
+    """
+    up_to_date, refreshed = build_manifest.is_up_to_date(entry, source_path, fingerprints)
+    if not up_to_date:
+        return False, None
+    if build_manifest.file_signature(page_path) != entry.get("page_signature"):
+        return False, None
+    return True, refreshed
+
+def generate(sources, force=False, manifest_path=build_manifest.MANIFEST_PATH):
+    """
+    Rebuild the download pages for the given sources.
+    Returns (rebuilt, skipped) lists of page paths.
+    """
+    shell = load_shell()
+    fingerprints = generator_fingerprints(shell)
+
+    manifest = build_manifest.load_manifest(manifest_path)
+    section = build_manifest.get_section(manifest, MANIFEST_SECTION)
+
+    rebuilt = []
+    skipped = []
+
+    for source_path in sources:
+        page_path = download_page_path(source_path)
+
+        if not force:
+            current, refreshed = is_page_current(section.get(page_path), source_path, page_path, fingerprints)
+            if current:
+                section[page_path] = refreshed
+                skipped.append(page_path)
+                continue
+
+        render_page(source_path, page_path, shell)
+
+        entry = build_manifest.make_entry(source_path, build_manifest.file_hash(source_path), fingerprints)
+        entry["page_signature"] = build_manifest.file_signature(page_path)
+        section[page_path] = entry
+        rebuilt.append(page_path)
+
+    build_manifest.prune_section(section, {download_page_path(s) for s in find_sources()})
+    build_manifest.save_manifest(manifest, manifest_path)
+
+    return rebuilt, skipped
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate download pages from the email templates")
+    parser.add_argument("--check", action="store_true",
+                        help="verify every page matches its source instead of generating")
+    parser.add_argument("--force", action="store_true", help="rebuild every page")
+    parser.add_argument("sources", nargs="*", help="email templates to process (default: all)")
+    args = parser.parse_args()
+
+    sources = args.sources or find_sources()
+
+    if not sources:
+        print(f"❌ No email templates found in {emails_dir}")
+        return 1
+
+    if args.check:
+        failures = 0
+        for source_path in sources:
+            error = check_page(source_path, download_page_path(source_path))
+            if error:
+                failures += 1
+                print(f"❌ {download_page_path(source_path)}: {error}")
+
+        if failures:
+            print(f"❌ {failures} of {len(sources)} download pages are out of sync")
+            print("Run: python generate_download_pages.py")
+            return 1
+
+        print(f"✅ All {len(sources)} download pages match their sources")
+        return 0
+
+    os.makedirs(download_dir, exist_ok=True)
+    rebuilt, skipped = generate(sources, force=args.force)
+
+    for page_path in rebuilt:
+        print(f"✅ Generated {page_path}")
+
+    print("=" * 50)
+    print(f"✅ Generated {len(rebuilt)} download pages ({len(skipped)} up to date)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Streaming HTML tokenizer and rewriter shared by the template passes.
+
+The document is scanned once, left to right. Tags are found with a single
+compiled pattern whose pieces cannot overlap (so a failed match is never
+retried in another split) and which never reads past the next "<": every
+attempt is bounded by the distance to the next candidate, and the whole scan
+is linear in the size of the document whatever the markup looks like. A tag
+the pattern rejects because of debris (a stray quote left by a broken edit)
+gets a second look from a slower scanner with the same bound.
+
+Start tags carry their attributes in order, duplicates included. They are
+parsed on first use and can be edited one by one; untouched attributes keep
+their exact original text when the tag is written back.
+
+In escaped mode the same tokenizer reads markup that is itself HTML-escaped
+text (&lt;span class=&quot;...&quot;&gt;), as in the code shown on the
+download pages, and writes edits back in the same escaped form.
+"""
+
+import re
+
+# Elements whose content is text up to their end tag
+RAW_TEXT_ELEMENTS = ("script", "style")
+
+# Edits applied by apply_edits so far; transform_metrics.py reads the difference
+# around a pass as its match count
+edit_count = 0
+
+def _excluding(*delimiters):
+    """
+    Pattern for one character that does not start any of the delimiters
+    """
+    if all(len(d) == 1 for d in delimiters):
+        return "[^" + "".join(re.escape(d) for d in delimiters) + "]"
+    return "(?:(?!" + "|".join(re.escape(d) for d in delimiters) + r")[\s\S])"
+
+class _Dialect:
+    """
+    The delimiters of plain or escaped markup, and the patterns built from them
+    """
+
+    def __init__(self, lt, gt, quotes):
+        self.lt = lt
+        self.gt = gt
+        self.quotes = quotes
+        self.quote = quotes[0]
+        lt_, gt_ = re.escape(lt), re.escape(gt)
+
+        # Each unit of a tag starts differently from the others, so a failing
+        # match cannot backtrack into another split; none of them crosses a "<"
+        units = [_excluding(lt, gt, *quotes)]
+        units += [f"{re.escape(q)}{_excluding(q, lt)}*{re.escape(q)}" for q in quotes]
+        self.tag = re.compile(
+            rf'{lt_}(?:(?P<slash>/)?(?P<name>[a-zA-Z][\w:-]*)(?P<attrs>(?:{"|".join(units)})*){gt_}'
+            rf'|(?P<comment>!--)|[!?]{_excluding(lt, gt)}*{gt_})'
+        )
+        self.tag_name = re.compile(rf'{lt_}(?P<slash>/)?(?P<name>[a-zA-Z][\w:-]*)')
+
+        quoted = "|".join(f"{re.escape(q)}(?P<v{i}>{_excluding(q, lt)}*){re.escape(q)}"
+                          for i, q in enumerate(quotes))
+        # Names also accept the debris left behind by broken edits (font-size:16px;")
+        # Characters that cannot start a delimiter are taken without lookahead
+        lead = re.escape("".join(sorted({lt[0], gt[0]})))
+        other = rf'(?!{lt_}|{gt_})[{lead}]'
+        name_char = rf'(?:[^\s=/{lead}]|/(?!{gt_})|{other})'
+        self.attr = re.compile(
+            rf'\s*(?P<name>{name_char}+)'
+            rf'(?:\s*=\s*(?:{quoted}|(?P<bare>(?:[^\s{lead}]|{other})+)))?'
+        )
+        self.tag_end = re.compile(rf'\s*(?P<slash>/?){gt_}')
+        self.comment_close = "--" + gt
+        self.raw_end = {name: re.compile(rf'{lt_}/{name}\s*{gt_}', re.I) for name in RAW_TEXT_ELEMENTS}
+
+PLAIN = _Dialect("<", ">", ['"', "'"])
+ESCAPED = _Dialect("&lt;", "&gt;", ["&quot;", "&#39;", "&#x27;"])
+
+class Attribute:
+    """
+    One attribute of a start tag. value is the raw (undecoded) text between
+    the quotes, or None for a bare attribute name; text is the attribute's
+    original source (with its leading space), or None once it was edited.
+    """
+    __slots__ = ("name", "value", "quote", "text")
+
+    def __init__(self, name, value, quote, text):
+        self.name = name
+        self.value = value
+        self.quote = quote
+        self.text = text
+
+def _read_attributes(text, pos, end, dialect):
+    """
+    Parse the attributes in text[pos:end].
+    Returns (attributes, offset where parsing stopped).
+    """
+    attributes = []
+    while True:
+        match = dialect.attr.match(text, pos, end)
+        if not match or match.end() == pos:
+            return attributes, pos
+        for i, quote in enumerate(dialect.quotes):
+            if match.group(f"v{i}") is not None:
+                attributes.append(Attribute(match.group("name"), match.group(f"v{i}"), quote, match.group(0)))
+                break
+        else:
+            bare = match.group("bare")
+            attributes.append(Attribute(match.group("name"), bare, "" if bare is not None else None,
+                                        match.group(0)))
+        pos = match.end()
+
+class Token:
+    """
+    A token of the document. kind is "text", "raw" (script/style content),
+    "comment", "declaration", "start" or "end"; start and end are offsets
+    into the source. Tags have a lower-case name; start tags have attributes.
+    """
+    __slots__ = ("kind", "start", "end", "source", "dialect", "name", "tag_name",
+                 "self_closing", "changed", "_attrs_span", "_attributes")
+
+    def __init__(self, kind, start, end, source, dialect, name=None, tag_name=None,
+                 attrs_span=None, attributes=None, self_closing=False):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.source = source
+        self.dialect = dialect
+        self.name = name
+        self.tag_name = tag_name
+        self.self_closing = self_closing
+        self.changed = False
+        self._attrs_span = attrs_span
+        self._attributes = attributes
+
+    @property
+    def text(self):
+        return self.source[self.start:self.end]
+
+    @property
+    def attributes(self):
+        # Parsed on first use; most tags of a document are never asked
+        if self._attributes is None:
+            self._attributes = []
+            if self._attrs_span is not None:
+                self._attributes = _read_attributes(self.source, *self._attrs_span, self.dialect)[0]
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, attributes):
+        self._attributes = attributes
+
+    def get(self, name, default=None):
+        """
+        Return the value of the first attribute with this name
+        """
+        name = name.lower()
+        for attr in self.attributes:
+            if attr.name.lower() == name:
+                return attr.value if attr.value is not None else ""
+        return default
+
+    def has(self, name):
+        return self.get(name) is not None
+
+    def classes(self):
+        return (self.get("class") or "").split()
+
+    def set(self, name, value):
+        """
+        Set the first attribute with this name (appending it if missing)
+        """
+        self.changed = True
+        lower = name.lower()
+        for attr in self.attributes:
+            if attr.name.lower() == lower:
+                attr.value = value
+                attr.quote = attr.quote or self.dialect.quote
+                attr.text = None
+                return
+        self.attributes.append(Attribute(name, value, self.dialect.quote, None))
+
+    def remove(self, name):
+        """
+        Remove every attribute with this name. Returns how many were removed.
+        """
+        lower = name.lower()
+        kept = [a for a in self.attributes if a.name.lower() != lower]
+        removed = len(self.attributes) - len(kept)
+        if removed:
+            self.attributes = kept
+            self.changed = True
+        return removed
+
+    def keep_attributes(self, predicate):
+        """
+        Keep only the attributes for which predicate(attribute) is true
+        """
+        kept = [a for a in self.attributes if predicate(a)]
+        if len(kept) != len(self.attributes):
+            self.attributes = kept
+            self.changed = True
+
+    def serialize(self):
+        """
+        Return the tag as text: the original text when nothing was edited,
+        otherwise rebuilt keeping the original text of untouched attributes
+        """
+        if not self.changed:
+            return self.text
+        d = self.dialect
+        parts = [d.lt, self.tag_name]
+        for attr in self.attributes:
+            if attr.text is not None:
+                parts.append(attr.text)
+            elif attr.value is None:
+                parts.append(f" {attr.name}")
+            else:
+                parts.append(f" {attr.name}={attr.quote}{attr.value}{attr.quote}")
+        if self.self_closing:
+            parts.append(" /")
+        parts.append(d.gt)
+        return "".join(parts)
+
+def _scan_tag(text, start, dialect):
+    """
+    Scan a tag the tag pattern rejected, accepting attribute debris such as
+    stray quotes. Returns a Token, or None if there is no tag at start.
+    Like the pattern, the scan never crosses the next "<".
+    """
+    name = dialect.tag_name.match(text, start)
+    if not name:
+        return None
+    attributes, pos = _read_attributes(text, name.end(), len(text), dialect)
+    end = dialect.tag_end.match(text, pos)
+    if not end:
+        return None
+
+    tag_name = name.group("name")
+    if name.group("slash"):
+        return Token("end", start, end.end(), text, dialect, name=tag_name.lower(), tag_name=tag_name)
+    return Token("start", start, end.end(), text, dialect, name=tag_name.lower(), tag_name=tag_name,
+                 attributes=attributes, self_closing=bool(end.group("slash")))
+
+def tokenize(text, escaped=False):
+    """
+    Yield the tokens of a document in order. Text that does not form a tag
+    (a stray "<", an unterminated tag or comment) is yielded as text.
+    """
+    d = ESCAPED if escaped else PLAIN
+    lt = d.lt
+    length = len(text)
+    pos = text_start = 0
+    match = d.tag.search(text)
+    # Once "-->" is missing from the rest of the document every later comment
+    # is unterminated too; remembering that keeps the scan linear
+    comments_close = True
+
+    while True:
+        candidate = text.find(lt, pos)
+        if candidate < 0:
+            break
+        if match is not None and match.start() < pos:
+            match = d.tag.search(text, pos)
+
+        token = None
+        if match is None or match.start() != candidate:
+            # The pattern skipped this "<": plain text, or a tag with debris
+            token = _scan_tag(text, candidate, d)
+        elif match.group("name") is not None:
+            token = _tag_from_match(match, text, d)
+        elif match.group("comment") is not None:
+            close = text.find(d.comment_close, match.end()) if comments_close else -1
+            if close >= 0:
+                token = Token("comment", candidate, close + len(d.comment_close), text, d)
+            else:
+                comments_close = False
+        else:
+            token = Token("declaration", candidate, match.end(), text, d)
+
+        if token is None:
+            pos = candidate + len(lt)
+            continue
+
+        if text_start < candidate:
+            yield Token("text", text_start, candidate, text, d)
+        yield token
+        pos = text_start = token.end
+
+        if token.kind == "start" and token.name in d.raw_end and not token.self_closing:
+            close = d.raw_end[token.name].search(text, pos)
+            raw_end = close.start() if close else length
+            if pos < raw_end:
+                yield Token("raw", pos, raw_end, text, d)
+            pos = text_start = raw_end
+
+    if text_start < length:
+        yield Token("text", text_start, length, text, d)
+
+def _tag_from_match(match, text, dialect):
+    start, name = match.start(), match.group("name")
+    if match.group("slash"):
+        return Token("end", start, match.end(), text, dialect, name=name.lower(), tag_name=name)
+    attrs_start, attrs_end = match.span("attrs")
+    self_closing = text.startswith("/", attrs_end - 1) and attrs_end > attrs_start
+    return Token("start", start, match.end(), text, dialect, name=name.lower(), tag_name=name,
+                 attrs_span=(attrs_start, attrs_end - self_closing), self_closing=self_closing)
+
+def _tag_at(text, start, dialect):
+    """
+    Return the tag token starting at an offset, or None
+    """
+    match = dialect.tag.match(text, start)
+    if match is None or match.group("name") is None:
+        return _scan_tag(text, start, dialect)
+    return _tag_from_match(match, text, dialect)
+
+_seek_patterns = {}
+
+def iter_tags(text, names, escaped=False):
+    """
+    Yield the start tags with the given names, in document order.
+    This seeks straight to the candidates instead of tokenizing everything in
+    between, so it also finds tags inside comments, such as the markup of
+    <!--[if mso]> blocks that Outlook renders.
+    """
+    d = ESCAPED if escaped else PLAIN
+    key = (d.lt, tuple(sorted(names)))
+    seek = _seek_patterns.get(key)
+    if seek is None:
+        seek = _seek_patterns[key] = re.compile(
+            re.escape(d.lt) + "(?:" + "|".join(re.escape(n) for n in key[1]) + r")(?![\w:-])", re.I)
+
+    pos = 0
+    while True:
+        candidate = seek.search(text, pos)
+        if candidate is None:
+            return
+        tag = _tag_at(text, candidate.start(), d)
+        if tag is None or tag.kind != "start":
+            pos = candidate.end()
+            continue
+        yield tag
+        pos = tag.end
+
+def element_text(tag):
+    """
+    Return (text token, end tag token) when the content of an element is a
+    single run of text followed by its end tag, e.g. <span class="x">name</span>;
+    otherwise None
+    """
+    d, text = tag.dialect, tag.source
+    close = text.find(d.lt, tag.end)
+    if close <= tag.end:
+        return None
+    end = _tag_at(text, close, d)
+    if end is None or end.kind != "end" or end.name != tag.name:
+        return None
+    return Token("text", tag.end, close, text, d), end
+
+def text_elements(text, names, match, escaped=False):
+    """
+    Yield (start tag, text, end tag) for the elements with the given names that
+    are accepted by match(start tag) and whose content is a single run of text
+    """
+    for tag in iter_tags(text, names, escaped):
+        if not match(tag):
+            continue
+        content = element_text(tag)
+        if content is not None:
+            yield tag, content[0], content[1]
+
+def raw_text(tag):
+    """
+    Return the (start, end) offsets of the content of a script or style element
+    """
+    d = tag.dialect
+    close = d.raw_end[tag.name].search(tag.source, tag.end)
+    return tag.end, close.start() if close else len(tag.source)
+
+def apply_edits(text, edits):
+    """
+    Apply (start, end, replacement) edits, given in document order and not
+    overlapping, in a single join
+    """
+    global edit_count
+    parts = []
+    pos = 0
+    for start, end, replacement in edits:
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(text[pos:])
+    edit_count += len(parts) // 2
+    return "".join(parts)
+
+def rewrite_tags(text, handler, names=None, escaped=False):
+    """
+    Call handler(tag) for every start tag (or only those with the given names)
+    and write back the tags the handler edited. Returns the new text.
+    """
+    if names is None:
+        tags = (t for t in tokenize(text, escaped) if t.kind == "start")
+    else:
+        tags = iter_tags(text, names, escaped)
+    edits = []
+    for tag in tags:
+        handler(tag)
+        if tag.changed:
+            edits.append((tag.start, tag.end, tag.serialize()))
+    return apply_edits(text, edits) if edits else text
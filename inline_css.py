@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+CSS inliner build stage for the email templates.
+
+Authoring templates keep their shared styles as class-based rules in a
+<style data-inline> block. This stage moves those rules into style="..."
+attributes so the output keeps styles inline for maximum client support,
+while rules that cannot be inlined (@media queries, :hover and other
+pseudo-classes) stay in a regular <style> block. Style blocks without
+data-inline (dark mode, preview chrome) are left untouched.
+
+The stage runs on the output of build_templates.py: the transactional layout
+includes the shared templates/partials/inline-styles.html block (pages may add
+their own), and build/emails is inlined into the published emails/**.
+
+Parsed stylesheets and selector-match results are cached across the batch,
+so templates that share the same CSS cost one stylesheet parse in total.
+
+Usage:
+    python build_templates.py && python inline_css.py     # build/emails → build/inlined
+    python inline_css.py --out emails                     # publish over emails/**
+    python inline_css.py path/to/template.html --out build/inlined
+"""
+
+import os
+import re
+import sys
+import glob
+import argparse
+
+import css_parser
+
+# Output of build_templates.py
+default_src_dir = "build/emails"
+default_out_dir = "build/inlined"
+
+# The block with its indentation and the whitespace after it, so removing it leaves no blank line
+INLINE_STYLE_PATTERN = re.compile(r'(?P<indent>[ \t]*)<style\b[^>]*\bdata-inline\b[^>]*>(?P<css>.*?)</style>\s*',
+                                  re.S | re.I)
+STYLE_ATTR_PATTERN = re.compile(r'''\sstyle\s*=\s*("[^"]*"|'[^']*')''', re.I)
+
+# Elements that never receive inline styles
+SKIP_TAGS = {"html", "head", "meta", "title", "link", "style", "script", "base"}
+
+# Results of matching a selector against an ancestor path, shared across templates
+_match_cache = {}
+match_stats = {"hits": 0, "misses": 0}
+
+def split_inlinable(items):
+    """
+    Split parsed stylesheet items into (inlinable rules, leftover items).
+    Inlinable rules are top-level rules whose selectors need no pseudo-classes;
+    a rule mixing both kinds of selector is split in two.
+    """
+    inlinable = []
+    leftover = []
+
+    for order, item in enumerate(items):
+        if item["type"] != "rule":
+            leftover.append(item)
+            continue
+
+        static = [s for s in item["selectors"] if css_parser.is_static_selector(s)]
+        dynamic = [s for s in item["selectors"] if s not in static]
+
+        for selector in static:
+            inlinable.append({
+                "selector": selector,
+                "specificity": css_parser.specificity(selector),
+                "order": order,
+                "declarations": item["declarations"],
+            })
+        if dynamic:
+            leftover.append({"type": "rule", "selectors": dynamic, "declarations": item["declarations"]})
+
+    return inlinable, leftover
+
+def element_matches(elements, element, selector):
+    """
+    Match with the cross-template cache; sibling selectors depend on more than
+    the ancestor path and are always matched directly
+    """
+    if css_parser.uses_siblings(selector):
+        return css_parser.matches(elements, element, selector)
+
+    key = (selector, element["path"])
+    cached = _match_cache.get(key)
+    if cached is None:
+        match_stats["misses"] += 1
+        cached = css_parser.matches(elements, element, selector)
+        _match_cache[key] = cached
+    else:
+        match_stats["hits"] += 1
+    return cached
+
+def computed_declarations(elements, element, rules):
+    """
+    Cascade the matching rules with the element's own style attribute.
+    Returns the winning [(prop, value, important)] in cascade order.
+    """
+    candidates = []
+    for rule in rules:
+        if element_matches(elements, element, rule["selector"]):
+            for position, declaration in enumerate(rule["declarations"]):
+                candidates.append(((declaration[2], 0, rule["specificity"], rule["order"], position), declaration))
+
+    if not candidates:
+        return None
+
+    # The existing inline style beats any selector unless the rule is !important
+    inline = css_parser.parse_declarations(element["attrs"].get("style", ""))
+    for position, declaration in enumerate(inline):
+        candidates.append(((declaration[2], 1, (0, 0, 0), 0, position), declaration))
+
+    winners = {}
+    for priority, declaration in sorted(candidates, key=lambda c: c[0]):
+        winners.pop(declaration[0], None)
+        winners[declaration[0]] = declaration
+
+    return list(winners.values())
+
+def set_style_attribute(start_tag, style):
+    """
+    Replace or add the style attribute of a start tag
+    """
+    escaped = style.replace('"', "&quot;")
+    if STYLE_ATTR_PATTERN.search(start_tag):
+        return STYLE_ATTR_PATTERN.sub(lambda m: f' style="{escaped}"', start_tag, count=1)
+    closing = "/>" if start_tag.endswith("/>") else ">"
+    return f'{start_tag[:-len(closing)].rstrip()} style="{escaped}"{closing}'
+
+def inline_content(content):
+    """
+    Inline the <style data-inline> rules of one document.
+    Returns (new content, number of elements restyled).
+    """
+    blocks = list(INLINE_STYLE_PATTERN.finditer(content))
+    if not blocks:
+        return content, 0
+
+    items = css_parser.parse_stylesheet("\n".join(m.group("css") for m in blocks))
+    rules, leftover = split_inlinable(items)
+
+    # Remove the inline blocks; leftovers go where the first block was
+    replacement = ""
+    if leftover:
+        replacement = f"<style>\n{css_parser.serialize_rules(leftover)}\n  </style>\n  "
+    pieces = []
+    pos = 0
+    for index, match in enumerate(blocks):
+        pieces.append(content[pos:match.start()])
+        if index == 0 and replacement:
+            pieces.append(match.group("indent") + replacement)
+        pos = match.end()
+    pieces.append(content[pos:])
+    content = "".join(pieces)
+
+    relevant = css_parser.referenced_attributes(r["selector"] for r in rules)
+    elements = css_parser.scan_elements(content, relevant)
+
+    edits = []
+    for element in elements:
+        if element["tag"] in SKIP_TAGS:
+            continue
+        declarations = computed_declarations(elements, element, rules)
+        if declarations:
+            start_tag = content[element["start"]:element["end"]]
+            style = css_parser.serialize_declarations(declarations) + ";"
+            edits.append((element["start"], element["end"], set_style_attribute(start_tag, style)))
+
+    pieces = []
+    pos = 0
+    for start, end, text in edits:
+        pieces.append(content[pos:start])
+        pieces.append(text)
+        pos = end
+    pieces.append(content[pos:])
+
+    return "".join(pieces), len(edits)
+
+def inline_file(src_path, out_path):
+    """
+    Inline one template into out_path. Returns the number of restyled elements.
+    """
+    with open(src_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    content, restyled = inline_content(content)
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    return restyled
+
+def main():
+    parser = argparse.ArgumentParser(description="Inline <style data-inline> rules into the email templates")
+    parser.add_argument("sources", nargs="*", help="templates to inline (default: every .html under --src)")
+    parser.add_argument("--src", default=default_src_dir, help=f"authoring template root (default: {default_src_dir})")
+    parser.add_argument("--out", default=default_out_dir, help=f"output root (default: {default_out_dir})")
+    args = parser.parse_args()
+
+    sources = args.sources or sorted(glob.glob(os.path.join(args.src, "**", "*.html"), recursive=True))
+
+    if not sources:
+        print(f"❌ No authoring templates found in {args.src}")
+        if args.src == default_src_dir:
+            print("ℹ️  Run python build_templates.py first")
+        return 1
+
+    print(f"🎨 Inlining CSS for {len(sources)} templates into {args.out}...")
+    print()
+
+    for src_path in sources:
+        rel_path = os.path.relpath(src_path, args.src) if not args.sources else os.path.basename(src_path)
+        out_path = os.path.join(args.out, rel_path)
+        try:
+            restyled = inline_file(src_path, out_path)
+            print(f"✅ {out_path} ({restyled} elements styled)")
+        except Exception as e:
+            print(f"❌ Error inlining {src_path}: {e}")
+
+    lookups = match_stats["hits"] + match_stats["misses"]
+    print("=" * 50)
+    print(f"📄 Stylesheet parses: {css_parser.cache_stats['parses']} "
+          f"(reused {css_parser.cache_stats['parse_hits']} times)")
+    if lookups:
+        print(f"🎯 Selector-match cache: {match_stats['hits'] / lookups:.0%} hit rate over {lookups} lookups")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Read-only lint for the defects the fix scripts exist to repair.
+
+Each file is tokenized once (html_tokens) and every start tag is checked,
+including those inside conditional comments and, on the download pages, the
+escaped email source shown in <pre id="code-content">. Rules:
+
+    duplicate-attribute   a tag repeats an attribute (style="..." style="...")
+    attribute-debris      a malformed attribute left by a broken edit (font-size:16px;")
+    duplicate-class       a class attribute repeats a class name
+    material-icons        a leftover Material Icons span or font link
+    img-font-size         font-size in an img style
+    relative-icon-url     an icon img pointing at a local .svg path
+    unescaped-markup      raw tags inside a download page's code block
+    double-escaped        &amp;lt;tag in a code block (escaped twice)
+    escaped-markup        &lt;tag text in an email (escaped code leaked into the email)
+    button-color          a button or VML fill outside the button palette
+    button-fill-mismatch  an Outlook VML button whose fill differs from its HTML button
+
+Findings are printed as path:line:column: rule: message and the exit status
+is 1 when there are any. Results are cached per file in .cache/lint.json by
+stat signature and content hash, so repeated runs only re-lint files that
+changed; the cache is dropped when the rules change.
+
+Usage:
+    python lint_templates.py                          # emails/** and download-pages/**
+    python lint_templates.py emails/transactional/password-reset.html
+    python lint_templates.py --rule duplicate-class --json
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import bisect
+import argparse
+
+import html_tokens
+import css_parser
+import build_manifest
+import email_files
+import fix_duplicate_attributes
+
+cache_path = ".cache/lint.json"
+
+# Bump when a rule changes outside the project's modules (the fingerprint hashes those)
+LINT_VERSION = "2"
+
+LINT_PATTERNS = ["emails/**/*.html", "download-pages/**/*.html"]
+
+RULES = ["duplicate-attribute", "attribute-debris", "duplicate-class", "material-icons", "img-font-size",
+         "relative-icon-url", "unescaped-markup", "double-escaped", "escaped-markup", "button-color",
+         "button-fill-mismatch"]
+
+# Button backgrounds the templates use: primary, danger, warning and outline
+BUTTON_COLORS = {"#0d9488", "#dc2626", "#f59e0b", "transparent"}
+BUTTON_CLASSES = {"btn-primary", "btn-primary-dark", "dm-cta"}
+
+CODE_BLOCK_ID = "code-content"
+
+ESCAPED_TAG_PATTERN = re.compile(r'&lt;/?[a-zA-Z][a-zA-Z0-9:-]*(?=[\s/]|&gt;)')
+DOUBLE_ESCAPED_TAG_PATTERN = re.compile(r'&amp;lt;/?[a-zA-Z]')
+COLOR_PATTERN = re.compile(r'#[0-9a-fA-F]{3,8}\b|\btransparent\b')
+
+class Linter:
+    """
+    Collects the findings for one document as (offset, rule, message)
+    """
+
+    def __init__(self, text, is_email):
+        self.text = text
+        self.is_email = is_email
+        self.findings = []
+        # The VML fill waiting for the HTML button that follows it
+        self.pending_fill = None
+
+    def report(self, offset, rule, message):
+        self.findings.append((offset, rule, message))
+
+    def lint(self):
+        self.lint_markup(self.text, 0, escaped=False)
+        return self.findings
+
+    def lint_markup(self, text, base, escaped):
+        """
+        Check every token of text, where text starts at offset base of the file
+        """
+        dialect = html_tokens.ESCAPED if escaped else html_tokens.PLAIN
+        code_start = None
+        chrome_depth = 0
+        for token in html_tokens.tokenize(text, escaped):
+            if code_start is not None:
+                if token.kind == "end" and token.name == "pre":
+                    self.lint_markup(text[code_start:token.start], base + code_start, escaped=True)
+                    code_start = None
+                elif token.kind in ("start", "end"):
+                    self.report(base + token.start, "unescaped-markup",
+                                f"raw <{token.name}> tag in the code block; it must be escaped")
+                continue
+
+            if token.name == "div" and not (token.kind == "start" and token.self_closing):
+                if chrome_depth:
+                    chrome_depth += 1 if token.kind == "start" else -1
+                elif token.kind == "start" and email_files.PREVIEW_CHROME_CLASSES.intersection(token.classes()):
+                    chrome_depth = 1
+
+            if token.kind == "start":
+                self.check_tag(token, base, escaped, in_chrome=chrome_depth > 0)
+                if not escaped and token.name == "pre" and token.get("id") == CODE_BLOCK_ID:
+                    code_start = token.end
+            elif token.kind == "comment":
+                # Conditional comments hold the Outlook-only markup
+                inner_start = token.start + len(dialect.lt) + 3
+                inner_end = token.end - len(dialect.comment_close)
+                if text.find(dialect.lt, inner_start, inner_end) >= 0:
+                    self.lint_markup(text[inner_start:inner_end], base + inner_start, escaped)
+            elif token.kind == "text":
+                self.check_text(text, token, base, escaped)
+
+        if code_start is not None:
+            self.lint_markup(text[code_start:], base + code_start, escaped=True)
+
+    def check_text(self, text, token, base, escaped):
+        if escaped:
+            for match in DOUBLE_ESCAPED_TAG_PATTERN.finditer(text, token.start, token.end):
+                self.report(base + match.start(), "double-escaped", "markup escaped twice (&amp;lt;)")
+        elif self.is_email:
+            for match in ESCAPED_TAG_PATTERN.finditer(text, token.start, token.end):
+                self.report(base + match.start(), "escaped-markup",
+                            f"escaped tag {match.group(0).replace('&lt;', '<')} shows up as text")
+
+    def check_tag(self, tag, base, escaped, in_chrome=False):
+        offset = base + tag.start
+        attributes = tag.attributes
+        seen = set()
+        for attr in attributes:
+            name = attr.name.lower()
+            if not fix_duplicate_attributes.ATTRIBUTE_NAME_PATTERN.match(attr.name):
+                self.report(offset, "attribute-debris", f"malformed attribute {attr.name!r} in <{tag.name}>")
+            elif name in seen:
+                self.report(offset, "duplicate-attribute", f"<{tag.name}> repeats the {name} attribute")
+            seen.add(name)
+
+        classes = tag.classes()
+        if len(classes) != len(set(classes)):
+            repeated = sorted({c for c in classes if classes.count(c) > 1})
+            self.report(offset, "duplicate-class", f"class repeats {', '.join(repeated)}")
+
+        # The download page shells and listings are web pages that load the icon font on purpose
+        if (self.is_email or escaped) and not in_chrome:
+            if "material-icons" in classes:
+                self.report(offset, "material-icons", f"Material Icons <{tag.name}> (run fix_remaining_icons.py)")
+            elif tag.name == "link" and "Material+Icons" in (tag.get("href") or ""):
+                self.report(offset, "material-icons", "Material Icons font link")
+
+        if tag.name == "img":
+            style = tag.get("style") or ""
+            if "font-size" in style:
+                self.report(offset, "img-font-size", "font-size in an img style (run fix_duplicate_attributes.py)")
+            src = tag.get("src") or ""
+            if src.startswith("assets/images/icons/") and src.endswith(".svg"):
+                self.report(offset, "relative-icon-url", f"local icon path {src} (run update_icon_urls.py)")
+
+        if self.is_email and not escaped:
+            self.check_button(tag, offset, classes)
+
+    def check_button(self, tag, offset, classes):
+        if tag.name == "v:roundrect":
+            fill = (tag.get("fillcolor") or "").strip().lower()
+            if fill and fill not in BUTTON_COLORS:
+                self.report(offset, "button-color", f"VML button fill {fill} is not a button color")
+            self.pending_fill = (fill, offset) if fill else None
+            return
+        if tag.name != "a" or not BUTTON_CLASSES.intersection(classes):
+            return
+
+        background = None
+        for prop, value, _ in css_parser.parse_declarations(tag.get("style") or ""):
+            if prop in ("background", "background-color"):
+                match = COLOR_PATTERN.search(value)
+                if match:
+                    background = match.group(0).lower()
+        if background is not None and background not in BUTTON_COLORS:
+            self.report(offset, "button-color", f"button background {background} is not a button color")
+
+        if self.pending_fill is not None:
+            fill, _ = self.pending_fill
+            if background is not None and expand_color(fill) != expand_color(background):
+                self.report(offset, "button-fill-mismatch",
+                            f"button background {background} differs from its Outlook fill {fill}")
+            self.pending_fill = None
+
+def expand_color(color):
+    if re.fullmatch(r'#[0-9a-f]{3}', color):
+        return "#" + "".join(c * 2 for c in color[1:])
+    return color
+
+def lint_content(content, path):
+    """
+    Return the sorted findings for a document as [line, column, rule, message]
+    """
+    # Listing pages are checked like the download page shells
+    is_email = (path.replace(os.sep, "/").startswith("emails/")
+                and os.path.basename(path) not in email_files.LISTING_PAGES)
+    findings = Linter(content, is_email).lint()
+    if not findings:
+        return []
+    line_starts = [0] + [m.end() for m in re.finditer("\n", content)]
+    located = []
+    for offset, rule, message in sorted(findings, key=lambda f: f[0]):
+        line = bisect.bisect_right(line_starts, offset)
+        located.append([line, offset - line_starts[line - 1] + 1, rule, message])
+    return located
+
+def find_files(paths=None):
+    """
+    Expand the given files and directories (default: emails/** and download-pages/**)
+    """
+    if not paths:
+        files = set()
+        for pattern in LINT_PATTERNS:
+            files.update(glob.glob(pattern, recursive=True))
+        return sorted(f for f in files if not f.endswith(".min.html"))
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.html"), recursive=True)))
+        else:
+            files.append(path)
+    return [os.path.normpath(f) for f in files if not f.endswith(".min.html")]
+
+def load_cache(fingerprint):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get("rules") != fingerprint:
+        return {"rules": fingerprint, "files": {}}
+    return cache
+
+def save_cache(cache):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+def lint_file(path, cache_files):
+    """
+    Return (findings, linted) for a file, reusing the cached findings when
+    the file is unchanged
+    """
+    entry = cache_files.get(path)
+    signature = build_manifest.file_signature(path)
+    if entry and entry.get("signature") == signature:
+        return entry["findings"], False
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    sha256 = build_manifest.content_hash(data)
+    if entry and entry.get("sha256") == sha256:
+        entry["signature"] = signature
+        return entry["findings"], False
+
+    findings = lint_content(data.decode('utf-8', 'replace'), path)
+    cache_files[path] = {"signature": signature, "sha256": sha256, "findings": findings}
+    return findings, True
+
+def main():
+    parser = argparse.ArgumentParser(description="Lint the templates for the defects the fix scripts repair")
+    parser.add_argument("paths", nargs="*", help="files or directories (default: emails/** and download-pages/**)")
+    parser.add_argument("--rule", action="append", choices=RULES, help="only report this rule (repeatable)")
+    parser.add_argument("--json", action="store_true", help="print findings as JSON")
+    parser.add_argument("--no-cache", action="store_true", help="lint every file and leave the cache alone")
+    args = parser.parse_args()
+
+    files = find_files(args.paths)
+    if not files:
+        print("❌ No template files found")
+        return 1
+
+    fingerprint = build_manifest.pass_fingerprint(lint_content, LINT_VERSION)
+    cache = {"rules": fingerprint, "files": {}} if args.no_cache else load_cache(fingerprint)
+
+    results = []
+    linted = 0
+    for path in files:
+        try:
+            findings, fresh = lint_file(path, cache["files"])
+        except OSError as e:
+            print(f"❌ {path}: {e}")
+            return 1
+        linted += fresh
+        results.extend([path] + f for f in findings if not args.rule or f[2] in args.rule)
+
+    if not args.no_cache:
+        if not args.paths:
+            # A full run knows every file that takes part
+            cache["files"] = {p: e for p, e in cache["files"].items() if p in set(files)}
+        save_cache(cache)
+
+    if args.json:
+        print(json.dumps([{"path": p, "line": l, "column": c, "rule": r, "message": m}
+                          for p, l, c, r, m in results], indent=1))
+    else:
+        for path, line, column, rule, message in results:
+            print(f"{path}:{line}:{column}: {rule}: {message}")
+        print("=" * 50)
+        counts = {}
+        for result in results:
+            counts[result[3]] = counts.get(result[3], 0) + 1
+        for rule in RULES:
+            if rule in counts:
+                print(f"⚠️  {rule}: {counts[rule]}")
+        marker = "❌" if results else "✅"
+        print(f"{marker} {len(results)} findings in {len(files)} files ({linted} linted, {len(files) - linted} cached)")
+
+    return 1 if results else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
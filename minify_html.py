@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Email-safe HTML minifier for emails/**.
+
+Writes a minified NAME.min.html next to each template, leaving the authoring
+source untouched. Whitespace runs are collapsed (and dropped between block and
+table tags), ordinary comments are removed and <style> blocks lose their
+comments and indentation. Everything Outlook and the inbox preview depend on
+is kept byte-for-byte: MSO conditional comments and the VML inside them,
+<!--[if !mso]><!--> markers, the hidden preheader, and <pre>, <textarea> and
+<script> content.
+
+Usage:
+    python minify_html.py                 # every template in emails/**
+    python minify_html.py --check         # report savings without writing
+    python minify_html.py emails/newsletters/zomo-health-usi-template.html
+"""
+
+import os
+import re
+import sys
+import glob
+import argparse
+
+emails_dir = "emails"
+
+MIN_SUFFIX = ".min.html"
+
+# Token kinds, tried in order at each "<"
+TOKEN_PATTERN = re.compile(r'''
+    (?P<reveal><!--\[if[^\]]*\]><!--(?:\s*-->)?|<!--<!\[endif\]-->)     # downlevel-revealed markers
+  | (?P<conditional><!--\[if[^\]]*\]>.*?<!\[endif\]-->)                 # MSO conditional comment
+  | (?P<comment><!--.*?-->)                                            # ordinary comment
+  | (?P<verbatim><(?P<verbatim_tag>pre|textarea|script)\b[^>]*>.*?</(?P=verbatim_tag)\s*>)
+  | (?P<preheader><div\b[^>]*\bmso-hide\s*:\s*all[^>]*>.*?</div\s*>)    # hidden preheader
+  | (?P<style><style\b[^>]*>)(?P<css>.*?)(?P<style_end></style\s*>)
+  | (?P<tag></?(?P<tag_name>[A-Za-z][\w:-]*)[^>]*>|<![^>]*>)
+''', re.S | re.I | re.X)
+
+# Tags whose surrounding whitespace never renders
+BLOCK_TAGS = {
+    "html", "head", "body", "meta", "title", "link", "style", "base",
+    "table", "thead", "tbody", "tfoot", "tr", "td", "th", "caption", "colgroup", "col",
+    "div", "p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "center",
+    "header", "footer", "main", "section", "nav", "article", "blockquote", "hr", "br",
+    "xml", "o:officedocumentsettings", "o:allowpng", "o:pixelsperinch",
+}
+
+CSS_COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+CSS_PUNCTUATION_PATTERN = re.compile(r'\s*([{};,])\s*')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TAG_SPACE_PATTERN = re.compile(r'("[^"]*"|\'[^\']*\')|\s+')
+
+def minify_css(css):
+    """
+    Strip comments and collapse whitespace in a stylesheet. Spaces around ":"
+    are kept because they are significant in selectors.
+    """
+    css = CSS_COMMENT_PATTERN.sub("", css)
+    css = WHITESPACE_PATTERN.sub(" ", css)
+    css = CSS_PUNCTUATION_PATTERN.sub(r"\1", css)
+    return css.replace(";}", "}").strip()
+
+def tokenize(content):
+    """
+    Split a document into (kind, text, tag name) tokens; kind is "text" for
+    character data between markup
+    """
+    tokens = []
+    pos = 0
+
+    for match in TOKEN_PATTERN.finditer(content):
+        if match.start() > pos:
+            tokens.append(("text", content[pos:match.start()], None))
+
+        if match.group("style") is not None:
+            tokens.append(("style", match.group(0), "style"))
+        elif match.group("tag") is not None:
+            tokens.append(("tag", match.group(0), (match.group("tag_name") or "").lower()))
+        elif match.group("verbatim") is not None:
+            tokens.append(("verbatim", match.group(0), match.group("verbatim_tag").lower()))
+        elif match.group("preheader") is not None:
+            tokens.append(("preheader", match.group(0), "div"))
+        else:
+            kind = next(k for k in ("reveal", "conditional", "comment") if match.group(k) is not None)
+            tokens.append((kind, match.group(0), None))
+
+        pos = match.end()
+
+    if pos < len(content):
+        tokens.append(("text", content[pos:], None))
+
+    return tokens
+
+def is_block_boundary(token):
+    """
+    Whether whitespace next to this token can be dropped without changing rendering
+    """
+    if token is None:
+        return True
+    kind, _, tag_name = token
+    if kind in ("reveal", "conditional", "preheader", "style"):
+        return True
+    if kind == "verbatim":
+        return tag_name != "textarea"
+    return kind == "tag" and tag_name in BLOCK_TAGS
+
+def minify_content(content):
+    """
+    Minify one document
+    """
+    tokens = [t for t in tokenize(content) if t[0] != "comment"]
+    pieces = []
+
+    for index, (kind, text, tag_name) in enumerate(tokens):
+        if kind == "text":
+            collapsed = WHITESPACE_PATTERN.sub(" ", text)
+            if collapsed == " ":
+                previous = tokens[index - 1] if index > 0 else None
+                following = tokens[index + 1] if index + 1 < len(tokens) else None
+                if is_block_boundary(previous) or is_block_boundary(following):
+                    continue
+            pieces.append(collapsed)
+        elif kind == "style":
+            match = TOKEN_PATTERN.match(text)
+            pieces.append(f'{match.group("style")}{minify_css(match.group("css"))}{match.group("style_end")}')
+        elif kind == "tag":
+            # Line breaks and indentation between attributes; quoted values are left alone
+            pieces.append(TAG_SPACE_PATTERN.sub(lambda m: m.group(1) or " ", text) if "\n" in text else text)
+        else:
+            pieces.append(text)
+
+    return "".join(pieces).strip() + "\n"
+
+def min_path(source_path):
+    return source_path[:-len(".html")] + MIN_SUFFIX
+
+def find_templates():
+    """
+    Return every HTML file in emails/** (minified outputs excluded)
+    """
+    templates = glob.glob(os.path.join(emails_dir, "**", "*.html"), recursive=True)
+    return sorted(t for t in templates if not t.endswith(MIN_SUFFIX))
+
+def minify_file(source_path, write=True):
+    """
+    Minify one template into its .min.html sibling. Returns (source bytes, minified bytes).
+    """
+    with open(source_path, 'r', encoding='utf-8', newline='') as f:
+        content = f.read()
+
+    minified = minify_content(content)
+
+    if write:
+        with open(min_path(source_path), 'w', encoding='utf-8', newline='') as f:
+            f.write(minified)
+
+    return len(content.encode('utf-8')), len(minified.encode('utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Write email-safe minified copies of the templates")
+    parser.add_argument("templates", nargs="*", help="templates to minify (default: every file in emails/**)")
+    parser.add_argument("--check", action="store_true", help="report the savings without writing files")
+    args = parser.parse_args()
+
+    templates = args.templates or find_templates()
+    if not templates:
+        print(f"❌ No templates found in {emails_dir}")
+        return 1
+
+    print(f"🗜️  Minifying {len(templates)} templates...")
+    print()
+
+    total_before = 0
+    total_after = 0
+    for source_path in templates:
+        try:
+            before, after = minify_file(source_path, write=not args.check)
+        except Exception as e:
+            print(f"❌ Error minifying {source_path}: {e}")
+            continue
+        total_before += before
+        total_after += after
+        target = source_path if args.check else min_path(source_path)
+        print(f"✅ {target}: {before / 1024:.1f} KB → {after / 1024:.1f} KB (-{1 - after / before:.0%})")
+
+    print()
+    print("=" * 50)
+    if total_before:
+        print(f"✅ Saved {(total_before - total_after) / 1024:.1f} KB of {total_before / 1024:.1f} KB "
+              f"({1 - total_after / total_before:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Optimize assets/images for the 600px email column.
+
+Every raster image in assets/images gets 1x (600px) and 2x (1200px) variants,
+never upscaled, recompressed and written to assets/images/email/ under
+content-hashed file names that carry their real width. An image no wider than
+the column gets the 1x variant only, since a 2x would hold the same pixels.
+The img tags in emails/** are rewritten to use the 1x variant as src and the
+2x variant, when there is one, in srcset; tags that already use an older
+variant of the same image move to the new one. Files with an image
+extension that hold no image data (the hero.jpg and logo.png placeholders)
+are skipped. Results are cached by source hash, so only new or changed
+images are re-encoded. Byte-identical and near-identical images (copies such
+as "Highlight copy.png") are flagged.
+
+Requires Pillow (pip install pillow).
+
+Usage:
+    python optimize_images.py                # encode, rewrite emails/**, report duplicates
+    python optimize_images.py --dry-run      # report only
+"""
+
+import io
+import os
+import re
+import sys
+import glob
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import build_manifest
+
+# Base URL for the Vercel deployment
+BASE_URL = "https://zomo-emails.vercel.app"
+
+images_dir = "assets/images"
+variants_dir = "assets/images/email"
+cache_path = ".cache/images.json"
+
+# Email column width and the retina multiple
+COLUMN_WIDTH = 600
+SCALES = (1, 2)
+
+# Bump when the encoding settings change so cached variants are rebuilt
+ENCODER_VERSION = "2"
+JPEG_QUALITY = 82
+
+# Variants must save at least this fraction of the source to be used
+MIN_SAVING = 0.10
+
+# Maximum dHash distance (out of 64 bits) for two images to count as near-identical
+NEAR_DUPLICATE_DISTANCE = 4
+
+RASTER_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Leading bytes of PNG and JPEG files; hero.jpg and logo.png are text placeholders
+RASTER_SIGNATURES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff")
+
+# A variant written by build_variants: <stem>-<width>.<hash>.<ext>
+VARIANT_PATTERN = r'assets/images/email/(?P<stem>[A-Za-z0-9_-]+?)-\d+\.[0-9a-f]{10}\.\w+'
+
+def find_images():
+    """
+    Return (source raster images, placeholders): icons and generated variants
+    are excluded, and files named like images that are not PNG or JPEG data
+    are returned separately
+    """
+    images = []
+    placeholders = []
+    for path in glob.glob(os.path.join(images_dir, "*")):
+        if path.lower().endswith(RASTER_EXTENSIONS) and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                head = f.read(8)
+            (images if head.startswith(RASTER_SIGNATURES) else placeholders).append(path)
+    return sorted(images), sorted(placeholders)
+
+def variant_stem(source_path):
+    """
+    The file name stem of an image's variants
+    """
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return re.sub(r'[^A-Za-z0-9_-]+', '-', stem).strip('-')
+
+def load_cache():
+    """
+    Load the {source hash: variant info} cache
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get("version") == ENCODER_VERSION else {}
+
+def save_cache(cache):
+    """
+    Persist the variant cache
+    """
+    cache["version"] = ENCODER_VERSION
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+def encode(image, has_alpha):
+    """
+    Encode an image as the smaller of optimized PNG and (for opaque images)
+    progressive JPEG. Returns (bytes, extension).
+    """
+    candidates = []
+
+    png = io.BytesIO()
+    image.save(png, format="PNG", optimize=True)
+    candidates.append((png.getvalue(), ".png"))
+
+    if not has_alpha:
+        jpeg = io.BytesIO()
+        image.convert("RGB").save(jpeg, format="JPEG", quality=JPEG_QUALITY,
+                                  optimize=True, progressive=True)
+        candidates.append((jpeg.getvalue(), ".jpg"))
+
+    return min(candidates, key=lambda c: len(c[0]))
+
+def build_variants(source_path):
+    """
+    Encode the 1x/2x variants of one image and write them under content-hashed
+    names. Returns {"1x": path, "2x": path, "bytes": {...}} ("2x" absent for
+    images no wider than the column), {"skip": True}
+    when the variants would not be meaningfully smaller than the source, or
+    {"error": message} for unreadable images.
+    """
+    source_size = os.path.getsize(source_path)
+    stem = variant_stem(source_path)
+
+    try:
+        original = Image.open(source_path)
+        original.load()
+    except (OSError, SyntaxError) as e:
+        return {"error": str(e)}
+
+    with original:
+        has_alpha = original.mode in ("RGBA", "LA") or (original.mode == "P" and "transparency" in original.info)
+        image = original.convert("RGBA" if has_alpha else "RGB")
+
+    variants = {}
+    sizes = {}
+    for scale in SCALES:
+        if scale > 1 and image.width <= COLUMN_WIDTH * (scale - 1):
+            # Capped at the source width, this would repeat the previous variant
+            break
+        width = min(COLUMN_WIDTH * scale, image.width)
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+        data, extension = encode(resized, has_alpha)
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        variant_path = os.path.join(variants_dir, f"{stem}-{width}.{digest}{extension}")
+
+        if not os.path.exists(variant_path):
+            os.makedirs(variants_dir, exist_ok=True)
+            with open(variant_path, 'wb') as f:
+                f.write(data)
+
+        variants[f"{scale}x"] = variant_path.replace(os.sep, "/")
+        sizes[f"{scale}x"] = len(data)
+
+    if sizes["1x"] > source_size * (1 - MIN_SAVING):
+        for variant_path in variants.values():
+            os.remove(variant_path)
+        return {"skip": True}
+
+    return dict(variants, bytes=sizes, source_bytes=source_size)
+
+def dhash(path, size=8):
+    """
+    64-bit difference hash of an image, for near-duplicate detection
+    """
+    with Image.open(path) as image:
+        # Flatten transparency onto white, as the email background would
+        image = image.convert("RGBA")
+        flattened = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        flattened.alpha_composite(image)
+        small = flattened.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return bits
+
+def aspect_ratio(path):
+    """
+    Width/height rounded to two places; near-duplicates share the same shape
+    """
+    with Image.open(path) as image:
+        return round(image.width / image.height, 2)
+
+def find_duplicates(paths, hashes):
+    """
+    Return (identical groups, near-identical pairs) among the images
+    """
+    by_hash = {}
+    for path in paths:
+        by_hash.setdefault(hashes[path], []).append(path)
+    identical = [group for group in by_hash.values() if len(group) > 1]
+
+    fingerprints = {}
+    for path in paths:
+        try:
+            fingerprints[path] = (aspect_ratio(path), dhash(path))
+        except (OSError, SyntaxError):
+            pass
+
+    near = []
+    readable = [p for p in paths if p in fingerprints]
+    for i, a in enumerate(readable):
+        for b in readable[i + 1:]:
+            (ratio_a, hash_a), (ratio_b, hash_b) = fingerprints[a], fingerprints[b]
+            if hashes[a] == hashes[b] or ratio_a != ratio_b:
+                continue
+            distance = bin(hash_a ^ hash_b).count("1")
+            if distance <= NEAR_DUPLICATE_DISTANCE:
+                near.append((a, b, distance))
+
+    return identical, near
+
+def rewrite_image_refs(content, variants):
+    """
+    Point img tags at the optimized variants: 1x as src, 2x (when there is
+    one) in srcset. Tags already using a variant are moved to the current one
+    of the same source, so re-encoded images replace the old hashes.
+    """
+    pattern = re.compile(r'(<img\b[^>]*?\ssrc=")((?:' + re.escape(BASE_URL) + r'/|(?:\.\./)*)?)'
+                         r'(' + VARIANT_PATTERN + r'|assets/images/[^"/]+)("[^>]*>)')
+    by_stem = {variant_stem(path): variant for path, variant in variants.items()}
+
+    def replace(match):
+        prefix, base, path, rest = match.group(1, 2, 3, 5)
+        is_variant = match.group("stem") is not None
+        variant = by_stem.get(match.group("stem")) if is_variant else variants.get(path)
+        if not variant:
+            return match.group(0)
+        tag = f'{prefix}{base}{variant["1x"]}{rest}'
+        if "2x" not in variant:
+            # A srcset left from an older variant would point at the same pixels again
+            return re.sub(r'\s+srcset="[^"]*"', "", tag, count=1) if is_variant else tag
+        srcset = f'srcset="{base}{variant["2x"]} 2x"'
+        if "srcset=" not in tag:
+            tag = tag.replace(f'src="{base}{variant["1x"]}"', f'src="{base}{variant["1x"]}" {srcset}', 1)
+        elif is_variant:
+            tag = re.sub(r'srcset="[^"]*"', lambda m: srcset, tag, count=1)
+        return tag
+
+    return pattern.sub(replace, content)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build email-sized image variants and rewrite references")
+    parser.add_argument("--dry-run", action="store_true", help="report only; do not write files")
+    args = parser.parse_args()
+
+    images, placeholders = find_images()
+    if not images:
+        print(f"❌ No images found in {images_dir}")
+        return 1
+
+    cache = load_cache()
+    hashes = {path: build_manifest.file_hash(path) for path in images}
+    variants = {}
+
+    def is_cached(entry):
+        if entry is None:
+            return False
+        if "error" in entry or entry.get("skip"):
+            return True
+        return all(os.path.exists(entry[s]) for s in ("1x", "2x") if s in entry)
+
+    stale = [path for path in images if not is_cached(cache.get(hashes[path]))]
+
+    print(f"🖼️  Optimizing {len(images)} images for a {COLUMN_WIDTH}px column "
+          f"({len(stale)} to encode, {len(images) - len(stale)} cached)...")
+    for path in placeholders:
+        print(f"ℹ️  {path.replace(os.sep, '/')}: placeholder, not image data; skipped")
+    print()
+
+    if stale and not args.dry_run:
+        with ProcessPoolExecutor() as executor:
+            for path, entry in zip(stale, executor.map(build_variants, stale)):
+                cache[hashes[path]] = entry
+        save_cache(cache)
+
+    for path in images:
+        entry = cache.get(hashes[path])
+        rel_path = path.replace(os.sep, "/")
+
+        if entry is None:
+            print(f"ℹ️  Would encode {rel_path}")
+            continue
+        if "error" in entry:
+            print(f"❌ {rel_path}: {entry['error']}")
+            continue
+        if entry.get("skip"):
+            print(f"ℹ️  {rel_path}: already smaller than any variant, kept as-is")
+            continue
+
+        variants[rel_path] = entry
+        saved = entry["source_bytes"] - entry["bytes"]["1x"]
+        retina = f"{entry['bytes']['2x'] // 1024} KB (2x)" if "2x" in entry else "no 2x"
+        print(f"✅ {rel_path}: {entry['source_bytes'] // 1024} KB → "
+              f"{entry['bytes']['1x'] // 1024} KB (1x) / {retina}, "
+              f"saves {saved // 1024} KB per open")
+
+    rewritten = 0
+    if not args.dry_run:
+        for template in sorted(glob.glob("emails/**/*.html", recursive=True)):
+            with open(template, 'r', encoding='utf-8') as f:
+                content = f.read()
+            new_content = rewrite_image_refs(content, variants)
+            if new_content != content:
+                with open(template, 'w', encoding='utf-8') as f:
+                    f.write(new_content)
+                rewritten += 1
+
+    identical, near = find_duplicates(images, hashes)
+
+    print()
+    print("=" * 50)
+    print(f"✅ Encoded {0 if args.dry_run else len(stale)} images, rewrote {rewritten} templates")
+    if rewritten:
+        print("Run generate_download_pages.py to refresh the download pages")
+
+    for group in identical:
+        print(f"⚠️  Byte-identical: {', '.join(group)}")
+    for a, b, distance in near:
+        print(f"⚠️  Near-identical ({distance}/64 bits differ): {a}, {b}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
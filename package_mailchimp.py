@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Build Mailchimp "Import Zip" packages that contain only what a template uses.
+
+For each template the package holds the sendable HTML (preview toolbar and
+scripts removed, as in email_files.py) and the local images it references
+(src, background, srcset and CSS url()), with those references rewritten to
+paths inside the zip so Mailchimp hosts the images. Unreferenced assets,
+.DS_Store files and the other templates stay out.
+
+The zip is streamed to disk file by file. PNG/JPG/GIF/WebP images are stored
+as they are (recompressing them only costs time), and text is deflated.
+Entries are sorted and carry fixed timestamps and permissions, so the same
+inputs give a byte-identical zip and unchanged packages are left untouched.
+Packages are built in parallel across templates.
+
+Usage:
+    python package_mailchimp.py                     # every email in emails/** -> build/mailchimp/
+    python package_mailchimp.py emails/newsletters/zomo-health-usi-template.html
+    python package_mailchimp.py --out dist/mailchimp --workers 4
+"""
+
+import os
+import re
+import sys
+import shutil
+import zipfile
+import argparse
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+import email_files
+import check_email_size
+
+emails_dir = "emails"
+output_dir = os.path.join("build", "mailchimp")
+
+# Already compressed; deflating them again saves next to nothing
+STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+# Fixed entry metadata for reproducible archives (the earliest time zip can record)
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644
+COPY_CHUNK = 1024 * 1024
+
+def collect_assets(content, template_path):
+    """
+    Return {url: repository path} for the local images a template references
+    """
+    assets = {}
+    for url in email_files.image_references(content):
+        path = email_files.resolve_image(urllib.parse.unquote(url), template_path)
+        if path is None or path.startswith(os.pardir) or os.path.isabs(path):
+            continue
+        if os.path.isfile(path):
+            assets[url] = path
+    return assets
+
+def archive_name(path):
+    return path.replace(os.sep, "/")
+
+def rewrite_references(content, assets):
+    """
+    Point every packaged URL at its path inside the zip
+    """
+    if not assets:
+        return content
+    targets = {url: urllib.parse.quote(archive_name(path)) for url, path in assets.items()}
+    # Whole URLs only: bounded by quotes, parentheses, whitespace or a srcset comma
+    pattern = re.compile(r'''(?<=["'(\s,])(%s)(?=["')\s,])''' %
+                         "|".join(re.escape(url) for url in sorted(targets, key=len, reverse=True)))
+    return pattern.sub(lambda m: targets[m.group(1)], content)
+
+def zip_entry(name):
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+    info.create_system = 3
+    info.external_attr = ZIP_FILE_MODE << 16
+    stored = name.lower().endswith(STORED_EXTENSIONS)
+    info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+    return info
+
+def write_package(zip_path, html_name, content, assets):
+    """
+    Stream the package to zip_path. Returns True when its bytes changed.
+    """
+    temp_path = zip_path + ".tmp"
+    with zipfile.ZipFile(temp_path, "w", compresslevel=9) as archive:
+        archive.writestr(zip_entry(html_name), content.encode('utf-8'))
+        for path in sorted(set(assets.values())):
+            with open(path, 'rb') as source, archive.open(zip_entry(archive_name(path)), "w") as target:
+                shutil.copyfileobj(source, target, COPY_CHUNK)
+
+    if os.path.exists(zip_path) and files_equal(zip_path, temp_path):
+        os.remove(temp_path)
+        return False
+    os.replace(temp_path, zip_path)
+    return True
+
+def files_equal(a, b):
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        while True:
+            chunk = fa.read(COPY_CHUNK)
+            if chunk != fb.read(COPY_CHUNK):
+                return False
+            if not chunk:
+                return True
+
+def package_template(template_path, out_dir):
+    """
+    Build one template's package. Runs in a worker process; returns a result dict.
+    """
+    relative = os.path.relpath(template_path, emails_dir)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(template_path)
+    zip_path = os.path.join(out_dir, os.path.splitext(relative)[0] + ".zip")
+    result = {"template": template_path, "zip": zip_path, "error": None}
+    try:
+        with open(template_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        content = email_files.strip_preview_chrome(content)
+        assets = collect_assets(content, template_path)
+        missing = [url for url in email_files.image_references(content) if url not in assets
+                   and email_files.resolve_image(urllib.parse.unquote(url), template_path) is not None]
+        content = rewrite_references(content, assets)
+
+        os.makedirs(os.path.dirname(zip_path), exist_ok=True)
+        result["changed"] = write_package(zip_path, os.path.basename(template_path), content, assets)
+        result["assets"] = len(set(assets.values()))
+        result["asset_bytes"] = sum(os.path.getsize(p) for p in set(assets.values()))
+        result["size"] = os.path.getsize(zip_path)
+        result["missing"] = missing
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def package_all(templates, out_dir, workers=None):
+    """
+    Package the templates across a process pool and return the per-template results
+    """
+    if not templates:
+        return []
+
+    # A pool is pure overhead for a handful of templates
+    if workers == 1 or len(templates) == 1:
+        return [package_template(t, out_dir) for t in templates]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(package_template, templates, [out_dir] * len(templates)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build Mailchimp Import Zip packages with only the referenced assets")
+    parser.add_argument("templates", nargs="*", help="templates to package (default: every email in emails/**)")
+    parser.add_argument("--out", default=output_dir, help=f"output directory (default: {output_dir})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    templates = args.templates or check_email_size.find_templates()
+    if not templates:
+        print("❌ No templates found")
+        return 1
+
+    print(f"📦 Packaging {len(templates)} templates into {args.out}/")
+    print("=" * 50)
+
+    results = package_all(templates, args.out, args.workers)
+    written = errors = 0
+    total = 0
+    for result in results:
+        if result["error"]:
+            errors += 1
+            print(f"❌ {result['template']}: {result['error']}")
+            continue
+        total += result["size"]
+        marker = "✅" if result["changed"] else "ℹ️ "
+        written += result["changed"]
+        print(f"{marker} {result['zip']}: {result['size'] / 1024:,.1f} KB "
+              f"({result['assets']} assets, {result['asset_bytes'] / 1024:,.1f} KB)")
+        for url in result["missing"]:
+            print(f"   ⚠️  Missing image, left as is: {url}")
+
+    print("=" * 50)
+    print(f"✅ {written} packages written, {len(results) - written - errors} unchanged "
+          f"({total / 1024 / 1024:.1f} MB in total)")
+    if errors:
+        print(f"❌ {errors} templates failed")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Partials and layouts for the email templates, with their dependency graph.
+
+Shared blocks (header, footer, dark-mode styles, theme toggle script) live
+once under templates/partials/ and page skeletons under templates/layouts/.
+A page in templates/pages/** names its layout and fills the layout's slots
+with blocks; everything is rendered with template_engine.
+
+Syntax:
+    {{> footer}}                  include templates/partials/footer.html
+    {{< transactional}}           (first line of a page) use templates/layouts/transactional.html
+    {{$content}} ... {{/content}} a block of the page, filling {{{content}}} in the layout
+
+An include or block tag alone on its line takes the whole line with it, and
+so does a {{{slot}}} alone on its line in a layout, so an empty block leaves
+no blank line behind. Block content is inserted as-is. Pages also get a
+{{slug}} value (the page's file name without .html).
+
+Expanded partials and compiled layouts are cached in memory for the whole
+run and revalidated by stat signature, so a batch expands each shared block
+once. Every page's dependencies (its own file, its layout and every partial
+they include, transitively) are reported so a build can rebuild exactly the
+pages that use a changed file.
+"""
+
+import os
+import re
+import glob
+
+import template_engine
+import build_manifest
+
+templates_dir = "templates"
+partials_dir = os.path.join(templates_dir, "partials")
+layouts_dir = os.path.join(templates_dir, "layouts")
+pages_dir = os.path.join(templates_dir, "pages")
+
+NAME = r'[\w.-]+(?:/[\w.-]+)*'
+
+# A standalone include takes its indentation and line break with it
+INCLUDE_PATTERN = re.compile(
+    r'^[ \t]*\{\{>\s*(?P<line>' + NAME + r')\s*\}\}[ \t]*(?:\r?\n|\Z)'
+    r'|\{\{>\s*(?P<inline>' + NAME + r')\s*\}\}',
+    re.M
+)
+LAYOUT_PATTERN = re.compile(r'\A\s*\{\{<\s*(?P<layout>' + NAME + r')\s*\}\}[ \t]*(?:\r?\n)?')
+BLOCK_PATTERN = re.compile(
+    r'\{\{\$\s*(?P<name>[\w.-]+)\s*\}\}(?:[ \t]*\r?\n)?(?P<body>.*?)\{\{/\s*(?P=name)\s*\}\}[ \t]*(?:\r?\n)?',
+    re.S
+)
+STANDALONE_SLOT_PATTERN = re.compile(r'^[ \t]*(?P<slot>\{\{\{\s*[\w.-]+\s*\}\}\})[ \t]*\r?\n', re.M)
+
+# path → (stat signature, text)
+_sources = {}
+# path → (stat signatures of the file and its partials, expanded text, partial paths)
+_expanded = {}
+# layout path → (stat signatures, compiled layout, partial paths)
+_layouts = {}
+
+def partial_path(name):
+    return os.path.join(partials_dir, *name.split("/")) + ".html"
+
+def layout_path(name):
+    return os.path.join(layouts_dir, *name.split("/")) + ".html"
+
+def find_pages():
+    return sorted(glob.glob(os.path.join(pages_dir, "**", "*.html"), recursive=True))
+
+def page_slug(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def read_source(path):
+    """
+    Return the text of a template file, from memory when it has not changed
+    """
+    signature = build_manifest.file_signature(path)
+    if signature is None:
+        raise ValueError(f"{path} not found")
+    cached = _sources.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        text = f.read()
+    _sources[path] = (signature, text)
+    return text
+
+def _signatures(paths):
+    return [build_manifest.file_signature(p) for p in paths]
+
+def expand_includes(text, source, stack=()):
+    """
+    Replace every {{> name}} in text with the expanded partial.
+    Returns (text, partial paths it depends on, transitively, in first-use order).
+    """
+    deps = []
+
+    def replace(match):
+        name = match.group("line") or match.group("inline")
+        path = partial_path(name)
+        if path == source or path in stack:
+            chain = " → ".join(stack + (source, path))
+            raise ValueError(f"Include cycle: {chain}")
+        if not os.path.isfile(path):
+            raise ValueError(f"{source}: partial '{name}' not found ({path})")
+
+        partial, partial_deps = load_expanded(path, stack + (source,))
+        deps.append(path)
+        deps.extend(partial_deps)
+        if match.group("inline") is not None and partial.endswith("\n"):
+            partial = partial[:-2] if partial.endswith("\r\n") else partial[:-1]
+        return partial
+
+    return INCLUDE_PATTERN.sub(replace, text), list(dict.fromkeys(deps))
+
+def load_expanded(path, stack=()):
+    """
+    Return (expanded text, partial paths) for a partial or layout file, reusing
+    the in-memory expansion while neither the file nor its partials changed
+    """
+    cached = _expanded.get(path)
+    if cached is not None and cached[0] == _signatures([path] + cached[2]):
+        return cached[1], cached[2]
+
+    text, deps = expand_includes(read_source(path), path, stack)
+    _expanded[path] = (_signatures([path] + deps), text, deps)
+    return text, deps
+
+def load_layout(path):
+    """
+    Return (compiled layout, partial paths) with its partials expanded
+    """
+    cached = _layouts.get(path)
+    if cached is not None and cached[0] == _signatures([path] + cached[2]):
+        return cached[1], cached[2]
+
+    text, deps = load_expanded(path)
+    compiled = template_engine.compile_text(STANDALONE_SLOT_PATTERN.sub(r'\g<slot>', text))
+    _layouts[path] = (_signatures([path] + deps), compiled, deps)
+    return compiled, deps
+
+def parse_page(path):
+    """
+    Parse a page into {"layout", "blocks", "text", "deps"}. For a page without
+    a layout, "text" is the expanded page itself.
+    """
+    text, deps = expand_includes(read_source(path), path)
+    match = LAYOUT_PATTERN.match(text)
+    if match is None:
+        return {"layout": None, "blocks": {}, "text": text, "deps": [path] + deps}
+
+    blocks = {}
+    pos = match.end()
+    for block in BLOCK_PATTERN.finditer(text, pos):
+        if text[pos:block.start()].strip():
+            raise ValueError(f"{path}: content outside a block: {text[pos:block.start()].strip()[:40]!r}")
+        body = block.group("body")
+        # A closing tag on its own line leaves the last content line intact
+        head, newline, tail = body.rpartition("\n")
+        if newline and not tail.strip():
+            body = head + newline
+        blocks[block.group("name")] = body
+        pos = block.end()
+    if text[pos:].strip():
+        raise ValueError(f"{path}: content outside a block: {text[pos:].strip()[:40]!r}")
+
+    layout = layout_path(match.group("layout"))
+    if not os.path.isfile(layout):
+        raise ValueError(f"{path}: layout '{match.group('layout')}' not found ({layout})")
+    return {"layout": layout, "blocks": blocks, "text": None, "deps": [path] + deps}
+
+def page_dependencies(path):
+    """
+    Return every file the rendered page depends on: the page, its layout and
+    all partials either of them includes
+    """
+    page = parse_page(path)
+    deps = page["deps"]
+    if page["layout"] is not None:
+        deps = deps + [page["layout"]] + load_layout(page["layout"])[1]
+    return list(dict.fromkeys(deps))
+
+def render_page(path, values=None):
+    """
+    Render a page. Returns (html, dependencies).
+    """
+    page = parse_page(path)
+    context = {"slug": page_slug(path)}
+    context.update(page["blocks"])
+    context.update(values or {})
+
+    if page["layout"] is None:
+        return template_engine.render(template_engine.compile_text(page["text"]), context), page["deps"]
+
+    compiled, layout_deps = load_layout(page["layout"])
+    deps = list(dict.fromkeys(page["deps"] + [page["layout"]] + layout_deps))
+    return template_engine.render(compiled, context), deps
+
+def dependency_graph(pages):
+    """
+    Return {page: [dependencies]} for the given pages
+    """
+    return {page: page_dependencies(page) for page in pages}
+
+def dependents(graph, paths):
+    """
+    Return the pages of the graph that depend on any of the given files
+    """
+    paths = {os.path.normpath(p) for p in paths}
+    return sorted(page for page, deps in graph.items()
+                  if paths.intersection(os.path.normpath(d) for d in deps))
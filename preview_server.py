@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Local preview server with in-memory incremental rebuilds and live reload.
+
+Serves index.html, emails/** and the download pages from an in-memory build:
+each email has its applicable transform_pipeline passes applied, and its
+download page is rendered from the transformed source, without touching the
+files on disk. The source tree is watched (inotify on Linux, polling
+elsewhere); a change rebuilds only the affected pages and pushes a reload to
+open browser tabs showing them. Built pages are served with ETags and
+pre-gzipped bodies; everything else is served from disk.
+
+Usage:
+    python preview_server.py                 # http://127.0.0.1:8000/
+    python preview_server.py --port 9000 --poll
+"""
+
+import os
+import sys
+import glob
+import gzip
+import html
+import json
+import time
+import ctypes
+import struct
+import select
+import hashlib
+import argparse
+import mimetypes
+import threading
+import ctypes.util
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+import transform_pipeline
+import generate_download_pages
+
+DEFAULT_PORT = 8000
+
+# Directories whose changes can affect a page
+WATCH_DIRS = [".", "emails", "code-pages", "assets"]
+
+# Events arriving within this window are rebuilt together (editors often write twice)
+DEBOUNCE_SECONDS = 0.02
+POLL_SECONDS = 0.25
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = (
+    '<script>new EventSource("' + LIVE_RELOAD_PATH + '").onmessage = function (e) {'
+    ' var paths = JSON.parse(e.data);'
+    ' if (paths.indexOf("*") >= 0 || paths.indexOf(location.pathname) >= 0) location.reload(); };</script>'
+)
+
+class Site:
+    """
+    The in-memory build: URL path → {"body", "gzip", "etag", "type"}
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Condition()
+        self.version = 0
+        self.last_changed = []
+        self.shell = generate_download_pages.load_shell()
+
+    def _store(self, file_path, text):
+        body = inject_live_reload(text).encode('utf-8')
+        entry = {
+            "body": body,
+            "gzip": gzip.compress(body, compresslevel=6, mtime=0),
+            "etag": '"' + hashlib.sha256(body).hexdigest()[:20] + '"',
+            "type": "text/html; charset=utf-8",
+        }
+        url = url_for(file_path)
+        with self.lock:
+            self.pages[url] = entry
+        return [url] + (["/"] if url == "/index.html" else [])
+
+    def _remove(self, file_path):
+        url = url_for(file_path)
+        with self.lock:
+            self.pages.pop(url, None)
+        return [url]
+
+    def build_email(self, source_path):
+        """
+        Build one email and its download page. Returns the changed URL paths.
+        """
+        if not os.path.exists(source_path):
+            urls = self._remove(source_path)
+            return urls + self._remove(generate_download_pages.download_page_path(source_path))
+
+        content = transformed_source(source_path)
+        urls = self._store(source_path, content)
+
+        if generate_download_pages.is_source(source_path):
+            urls += self.build_download_page(source_path, content)
+        return urls
+
+    def build_download_page(self, source_path, content):
+        page_path = generate_download_pages.download_page_path(source_path)
+        prefix, suffix = self.shell
+        page = generate_download_pages.fill_shell(prefix, source_path) + html.escape(content) + suffix
+
+        passes = transform_pipeline.passes_for_file(page_path, transform_pipeline.PASSES)
+        page, _ = transform_pipeline.apply_passes(page, passes)
+        return self._store(page_path, page)
+
+    def build_static_page(self, file_path):
+        if not os.path.exists(file_path):
+            return self._remove(file_path)
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            return self._store(file_path, f.read())
+
+    def build_all(self):
+        self.build_static_page("index.html")
+        for source_path in email_sources():
+            self.build_email(source_path)
+
+    def rebuild(self, file_paths):
+        """
+        Rebuild whatever the changed files affect. Returns the changed URL paths.
+        """
+        urls = []
+        for file_path in sorted(file_paths):
+            if file_path == generate_download_pages.shell_path:
+                self.shell = generate_download_pages.load_shell()
+                for source_path in generate_download_pages.find_sources():
+                    urls += self.build_download_page(source_path, transformed_source(source_path))
+            elif file_path == "index.html":
+                urls += self.build_static_page(file_path)
+            elif file_path.startswith("emails" + os.sep) and file_path.endswith(".html") \
+                    and not file_path.endswith(".min.html"):
+                urls += self.build_email(file_path)
+            elif file_path.startswith("assets" + os.sep) or file_path.startswith("code-pages" + os.sep):
+                urls.append("*")
+        return list(dict.fromkeys(urls))
+
+    def notify(self, urls):
+        with self.changed:
+            self.version += 1
+            self.last_changed = urls
+            self.changed.notify_all()
+
+def transformed_source(source_path):
+    """
+    Read an email and apply its transform passes in memory
+    """
+    with open(source_path, 'r', encoding='utf-8', newline='') as f:
+        content = f.read()
+    passes = transform_pipeline.passes_for_file(source_path, transform_pipeline.PASSES)
+    return transform_pipeline.apply_passes(content, passes)[0]
+
+def url_for(file_path):
+    return "/" + os.path.normpath(file_path).replace(os.sep, "/")
+
+def email_sources():
+    return [path for path in glob.glob(os.path.join("emails", "**", "*.html"), recursive=True)
+            if not path.endswith(".min.html")]
+
+def inject_live_reload(text):
+    index = text.lower().rfind("</body>")
+    if index == -1:
+        return text + LIVE_RELOAD_SCRIPT
+    return text[:index] + LIVE_RELOAD_SCRIPT + text[index:]
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+def watched_directories():
+    for root in WATCH_DIRS:
+        if root == ".":
+            yield root
+            continue
+        for directory, subdirs, _ in os.walk(root):
+            subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+            yield directory
+
+def inotify_watcher(on_change):
+    """
+    Watch the tree with inotify through libc. Returns a thread, or None when
+    inotify is unavailable.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+
+    directories = {}
+
+    def add_watch(directory):
+        wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            directories[wd] = directory
+
+    for directory in watched_directories():
+        add_watch(directory)
+
+    def run():
+        while True:
+            data = os.read(fd, 64 * 1024)
+            changed = set()
+            while True:
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                    name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                    offset += EVENT_HEADER.size + length
+                    if wd not in directories or not name:
+                        continue
+                    path = os.path.normpath(os.path.join(directories[wd], os.fsdecode(name)))
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            add_watch(path)
+                    elif not os.path.basename(path).startswith("."):
+                        changed.add(path)
+                # Collect the rest of a burst of events before rebuilding
+                readable, _, _ = select.select([fd], [], [], DEBOUNCE_SECONDS)
+                if not readable:
+                    break
+                data = os.read(fd, 64 * 1024)
+            if changed:
+                on_change(changed)
+
+    return threading.Thread(target=run, name="inotify", daemon=True)
+
+def polling_watcher(on_change):
+    """
+    Fallback watcher that compares file stat signatures every POLL_SECONDS
+    """
+    def snapshot():
+        state = {}
+        for directory in watched_directories():
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        state[os.path.normpath(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def run():
+        previous = snapshot()
+        while True:
+            time.sleep(POLL_SECONDS)
+            current = snapshot()
+            changed = {path for path in previous.keys() | current.keys() if previous.get(path) != current.get(path)}
+            previous = current
+            if changed:
+                on_change(changed)
+
+    return threading.Thread(target=run, name="poll", daemon=True)
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    site = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        path = unquote(urlsplit(self.path).path)
+        if path == LIVE_RELOAD_PATH:
+            return self.live_reload()
+        if path.endswith("/"):
+            path += "index.html"
+
+        with self.site.lock:
+            entry = self.site.pages.get(path)
+        if entry is None:
+            entry = self.static_entry(path)
+        if entry is None:
+            self.send_error(404)
+            return
+
+        if self.headers.get("If-None-Match") == entry["etag"]:
+            self.send_response(304)
+            self.send_header("ETag", entry["etag"])
+            self.end_headers()
+            return
+
+        body = entry["body"]
+        compressed = entry.get("gzip") is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        if compressed:
+            body = entry["gzip"]
+
+        self.send_response(200)
+        self.send_header("Content-Type", entry["type"])
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", entry["etag"])
+        self.send_header("Cache-Control", "no-cache")
+        if entry.get("gzip") is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def static_entry(self, path):
+        """
+        Serve files outside the build from disk, with a stat-based ETag
+        """
+        file_path = os.path.normpath(path.lstrip("/"))
+        if file_path.startswith("..") or os.path.isabs(file_path) or not os.path.isfile(file_path):
+            return None
+        stat = os.stat(file_path)
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        return {
+            "body": body,
+            "gzip": None,
+            "etag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+            "type": mimetypes.guess_type(file_path)[0] or "application/octet-stream",
+        }
+
+    def live_reload(self):
+        """
+        Server-sent events stream announcing the URL paths of rebuilt pages
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        site = self.site
+        with site.changed:
+            seen = site.version
+        try:
+            while True:
+                with site.changed:
+                    site.changed.wait_for(lambda: site.version != seen, timeout=15)
+                    version, urls = site.version, site.last_changed
+                if version == seen:
+                    self.wfile.write(b": ping\n\n")
+                else:
+                    seen = version
+                    self.wfile.write(f"data: {json.dumps(urls)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Preview the site with live reload")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--poll", action="store_true", help="poll for changes instead of using inotify")
+    args = parser.parse_args()
+
+    site = Site()
+    start = time.perf_counter()
+    site.build_all()
+    print(f"🏗️  Built {len(site.pages)} pages in memory in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def on_change(paths):
+        start = time.perf_counter()
+        try:
+            urls = site.rebuild(paths)
+        except Exception as e:
+            print(f"❌ Rebuild failed: {e}")
+            return
+        if urls:
+            site.notify(urls)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"♻️  {', '.join(sorted(paths))} → {len(urls)} pages rebuilt in {elapsed:.1f} ms")
+
+    watcher = None if args.poll else inotify_watcher(on_change)
+    mode = "inotify"
+    if watcher is None:
+        watcher = polling_watcher(on_change)
+        mode = "polling"
+    watcher.start()
+
+    PreviewHandler.site = site
+    server = ThreadingHTTPServer((args.host, args.port), PreviewHandler)
+    server.daemon_threads = True
+    print(f"👀 Watching for changes ({mode})")
+    print(f"🌐 Serving on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
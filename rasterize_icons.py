@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Bake the icons used in emails/** into colored 1x/2x PNGs.
+
+The icon <img> tags point at assets/images/icons/*.svg or *.png and carry the
+intended color as a `color:` style, which an external image ignores (and many
+clients do not render SVG at all). This stage collects every (icon, size,
+color) combination actually used, rasterizes each once into
+assets/images/icons/baked/ and rewrites the tags to use the 1x PNG as src and
+the 2x PNG in srcset. `currentColor` and uncolored icons take the nearest
+ancestor's inline text color.
+
+Rendering uses cairosvg when it is installed (sharpest, straight from the SVG)
+and otherwise recolors the existing PNG icon's alpha mask with Pillow. Baked
+files are cached by (icon, size, color) and the source icon's hash, so a run
+only renders new combinations.
+
+Usage:
+    python rasterize_icons.py              # bake and rewrite emails/**
+    python rasterize_icons.py --dry-run    # list the combinations in use
+"""
+
+import io
+import os
+import re
+import sys
+import glob
+import json
+import hashlib
+import argparse
+
+from PIL import Image, ImageColor
+
+import css_parser
+import build_manifest
+
+try:
+    import cairosvg
+except ImportError:
+    cairosvg = None
+
+# Base URL for the Vercel deployment
+BASE_URL = "https://zomo-emails.vercel.app"
+
+icons_dir = "assets/images/icons"
+baked_dir = "assets/images/icons/baked"
+cache_path = ".cache/icons.json"
+
+# Bump when the rendering changes so cached icons are rebuilt
+RASTER_VERSION = "1"
+
+SCALES = (1, 2)
+
+# Used when neither the icon nor any ancestor sets a color (the template text color)
+DEFAULT_COLOR = "#0a1216"
+DEFAULT_SIZE = 24
+
+# Source icons (svg/png directly under icons/) and previously baked icons
+ICON_SRC_PATTERN = re.compile(
+    r'^(?P<base>(?:' + re.escape(BASE_URL) + r'/|/|(?:\.\./)*)?)assets/images/icons/'
+    r'(?:baked/(?P<baked>[a-z0-9_]+)-(?P<baked_size>\d+)-(?P<baked_color>[0-9a-f]{6})@1x\.[0-9a-f]+\.png'
+    r'|(?P<icon>[a-z0-9_]+)\.(?:svg|png))$'
+)
+ATTR_PATTERN_TEMPLATE = r'''\s{name}\s*=\s*("[^"]*"|'[^']*')'''
+PX_PATTERN = re.compile(r'^\s*(\d+)(?:px)?\s*$')
+
+def find_templates():
+    """
+    Return every HTML file in emails/** (minified outputs excluded)
+    """
+    templates = glob.glob(os.path.join("emails", "**", "*.html"), recursive=True)
+    return sorted(t for t in templates if not t.endswith(".min.html"))
+
+def normalize_color(value):
+    """
+    Return a color as lower-case #rrggbb, or None for currentColor and
+    values Pillow cannot parse
+    """
+    value = value.strip().lower()
+    if value in ("currentcolor", "inherit", "initial", ""):
+        return None
+    try:
+        rgb = ImageColor.getrgb(value)
+    except ValueError:
+        return None
+    return "#{:02x}{:02x}{:02x}".format(*rgb[:3])
+
+def style_value(element, prop):
+    for name, value, _ in css_parser.parse_declarations(element["attrs"].get("style", "")):
+        if name == prop:
+            return value
+    return None
+
+def icon_size(element):
+    """
+    Rendered size in CSS pixels from the style or the width attribute
+    """
+    for value in (style_value(element, "width"), element["attrs"].get("width")):
+        match = PX_PATTERN.match(value or "")
+        if match:
+            return int(match.group(1))
+    return DEFAULT_SIZE
+
+def icon_color(elements, element):
+    """
+    The icon's own color, else the nearest ancestor's inline color
+    """
+    color = normalize_color(style_value(element, "color") or "")
+    index = element["parent"]
+    while color is None and index is not None:
+        ancestor = elements[index]
+        color = normalize_color(style_value(ancestor, "color") or "")
+        index = ancestor["parent"]
+    return color or DEFAULT_COLOR
+
+def collect_icons(content):
+    """
+    Return [(element, base prefix, (icon, size, color))] for the icon tags of a document
+    """
+    elements = css_parser.scan_elements(content)
+    found = []
+
+    for element in elements:
+        if element["tag"] != "img":
+            continue
+        match = ICON_SRC_PATTERN.match(element["attrs"].get("src", ""))
+        if not match:
+            continue
+        if match.group("baked"):
+            icon = match.group("baked")
+            color = normalize_color(style_value(element, "color") or "") or "#" + match.group("baked_color")
+        else:
+            icon = match.group("icon")
+            color = icon_color(elements, element)
+        found.append((element, match.group("base"), (icon, icon_size(element), color)))
+
+    return found
+
+def source_icon(icon):
+    """
+    Return the source file used to render an icon (SVG preferred with cairosvg)
+    """
+    svg = os.path.join(icons_dir, f"{icon}.svg")
+    png = os.path.join(icons_dir, f"{icon}.png")
+    if cairosvg is not None and os.path.exists(svg):
+        return svg
+    return png if os.path.exists(png) else None
+
+def render_icon(source_path, pixels, color):
+    """
+    Render an icon as a square PNG of the given pixel size and color
+    """
+    if source_path.endswith(".svg"):
+        with open(source_path, 'r', encoding='utf-8') as f:
+            svg = f.read()
+        svg = re.sub(r'<svg\b', f'<svg fill="{color}"', svg, count=1)
+        return cairosvg.svg2png(bytestring=svg.encode('utf-8'), output_width=pixels, output_height=pixels)
+
+    # The PNG icons are white shapes on transparency; keep the alpha as a mask
+    with Image.open(source_path) as image:
+        mask = image.convert("RGBA").getchannel("A").resize((pixels, pixels), Image.LANCZOS)
+    tinted = Image.new("RGBA", (pixels, pixels), ImageColor.getrgb(color) + (0,))
+    tinted.putalpha(mask)
+    output = io.BytesIO()
+    tinted.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+def bake(key, source_path):
+    """
+    Render the 1x/2x PNGs of one (icon, size, color) and write them under
+    content-hashed names. Returns {"1x": path, "2x": path}.
+    """
+    icon, size, color = key
+    baked = {}
+    for scale in SCALES:
+        data = render_icon(source_path, size * scale, color)
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        path = os.path.join(baked_dir, f"{icon}-{size}-{color[1:]}@{scale}x.{digest}.png")
+        if not os.path.exists(path):
+            os.makedirs(baked_dir, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        baked[f"{scale}x"] = path.replace(os.sep, "/")
+    return baked
+
+def cache_version():
+    return f"{RASTER_VERSION}:{'cairosvg' if cairosvg is not None else 'pillow'}"
+
+def load_cache():
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get("version") == cache_version() else {}
+
+def save_cache(cache):
+    cache["version"] = cache_version()
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+def set_attribute(start_tag, name, value):
+    """
+    Replace or add an attribute of a start tag
+    """
+    pattern = re.compile(ATTR_PATTERN_TEMPLATE.format(name=re.escape(name)), re.I)
+    escaped = value.replace('"', "&quot;")
+    if pattern.search(start_tag):
+        return pattern.sub(lambda m: f' {name}="{escaped}"', start_tag, count=1)
+    closing = "/>" if start_tag.endswith("/>") else ">"
+    return f'{start_tag[:-len(closing)].rstrip()} {name}="{escaped}"{closing}'
+
+def rewrite_tag(start_tag, element, base, baked, size):
+    """
+    Point an icon tag at its baked PNGs and drop the ineffective color style
+    """
+    tag = set_attribute(start_tag, "src", base + baked["1x"])
+    tag = set_attribute(tag, "srcset", f'{base}{baked["2x"]} 2x')
+
+    style = element["attrs"].get("style")
+    if style is not None:
+        declarations = [d for d in css_parser.parse_declarations(style) if d[0] != "color"]
+        tag = set_attribute(tag, "style", css_parser.serialize_declarations(declarations) + ";")
+
+    for name in ("width", "height"):
+        if name not in element["attrs"]:
+            tag = set_attribute(tag, name, str(size))
+    return tag
+
+def rewrite_content(content, found, baked_icons):
+    """
+    Apply the tag rewrites for one document
+    """
+    pieces = []
+    pos = 0
+    for element, base, key in found:
+        baked = baked_icons.get(key)
+        if baked is None:
+            continue
+        start_tag = content[element["start"]:element["end"]]
+        pieces.append(content[pos:element["start"]])
+        pieces.append(rewrite_tag(start_tag, element, base, baked, key[1]))
+        pos = element["end"]
+    pieces.append(content[pos:])
+    return "".join(pieces)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake the icons used in emails/** into colored PNGs")
+    parser.add_argument("--dry-run", action="store_true", help="list the combinations in use; write nothing")
+    args = parser.parse_args()
+
+    documents = {}
+    combinations = {}
+    for template in find_templates():
+        with open(template, 'r', encoding='utf-8') as f:
+            content = f.read()
+        found = collect_icons(content)
+        if found:
+            documents[template] = (content, found)
+            for _, _, key in found:
+                combinations[key] = combinations.get(key, 0) + 1
+
+    renderer = "cairosvg" if cairosvg is not None else "Pillow (PNG mask)"
+    print(f"🎨 {len(combinations)} icon variants in use across {len(documents)} templates (renderer: {renderer})")
+    print()
+
+    cache = load_cache()
+    baked_icons = {}
+    rendered = 0
+
+    for key in sorted(combinations):
+        icon, size, color = key
+        label = f"{icon} {size}px {color}"
+        source_path = source_icon(icon)
+        if source_path is None:
+            print(f"❌ {label}: no source icon in {icons_dir}")
+            continue
+        if args.dry_run:
+            print(f"ℹ️  {label} ({combinations[key]} uses)")
+            continue
+
+        cache_key = f"{icon}|{size}|{color}"
+        source_hash = build_manifest.file_hash(source_path)
+        entry = cache.get(cache_key)
+        if (entry is None or entry.get("source") != source_hash
+                or not all(os.path.exists(entry[s]) for s in ("1x", "2x"))):
+            entry = dict(bake(key, source_path), source=source_hash)
+            cache[cache_key] = entry
+            rendered += 1
+            print(f"✅ Baked {label} → {entry['1x']}")
+        baked_icons[key] = entry
+
+    if args.dry_run:
+        return 0
+
+    save_cache(cache)
+
+    rewritten = 0
+    for template, (content, found) in documents.items():
+        new_content = rewrite_content(content, found, baked_icons)
+        if new_content != content:
+            with open(template, 'w', encoding='utf-8') as f:
+                f.write(new_content)
+            rewritten += 1
+
+    print()
+    print("=" * 50)
+    print(f"✅ Rendered {rendered} variants ({len(baked_icons) - rendered} cached), rewrote {rewritten} templates")
+    if rewritten:
+        print("Run generate_download_pages.py to refresh the download pages")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Render Mailchimp merge tags (*|FNAME|*, *|UNSUB|*, ...) locally.
+
+A template is compiled once into static fragments and merge-tag slots, with
+the fragments pre-encoded to UTF-8. Each recipient then costs only the
+encoding of its own values and one join, so large recipient lists stream
+through with bounded memory. Recipients are read from CSV or JSON Lines and
+the personalized HTML is written to a directory or to a single tar archive.
+
+Usage:
+    python render_merge_tags.py emails/transactional/password-reset.html recipients.csv --out build/qa
+    python render_merge_tags.py template.html recipients.jsonl --archive build/qa.tar.gz
+    python render_merge_tags.py template.html recipients.csv --out build/qa --set UNSUB=https://example.com/u
+"""
+
+import io
+import os
+import re
+import csv
+import sys
+import json
+import html
+import time
+import tarfile
+import argparse
+
+import template_engine
+
+# Matches *|TAG|* and *|TAG:ARG|*; Mailchimp tags are upper case
+MERGE_TAG_PATTERN = re.compile(r'\*\|(?P<name>[A-Z0-9_]+(?::[A-Z0-9_]+)?)\|\*')
+
+# How often to report progress while rendering
+PROGRESS_EVERY = 10000
+
+def compile_merge_template(path):
+    """
+    Compile a template's merge tags into pre-encoded fragments and slot names
+    """
+    return _encode_compiled(template_engine.load_template(path, MERGE_TAG_PATTERN), path)
+
+def compile_merge_text(text, path=None):
+    """
+    Compile merge tags in template text that has already been read
+    """
+    return _encode_compiled(template_engine.compile_template(text, MERGE_TAG_PATTERN), path)
+
+def _encode_compiled(compiled, path):
+    return {
+        "path": path,
+        "fragments": [f.encode('utf-8') for f in compiled["fragments"]],
+        "slots": [name for name, _ in compiled["slots"]],
+        "tags": template_engine.slot_names(compiled),
+    }
+
+def render_message(compiled, values, keep_missing=True, escape=True):
+    """
+    Render one personalized message as UTF-8 bytes.
+    Values are HTML-escaped (unless escape is off, for plain text); tags
+    without a value are left as-is when keep_missing is set (so QA can spot
+    them) or removed otherwise.
+    """
+    fragments = compiled["fragments"]
+    parts = [fragments[0]]
+    encoded = {}
+
+    for name, fragment in zip(compiled["slots"], fragments[1:]):
+        value = encoded.get(name)
+        if value is None:
+            raw = values.get(name)
+            if raw is None or raw == "":
+                value = f"*|{name}|*".encode('utf-8') if keep_missing else b""
+            else:
+                value = (html.escape(str(raw)) if escape else str(raw)).encode('utf-8')
+            encoded[name] = value
+        parts.append(value)
+        parts.append(fragment)
+
+    return b"".join(parts)
+
+def normalize_keys(record):
+    """
+    Upper-case the recipient fields so they match merge tag names
+    """
+    return {str(k).strip().upper(): v for k, v in record.items() if k is not None}
+
+def iter_recipients(path):
+    """
+    Stream recipient records from a CSV (with a header row) or JSON Lines file
+    """
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield normalize_keys(json.loads(line))
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                yield normalize_keys(row)
+
+def message_name(index, record, name_field, extension=".html"):
+    """
+    Build a safe output file name for a recipient
+    """
+    stem = str(record.get(name_field) or "") if name_field else ""
+    stem = re.sub(r'[^A-Za-z0-9@._-]+', '_', stem).strip('._')
+    return f"{index:07d}-{stem}{extension}" if stem else f"{index:07d}{extension}"
+
+def directory_writer(out_dir):
+    """
+    Return (write, close) callables that store each message as its own file
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    def write(name, data):
+        with open(os.path.join(out_dir, name), 'wb') as f:
+            f.write(data)
+
+    return write, lambda: None
+
+def archive_writer(archive_path):
+    """
+    Return (write, close) callables that stream messages into one tar archive
+    (gzip-compressed when the name ends in .gz)
+    """
+    mode = "w|gz" if archive_path.endswith(".gz") else "w|"
+    archive = tarfile.open(archive_path, mode)
+    mtime = int(time.time())
+
+    def write(name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = mtime
+        archive.addfile(info, io.BytesIO(data))
+
+    return write, archive.close
+
+def render_batch(template_path, recipients_path, write, defaults=None,
+                 keep_missing=True, name_field="EMAIL", progress=True):
+    """
+    Render every recipient and hand the result to write(name, data).
+    Returns a stats dict with counts, bytes and throughput.
+    """
+    compiled = compile_merge_template(template_path)
+    defaults = normalize_keys(defaults or {})
+
+    count = 0
+    total_bytes = 0
+    start = time.perf_counter()
+
+    for record in iter_recipients(recipients_path):
+        values = dict(defaults)
+        values.update({k: v for k, v in record.items() if v not in (None, "")})
+
+        data = render_message(compiled, values, keep_missing)
+        write(message_name(count, record, name_field), data)
+
+        count += 1
+        total_bytes += len(data)
+
+        if progress and count % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            print(f"  … {count} messages ({count / elapsed:,.0f} msg/s)")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "messages": count,
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "messages_per_second": count / elapsed if elapsed else 0.0,
+        "tags": compiled["tags"],
+    }
+
+def parse_assignments(pairs):
+    """
+    Parse TAG=value pairs from the command line
+    """
+    values = {}
+    for pair in pairs or []:
+        if "=" not in pair:
+            raise ValueError(f"Expected TAG=value, got '{pair}'")
+        key, value = pair.split("=", 1)
+        values[key] = value
+    return values
+
+def main():
+    parser = argparse.ArgumentParser(description="Render merge tags for a recipient list")
+    parser.add_argument("template", help="HTML template containing *|TAG|* merge tags")
+    parser.add_argument("recipients", help="recipient list (.csv with header, or .jsonl)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--out", help="write one HTML file per recipient to this directory")
+    output.add_argument("--archive", help="write all messages to one .tar / .tar.gz archive")
+    parser.add_argument("--set", action="append", metavar="TAG=VALUE",
+                        help="default value for a tag (e.g. UNSUB=https://...)")
+    parser.add_argument("--defaults", help="JSON file of default tag values")
+    parser.add_argument("--drop-missing", action="store_true",
+                        help="remove tags with no value instead of leaving them in place")
+    parser.add_argument("--name-field", default="EMAIL", help="field used in output file names (default: EMAIL)")
+    args = parser.parse_args()
+
+    defaults = {}
+    if args.defaults:
+        with open(args.defaults, 'r', encoding='utf-8') as f:
+            defaults.update(json.load(f))
+    defaults.update(parse_assignments(args.set))
+
+    if args.out:
+        write, close = directory_writer(args.out)
+        destination = args.out
+    else:
+        write, close = archive_writer(args.archive)
+        destination = args.archive
+
+    print(f"✉️  Rendering {args.template} for {args.recipients} → {destination}")
+
+    try:
+        stats = render_batch(args.template, args.recipients, write, defaults,
+                             keep_missing=not args.drop_missing,
+                             name_field=args.name_field.upper())
+    finally:
+        close()
+
+    print("=" * 50)
+    print(f"✅ Rendered {stats['messages']} messages, {stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.2f}s")
+    print(f"⚡ {stats['messages_per_second']:,.0f} msg/s")
+    print(f"🏷️  Merge tags: {', '.join(stats['tags']) or 'none'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Bulk-send MIME messages over a pool of persistent SMTP connections.
+
+Messages come from build_messages.py: a directory of .eml files, a .tar
+archive of them, or built on the fly from --template and --recipients.
+Each of --connections workers keeps one SMTP session open and sends message
+after message over it (MAIL/RCPT/DATA, with RSET after a rejected message).
+When the server advertises PIPELINING the envelope commands go out in one
+write. Sending is throttled per connection (--per-connection-rate) and
+across the pool (--rate), in messages per second.
+
+A 4xx reply, a dropped connection or a timeout is transient: the message is
+retried with exponential backoff (--retries) on a fresh session. A 5xx reply
+fails the message for good. The run reports messages per second and the
+send latency percentiles (from the first MAIL FROM to the final 250).
+
+smtp_sink.py is a local SMTP stand-in for trying the whole path:
+    python smtp_sink.py --port 2525 &
+    python send_messages.py build/eml --host 127.0.0.1 --port 2525
+
+Usage:
+    python send_messages.py build/eml --host smtp.example.com --port 587 --starttls --user me
+    python send_messages.py build/eml.tar --host 127.0.0.1 --port 2525 --connections 8 --rate 200
+    python send_messages.py --template emails/transactional/password-reset.html \\
+        --recipients recipients.csv --from "ZOMO Health <no-reply@example.com>" --host 127.0.0.1 --port 2525
+"""
+
+import os
+import ssl
+import sys
+import time
+import base64
+import socket
+import asyncio
+import tarfile
+import argparse
+from email.parser import BytesHeaderParser
+from email.utils import getaddresses, parseaddr
+
+import build_messages
+import render_merge_tags
+
+DEFAULT_PORT = 25
+DEFAULT_CONNECTIONS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 30
+# Many servers end a session after this many messages; reconnecting first avoids a failed send
+DEFAULT_MAX_PER_CONNECTION = 100
+RETRY_DELAY = 0.5
+QUEUE_PER_CONNECTION = 4
+PROGRESS_EVERY = 1000
+
+class SMTPReplyError(Exception):
+    """
+    The server answered a command with an error code
+    """
+
+    def __init__(self, code, text, command):
+        super().__init__(f"{command}: {code} {text}")
+        self.code = code
+
+    @property
+    def transient(self):
+        return 400 <= self.code < 500
+
+class RateLimiter:
+    """
+    Space out events to at most rate per second (no limit when rate is 0)
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_time)
+        self.next_time = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class SMTPConnection:
+    """
+    One SMTP session on asyncio streams
+    """
+
+    def __init__(self, host, port, timeout=DEFAULT_TIMEOUT, use_ssl=False, starttls=False,
+                 user=None, password=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.user = user
+        self.password = password
+        self.reader = None
+        self.writer = None
+        self.extensions = {}
+        self.sent = 0
+
+    async def read_reply(self, command):
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError(f"{command}: connection closed by server")
+            lines.append(line.rstrip(b"\r\n"))
+            if line[3:4] != b"-":
+                break
+        try:
+            code = int(lines[-1][:3])
+        except ValueError:
+            raise ConnectionError(f"{command}: malformed reply {lines[-1][:60]!r}")
+        return code, [l[4:].decode('utf-8', 'replace') for l in lines]
+
+    async def command(self, line, expect=(250,)):
+        self.writer.write(line.encode('utf-8') + b"\r\n")
+        await self.writer.drain()
+        code, text = await self.read_reply(command_name(line))
+        if code not in expect:
+            raise SMTPReplyError(code, " ".join(text), command_name(line))
+        return code, text
+
+    async def ehlo(self):
+        _, lines = await self.command(f"EHLO {socket.getfqdn()}")
+        self.extensions = {}
+        for line in lines[1:]:
+            keyword, _, params = line.partition(" ")
+            self.extensions[keyword.upper()] = params
+
+    async def connect(self):
+        context = ssl.create_default_context() if self.use_ssl or self.starttls else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context if self.use_ssl else None), self.timeout)
+        code, text = await self.read_reply("connect")
+        if code != 220:
+            raise SMTPReplyError(code, " ".join(text), "connect")
+        await self.ehlo()
+
+        if self.starttls:
+            if "STARTTLS" not in self.extensions:
+                raise SMTPReplyError(502, "STARTTLS not offered", "STARTTLS")
+            await self.command("STARTTLS", expect=(220,))
+            await self.writer.start_tls(context, server_hostname=self.host)
+            await self.ehlo()
+
+        if self.user:
+            token = base64.b64encode(f"\0{self.user}\0{self.password or ''}".encode('utf-8')).decode('ascii')
+            await self.command(f"AUTH PLAIN {token}", expect=(235,))
+        self.sent = 0
+
+    async def send(self, sender, recipients, data):
+        """
+        Send one message. Raises SMTPReplyError unless it was accepted.
+        """
+        commands = [f"MAIL FROM:<{sender}>"] + [f"RCPT TO:<{r}>" for r in recipients] + ["DATA"]
+        if "PIPELINING" in self.extensions:
+            self.writer.write("".join(c + "\r\n" for c in commands).encode('utf-8'))
+            await self.writer.drain()
+            replies = [await self.read_reply(command_name(c)) for c in commands]
+        else:
+            replies = []
+            for c in commands:
+                self.writer.write(c.encode('utf-8') + b"\r\n")
+                await self.writer.drain()
+                replies.append(await self.read_reply(command_name(c)))
+                # Stop after a rejected sender, or before DATA when every recipient was rejected
+                if replies[0][0] != 250 or (len(replies) == len(recipients) + 1 and
+                                            not any(code in (250, 251) for code, _ in replies[1:])):
+                    break
+
+        mail_code = replies[0][0]
+        accepted = [code for code, _ in replies[1:1 + len(recipients)] if code in (250, 251)]
+        data_reply = replies[-1] if len(replies) == len(commands) else None
+
+        if data_reply is not None and data_reply[0] == 354:
+            if mail_code != 250 or not accepted:
+                # DATA was accepted anyway; end it empty and report the real failure
+                self.writer.write(b".\r\n")
+                await self.writer.drain()
+                await self.read_reply("DATA")
+            else:
+                self.writer.write(dot_stuff(data))
+                await self.writer.drain()
+                code, text = await self.read_reply("DATA")
+                if code != 250:
+                    raise SMTPReplyError(code, " ".join(text), "DATA")
+                self.sent += 1
+                return
+
+        await self.command("RSET")
+        failed = next(((code, text, c) for (code, text), c in zip(replies, commands) if code >= 400),
+                      (554, ["no valid recipients"], "RCPT TO"))
+        raise SMTPReplyError(failed[0], " ".join(failed[1]), command_name(failed[2]))
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def close(self):
+        if self.writer is None:
+            return
+        try:
+            self.writer.write(b"QUIT\r\n")
+            await self.writer.drain()
+            await asyncio.wait_for(self.read_reply("QUIT"), self.timeout)
+        except (OSError, ConnectionError, asyncio.TimeoutError, SMTPReplyError):
+            pass
+        self.writer.close()
+        self.writer = None
+
+def command_name(line):
+    """
+    "MAIL FROM", "RCPT TO", "EHLO", ... for error messages (never the AUTH credentials)
+    """
+    return line.split(":", 1)[0] if ":" in line else line.split(" ", 1)[0]
+
+def dot_stuff(data):
+    """
+    Transparency (RFC 5321 4.5.2): double a leading "." on every line and end
+    with <CRLF>.<CRLF>
+    """
+    if data.startswith(b"."):
+        data = b"." + data
+    data = data.replace(b"\r\n.", b"\r\n..")
+    if not data.endswith(b"\r\n"):
+        data += b"\r\n"
+    return data + b".\r\n"
+
+def envelope(data, envelope_from=None):
+    """
+    Return (sender, recipients) from a message's From/To/Cc headers
+    """
+    end = data.find(b"\r\n\r\n")
+    headers = BytesHeaderParser().parsebytes(data[:end if end >= 0 else len(data)])
+    sender = envelope_from or parseaddr(headers.get("From", ""))[1]
+    recipients = [address for _, address in getaddresses(headers.get_all("To", []) + headers.get_all("Cc", []))
+                  if address]
+    return sender, recipients
+
+def iter_source(source):
+    """
+    Yield (name, message bytes) from a directory of .eml files or a tar archive of them
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".eml"):
+                with open(os.path.join(source, name), 'rb') as f:
+                    yield name, f.read()
+        return
+    with tarfile.open(source, "r|*") as archive:
+        for member in archive:
+            if member.isfile() and member.name.endswith(".eml"):
+                yield member.name, archive.extractfile(member).read()
+
+async def open_session(smtp):
+    connection = SMTPConnection(**smtp)
+    try:
+        await connection.connect()
+    except BaseException:
+        connection.abort()
+        raise
+    return connection
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+async def worker(queue, settings, limiter, stats):
+    connection_limiter = RateLimiter(settings["per_connection_rate"])
+    connection = None
+    while True:
+        item = await queue.get()
+        if item is None:
+            queue.task_done()
+            break
+        name, data = item
+        if stats["aborted"]:
+            stats["unsent"] += 1
+            queue.task_done()
+            continue
+        sender, recipients = envelope(data, settings["envelope_from"])
+
+        connecting = False
+        for attempt in range(settings["retries"] + 1):
+            try:
+                if connection is not None and connection.sent >= settings["max_per_connection"]:
+                    await connection.close()
+                    connection = None
+                if connection is None:
+                    connecting = True
+                    connection = await open_session(settings["smtp"])
+                    connecting = False
+                    stats["connections"] += 1
+
+                await connection_limiter.wait()
+                await limiter.wait()
+                start = time.perf_counter()
+                await connection.send(sender, recipients, data)
+                stats["latencies"].append(time.perf_counter() - start)
+                stats["sent"] += 1
+                break
+            except SMTPReplyError as e:
+                error, transient = str(e), e.transient
+                if e.code == 421 and connection is not None:
+                    # 421: the server is closing the session
+                    connection.abort()
+                    connection = None
+            except (OSError, ConnectionError, asyncio.TimeoutError) as e:
+                error, transient = f"{type(e).__name__}: {e}", True
+                if connection is not None:
+                    connection.abort()
+                    connection = None
+
+            if not transient or attempt == settings["retries"]:
+                if connecting:
+                    # No session could be opened: stop instead of failing every queued message the same way
+                    stats["aborted"] = error
+                stats["failed"].append((name, error))
+                break
+            stats["retries"] += 1
+            await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+
+        done = stats["sent"] + len(stats["failed"])
+        if settings["progress"] and done % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - stats["start"]
+            print(f"  … {done} messages ({stats['sent'] / elapsed:,.0f} msg/s)")
+        queue.task_done()
+
+    if connection is not None:
+        await connection.close()
+
+async def send_all(messages, settings):
+    """
+    Send every (name, bytes) message over the pool. Returns a stats dict.
+    """
+    stats = {"sent": 0, "failed": [], "retries": 0, "connections": 0, "latencies": [],
+             "aborted": None, "unsent": 0, "start": time.perf_counter()}
+    connections = settings["connections"]
+    queue = asyncio.Queue(maxsize=connections * QUEUE_PER_CONNECTION)
+    limiter = RateLimiter(settings["rate"])
+    workers = [asyncio.create_task(worker(queue, settings, limiter, stats)) for _ in range(connections)]
+
+    try:
+        for message in messages:
+            if stats["aborted"]:
+                break
+            await queue.put(message)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for w in workers:
+            w.cancel()
+
+    elapsed = time.perf_counter() - stats["start"]
+    latencies = sorted(stats["latencies"])
+    return {
+        "sent": stats["sent"],
+        "failed": stats["failed"],
+        "aborted": stats["aborted"],
+        "unsent": stats["unsent"],
+        "retries": stats["retries"],
+        "connections": stats["connections"],
+        "seconds": elapsed,
+        "messages_per_second": stats["sent"] / elapsed if elapsed else 0.0,
+        "latency": {name: percentile(latencies, fraction) * 1000
+                    for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))},
+    }
+
+def built_messages(args):
+    defaults = render_merge_tags.parse_assignments(args.set)
+    compiled = build_messages.compile_messages(args.template, args.sender, args.subject, args.embed_images)
+    for index, record, data in build_messages.iter_messages(compiled, args.recipients, defaults):
+        yield str(render_merge_tags.normalize_keys(record).get("EMAIL") or index), data
+
+def main():
+    parser = argparse.ArgumentParser(description="Send MIME messages over a pool of SMTP connections")
+    parser.add_argument("source", nargs="?", help="directory of .eml files or a .tar archive of them")
+    parser.add_argument("--template", help="build messages from this template instead of reading SOURCE")
+    parser.add_argument("--recipients", help="recipient list for --template (.csv or .jsonl)")
+    parser.add_argument("--from", dest="sender", help="sender for --template messages")
+    parser.add_argument("--subject", help="subject for --template messages (default: the template's <title>)")
+    parser.add_argument("--embed-images", action="store_true", help="embed images in --template messages")
+    parser.add_argument("--set", action="append", metavar="TAG=VALUE", help="default merge tag value")
+    parser.add_argument("--host", default="127.0.0.1", help="SMTP server (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"SMTP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--ssl", action="store_true", help="connect with TLS (port 465)")
+    parser.add_argument("--starttls", action="store_true", help="upgrade the session with STARTTLS")
+    parser.add_argument("--user", help="AUTH PLAIN user; the password is read from $SMTP_PASSWORD")
+    parser.add_argument("--envelope-from", help="MAIL FROM address (default: the From header)")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help=f"SMTP sessions kept open (default: {DEFAULT_CONNECTIONS})")
+    parser.add_argument("--rate", type=float, default=0, help="messages per second across the pool (default: no limit)")
+    parser.add_argument("--per-connection-rate", type=float, default=0,
+                        help="messages per second per session (default: no limit)")
+    parser.add_argument("--max-per-connection", type=int, default=DEFAULT_MAX_PER_CONNECTION,
+                        help=f"messages before a session is renewed (default: {DEFAULT_MAX_PER_CONNECTION})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"retries for transient failures (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="per-reply timeout in seconds")
+    args = parser.parse_args()
+
+    if args.template:
+        if not (args.recipients and args.sender):
+            print("❌ --template needs --recipients and --from")
+            return 1
+        messages = built_messages(args)
+        source = f"{args.template} × {args.recipients}"
+    elif args.source and os.path.exists(args.source):
+        messages = iter_source(args.source)
+        source = args.source
+    else:
+        print("❌ Give a directory or archive of .eml files, or --template with --recipients")
+        return 1
+
+    settings = {
+        "smtp": {"host": args.host, "port": args.port, "timeout": args.timeout, "use_ssl": args.ssl,
+                 "starttls": args.starttls, "user": args.user, "password": os.environ.get("SMTP_PASSWORD")},
+        "connections": max(1, args.connections),
+        "rate": args.rate,
+        "per_connection_rate": args.per_connection_rate,
+        "max_per_connection": max(1, args.max_per_connection),
+        "retries": max(0, args.retries),
+        "envelope_from": args.envelope_from,
+        "progress": True,
+    }
+
+    print(f"📤 Sending {source} via {args.host}:{args.port} over {settings['connections']} connections")
+    result = asyncio.run(send_all(messages, settings))
+
+    for name, error in result["failed"][:20]:
+        print(f"❌ {name}: {error}")
+    if len(result["failed"]) > 20:
+        print(f"❌ ... and {len(result['failed']) - 20} more")
+
+    latency = result["latency"]
+    print("=" * 50)
+    print(f"✅ Sent {result['sent']} messages in {result['seconds']:.2f}s "
+          f"({result['connections']} sessions, {result['retries']} retries)")
+    print(f"⚡ {result['messages_per_second']:,.1f} msg/s")
+    print(f"⏱️  Latency p50 {latency['p50']:.1f}ms, p90 {latency['p90']:.1f}ms, "
+          f"p99 {latency['p99']:.1f}ms, max {latency['max']:.1f}ms")
+    if result["aborted"]:
+        print(f"❌ Stopped: could not open an SMTP session ({result['aborted']})")
+        if result["unsent"]:
+            print(f"⚠️  {result['unsent']} queued messages were not attempted")
+    if result["failed"]:
+        print(f"❌ {len(result['failed'])} messages failed")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
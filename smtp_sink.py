@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Local SMTP stand-in for trying send_messages.py end to end.
+
+Accepts every message (EHLO with PIPELINING, MAIL, RCPT, DATA, RSET, NOOP,
+QUIT) and counts it, optionally saving it to a directory. It can also
+behave like a busy server: --latency delays each DATA reply and
+--fail-every answers every Nth message with a transient 451, which
+send_messages.py must retry. Stop it with Ctrl-C (or SIGTERM) to print the totals.
+
+Usage:
+    python smtp_sink.py --port 2525
+    python smtp_sink.py --port 2525 --latency 20 --fail-every 50 --out build/sink
+    python smtp_sink.py --port 2525 --no-pipelining
+"""
+
+import os
+import sys
+import signal
+import asyncio
+import argparse
+
+DEFAULT_PORT = 2525
+
+MAX_MESSAGE_SIZE = 50 * 1024 * 1024
+
+EHLO_LINES = ["PIPELINING", "8BITMIME", f"SIZE {MAX_MESSAGE_SIZE}"]
+
+class Sink:
+    def __init__(self, latency=0.0, fail_every=0, out_dir=None, pipelining=True):
+        self.extensions = EHLO_LINES if pipelining else EHLO_LINES[1:]
+        self.latency = latency
+        self.fail_every = fail_every
+        self.out_dir = out_dir
+        self.messages = 0
+        self.bytes = 0
+        self.failed = 0
+        self.sessions = 0
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        writer.write(b"220 smtp-sink ready\r\n")
+        await writer.drain()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                verb = line.split(b" ", 1)[0].split(b":", 1)[0].strip().upper()
+                if verb == b"EHLO":
+                    reply = "250-smtp-sink\r\n" + "".join(
+                        f"250{'-' if i < len(self.extensions) - 1 else ' '}{ext}\r\n" for i, ext in enumerate(self.extensions))
+                    writer.write(reply.encode('ascii'))
+                elif verb in (b"HELO", b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                    writer.write(b"250 OK\r\n")
+                elif verb == b"DATA":
+                    writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    await writer.drain()
+                    writer.write(await self.receive(reader))
+                elif verb == b"QUIT":
+                    writer.write(b"221 Bye\r\n")
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(b"502 Command not implemented\r\n")
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def receive(self, reader):
+        try:
+            data = await reader.readline()
+            if data != b".\r\n":
+                data += await reader.readuntil(b"\r\n.\r\n")
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("connection closed during DATA")
+        data = data[:-3].replace(b"\r\n..", b"\r\n.")
+        if data.startswith(b".."):
+            data = data[1:]
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        attempt = self.messages + self.failed + 1
+        if self.fail_every and attempt % self.fail_every == 0:
+            self.failed += 1
+            return b"451 Try again later\r\n"
+
+        self.messages += 1
+        self.bytes += len(data)
+        if self.out_dir:
+            with open(os.path.join(self.out_dir, f"{self.messages:07d}.eml"), 'wb') as f:
+                f.write(data)
+        return f"250 OK queued as {self.messages}\r\n".encode('ascii')
+
+async def serve(host, port, sink):
+    server = await asyncio.start_server(sink.handle, host, port, limit=MAX_MESSAGE_SIZE)
+    # Stop cleanly on SIGTERM too (background jobs do not get Ctrl-C)
+    stopped = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    async with server:
+        await stopped.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP server that accepts and counts messages")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds before each DATA reply")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth message with 451")
+    parser.add_argument("--out", help="save received messages to this directory")
+    parser.add_argument("--no-pipelining", action="store_true", help="do not advertise PIPELINING")
+    args = parser.parse_args()
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    sink = Sink(args.latency / 1000, args.fail_every, args.out, not args.no_pipelining)
+    print(f"📭 SMTP sink listening on {args.host}:{args.port} (Ctrl-C to stop)")
+    try:
+        asyncio.run(serve(args.host, args.port, sink))
+    except KeyboardInterrupt:
+        pass
+
+    print()
+    print("=" * 50)
+    print(f"✅ Received {sink.messages} messages ({sink.bytes / 1e6:.1f} MB) over {sink.sessions} sessions, "
+          f"{sink.failed} deferred")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Minimal precompiled template engine shared by the build scripts.
+
+A template is compiled once into a list of static fragments and the slots
+between them, so rendering is a single join with no parsing or regex work.
+Compiled templates are cached in memory and on disk (keyed by the template's
+content hash) so worker processes and later runs skip the parse entirely.
+
+Slot syntax:
+    {{name}}      value is HTML-escaped
+    {{{name}}}    value is inserted as-is (pre-rendered HTML)
+"""
+
+import os
+import re
+import html
+import pickle
+import hashlib
+
+# Directory for compiled templates, relative to the project root
+CACHE_DIR = ".cache/templates"
+
+# Bump when the compiled representation changes
+COMPILED_VERSION = 1
+
+MUSTACHE_PATTERN = re.compile(r'\{\{\{\s*(?P<raw>[\w.-]+)\s*\}\}\}|\{\{\s*(?P<name>[\w.-]+)\s*\}\}')
+
+# In-process cache of compiled templates, keyed by content hash
+_compiled_cache = {}
+
+def compile_template(text, pattern=MUSTACHE_PATTERN):
+    """
+    Compile template text into {"fragments": [...], "slots": [(name, raw), ...]}.
+    There is always one more fragment than there are slots. The pattern names
+    escaped slots with a "name" group and raw slots with an optional "raw" group.
+    """
+    fragments = []
+    slots = []
+    pos = 0
+
+    for match in pattern.finditer(text):
+        fragments.append(text[pos:match.start()])
+        groups = match.groupdict()
+        if groups.get("raw") is not None:
+            slots.append((groups["raw"], True))
+        else:
+            slots.append((groups["name"], False))
+        pos = match.end()
+
+    fragments.append(text[pos:])
+
+    return {"version": COMPILED_VERSION, "fragments": fragments, "slots": slots}
+
+def render(compiled, values, missing=""):
+    """
+    Render a compiled template with the given values.
+    Missing values render as `missing`.
+    """
+    fragments = compiled["fragments"]
+    parts = [fragments[0]]
+
+    for (name, raw), fragment in zip(compiled["slots"], fragments[1:]):
+        value = values.get(name, missing)
+        value = "" if value is None else str(value)
+        parts.append(value if raw else html.escape(value))
+        parts.append(fragment)
+
+    return "".join(parts)
+
+def slot_names(compiled):
+    """
+    Return the distinct slot names of a compiled template, in first-use order
+    """
+    return list(dict.fromkeys(name for name, _ in compiled["slots"]))
+
+def compile_text(text, pattern=MUSTACHE_PATTERN):
+    """
+    Compile template text through the in-memory cache, for templates that are
+    assembled at runtime (e.g. layouts with their partials expanded)
+    """
+    key = hashlib.sha256((pattern.pattern + "\0" + text).encode('utf-8')).hexdigest()
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = _compiled_cache[key] = compile_template(text, pattern)
+    return compiled
+
+def load_template(path, pattern=MUSTACHE_PATTERN, cache_dir=CACHE_DIR):
+    """
+    Return the compiled form of a template file, using the in-memory cache and
+    then the on-disk cache before falling back to compiling it
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        text = f.read()
+
+    key = hashlib.sha256((pattern.pattern + "\0" + text).encode('utf-8')).hexdigest()
+    if key in _compiled_cache:
+        return _compiled_cache[key]
+
+    cache_path = os.path.join(cache_dir, f"{key}.pickle")
+    compiled = None
+
+    try:
+        with open(cache_path, 'rb') as f:
+            compiled = pickle.load(f)
+        if compiled.get("version") != COMPILED_VERSION:
+            compiled = None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        compiled = None
+
+    if compiled is None:
+        compiled = compile_template(text, pattern)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # The cache is an optimisation only
+
+    _compiled_cache[key] = compiled
+    return compiled
@@ -0,0 +1,82 @@
+import os
+import socket
+import asyncio
+import tempfile
+import threading
+import unittest
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import check_links
+
+class QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+def unused_port():
+    """
+    A port nothing listens on: bound once to pick it, then released
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class CheckRemoteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.root.name, "ok.html"), "w", encoding="utf-8") as f:
+            f.write("<p>ok</p>")
+        handler = functools.partial(QuietHandler, directory=self.root.name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.root.cleanup()
+
+    def check(self, urls):
+        return asyncio.run(check_links.check_all_remote(urls, per_host=2, connections=4, timeout=5))
+
+    def test_statuses(self):
+        refused = f"http://127.0.0.1:{unused_port()}/ok.html"
+        results = self.check([f"{self.base}/ok.html", f"{self.base}/missing.html", refused])
+
+        self.assertEqual(results[f"{self.base}/ok.html"], {"status": 200, "ok": True, "error": None})
+        self.assertEqual(results[f"{self.base}/missing.html"], {"status": 404, "ok": False, "error": None})
+        self.assertIsNone(results[refused]["status"])
+        self.assertFalse(results[refused]["ok"])
+        self.assertTrue(results[refused]["error"])
+
+    def test_redirect_is_followed(self):
+        # SimpleHTTPRequestHandler redirects a directory without its trailing slash
+        os.mkdir(os.path.join(self.root.name, "folder"))
+        with open(os.path.join(self.root.name, "folder", "index.html"), "w", encoding="utf-8") as f:
+            f.write("<p>index</p>")
+
+        results = self.check([f"{self.base}/folder"])
+
+        self.assertEqual(results[f"{self.base}/folder"]["status"], 200)
+
+class ExtractReferencesTest(unittest.TestCase):
+
+    def test_attribute_values_are_unescaped(self):
+        content = ('<a href="https://example.com/?a=1&amp;b=2">x</a>\n'
+                   '<img src="logo.png" srcset="logo-2x.png?v=1&amp;w=2 2x">')
+
+        self.assertEqual(check_links.extract_references(content), [
+            (1, "https://example.com/?a=1&b=2"),
+            (2, "logo.png"),
+            (2, "logo-2x.png?v=1&w=2"),
+        ])
+
+    def test_escaped_and_plain_urls_share_a_cache_key(self):
+        escaped = check_links.extract_references('<a href="https://example.com/?a=1&amp;b=2">')[0][1]
+
+        self.assertEqual(check_links.remote_key(escaped), check_links.remote_key("https://example.com/?a=1&b=2"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import cleanup_duplicate_css
+
+# The dark-mode block of emails/transactional/password-reset.html (and 16 other
+# templates): the .dm-bg rule was left open around a second @media block
+NESTED_STYLE = """\
+@media (prefers-color-scheme: dark) {
+      .dm-bg { background:#0a1216 !important;
+    @media (prefers-color-scheme: dark) {
+      .btn-primary { background: #2dd4bf !important; color: #0a1216 !important; }
+      .btn-primary-dark { background: #2dd4bf !important; color: #0a1216 !important; }
+      .btn-primary .material-icons { color: #0a1216 !important; }
+      .btn-primary-dark .material-icons { color: #0a1216 !important; }
+    }
+    }
+      .dm-box { background:#0f1a21 !important; border-color:#1e293b !important; }
+      .dm-text { color:#f8fafc !important; }
+      .dm-box { background:#0f1a21 !important; border-color:#1e293b !important; }
+}
+"""
+
+BODY = """\
+<div class="dm-bg"><div class="dm-box dm-text">
+  <a class="btn-primary"><span class="material-icons">lock</span></a>
+  <a class="btn-primary-dark"><span class="material-icons">lock</span></a>
+</div></div>
+"""
+
+def document(css):
+    return f"<html><head><style>\n{css}</style></head><body>\n{BODY}</body></html>\n"
+
+class NestedBlockTest(unittest.TestCase):
+
+    def test_rule_with_nested_block_is_left_alone(self):
+        cleaned, _ = cleanup_duplicate_css.clean_css(document(NESTED_STYLE))
+
+        nested_start = NESTED_STYLE.index("      .dm-bg")
+        nested_end = NESTED_STYLE.index("      .dm-box")
+        self.assertIn(NESTED_STYLE[nested_start:nested_end], cleaned)
+        self.assertIn(".btn-primary { background: #2dd4bf !important; color: #0a1216 !important; }", cleaned)
+        self.assertNotIn("};", cleaned)
+
+    def test_siblings_of_the_nested_rule_are_still_cleaned(self):
+        cleaned, stats = cleanup_duplicate_css.clean_css(document(NESTED_STYLE))
+
+        self.assertEqual(cleaned.count(".dm-box {"), 1)
+        self.assertEqual(stats["merged"], 1)
+
+    def test_parse_items_marks_the_rule_opaque(self):
+        items = cleanup_duplicate_css.parse_items(NESTED_STYLE, 0, len(NESTED_STYLE))
+
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0]["kind"], "group")
+        kinds = [item["kind"] for item in items[0]["rules"]]
+        self.assertEqual(kinds, ["other", "rule", "rule", "rule"])
+
+if __name__ == "__main__":
+    unittest.main()
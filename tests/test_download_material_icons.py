@@ -0,0 +1,105 @@
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import contextlib
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import download_material_icons
+
+ICON = b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path d="M12 2 2 22h20z"/></svg>'
+ETAG = '"icon-v1"'
+LAST_MODIFIED = "Tue, 01 Sep 2026 10:00:00 GMT"
+
+class IconHandler(BaseHTTPRequestHandler):
+    """
+    Serves one icon under the first family, honouring If-None-Match
+    """
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path != "/materialicons/warning/v1/24px.svg":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/svg+xml")
+        self.send_header("Content-Length", str(len(ICON)))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(ICON)
+
+    def log_message(self, format, *args):
+        pass
+
+class ConditionalRequestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), IconHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        # The script works on paths relative to the project root
+        self.cwd = os.getcwd()
+        self.root = tempfile.TemporaryDirectory()
+        os.chdir(self.root.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.root.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_script(self, *args):
+        argv = ["download_material_icons.py", "warning", "--base-url", self.base_url, "--workers", "2", *args]
+        output = io.StringIO()
+        with mock.patch.object(sys, "argv", argv), mock.patch.dict(os.environ, {"NO_PROXY": "127.0.0.1"}), \
+                contextlib.redirect_stdout(output):
+            status = download_material_icons.main()
+        return status, output.getvalue()
+
+    def test_second_run_revalidates_and_keeps_the_file(self):
+        svg_path = os.path.join(download_material_icons.icons_dir, "warning.svg")
+
+        status, output = self.run_script()
+        self.assertEqual(status, 0)
+        self.assertIn("1 downloaded", output)
+        with open(svg_path, 'rb') as f:
+            self.assertEqual(f.read(), ICON)
+        written = os.stat(svg_path).st_mtime_ns
+
+        self.server.requests.clear()
+        status, output = self.run_script("--refresh")
+        self.assertEqual(status, 0)
+        self.assertIn("1 not modified (304)", output)
+        self.assertIn("0 icon files updated", output)
+
+        [(path, headers)] = self.server.requests
+        self.assertEqual(path, "/materialicons/warning/v1/24px.svg")
+        self.assertEqual(headers.get("If-None-Match"), ETAG)
+        self.assertEqual(headers.get("If-Modified-Since"), LAST_MODIFIED)
+        self.assertEqual(os.stat(svg_path).st_mtime_ns, written)
+
+    def test_fresh_cache_sends_no_request(self):
+        self.run_script()
+        self.server.requests.clear()
+
+        status, output = self.run_script()
+
+        self.assertEqual(status, 0)
+        self.assertIn("1 fresh in cache", output)
+        self.assertEqual(self.server.requests, [])
+
+if __name__ == "__main__":
+    unittest.main()
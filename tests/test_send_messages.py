@@ -0,0 +1,95 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+import smtp_sink
+import send_messages
+import build_messages
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(ROOT, "emails", "transactional", "password-reset.html")
+SENDER = "ZOMO Health <no-reply@example.com>"
+
+RECIPIENTS = 10
+FAIL_EVERY = 4
+
+# Lines starting with "." must survive the dot-stuffing round trip
+DOTTED_MESSAGE = (b"From: no-reply@example.com\r\nTo: dots@example.com\r\nSubject: dots\r\n\r\n"
+                  b".one leading dot\r\n..two\r\n.\r\nend\r\n")
+
+class SendThroughSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        recipients_path = os.path.join(self.root.name, "recipients.csv")
+        with open(recipients_path, "w", encoding="utf-8") as f:
+            f.write("EMAIL,FNAME\n")
+            for i in range(RECIPIENTS - 1):
+                f.write(f"user{i}@example.com,Name {i}\n")
+
+        compiled = build_messages.compile_messages(TEMPLATE, SENDER)
+        self.messages = [(record["EMAIL"], data)
+                         for _, record, data in build_messages.iter_messages(compiled, recipients_path)]
+        self.messages.append(("dots@example.com", DOTTED_MESSAGE))
+        self.out_dir = os.path.join(self.root.name, "sink")
+        os.mkdir(self.out_dir)
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def send(self, sink, connections=3):
+        async def run():
+            server = await asyncio.start_server(sink.handle, "127.0.0.1", 0, limit=smtp_sink.MAX_MESSAGE_SIZE)
+            async with server:
+                settings = {
+                    "smtp": {"host": "127.0.0.1", "port": server.sockets[0].getsockname()[1], "timeout": 5},
+                    "connections": connections,
+                    "rate": 0,
+                    "per_connection_rate": 0,
+                    "max_per_connection": send_messages.DEFAULT_MAX_PER_CONNECTION,
+                    "retries": send_messages.DEFAULT_RETRIES,
+                    "envelope_from": None,
+                    "progress": False,
+                }
+                return await send_messages.send_all(iter(self.messages), settings)
+
+        with mock.patch.object(send_messages, "RETRY_DELAY", 0):
+            return asyncio.run(run())
+
+    def received(self):
+        messages = []
+        for name in sorted(os.listdir(self.out_dir)):
+            with open(os.path.join(self.out_dir, name), "rb") as f:
+                messages.append(f.read())
+        return messages
+
+    def assert_delivered(self, sink, result):
+        self.assertEqual(sorted(self.received()), sorted(data for _, data in self.messages))
+        self.assertEqual(result["sent"], RECIPIENTS)
+        self.assertEqual(result["failed"], [])
+        self.assertIsNone(result["aborted"])
+        self.assertEqual(sink.messages, RECIPIENTS)
+        self.assertEqual(result["retries"], sink.failed)
+
+    def test_every_message_arrives_and_451s_are_retried(self):
+        sink = smtp_sink.Sink(fail_every=FAIL_EVERY, out_dir=self.out_dir)
+
+        result = self.send(sink)
+
+        self.assert_delivered(sink, result)
+        self.assertEqual(sink.failed, (RECIPIENTS + sink.failed) // FAIL_EVERY)
+        self.assertGreater(sink.failed, 0)
+        self.assertEqual(result["connections"], sink.sessions)
+
+    def test_without_pipelining(self):
+        sink = smtp_sink.Sink(fail_every=FAIL_EVERY, out_dir=self.out_dir, pipelining=False)
+
+        result = self.send(sink, connections=1)
+
+        self.assert_delivered(sink, result)
+        self.assertEqual(result["connections"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Per-pass, per-file measurements for the template transforms.
+
+A Recorder runs a pass over a file's content and keeps one record for it:
+wall time, bytes in and out, the number of tag edits the pass made (counted
+by html_tokens.apply_edits) and whether the content changed. Two opt-in
+hooks go deeper: profile=True runs each file's passes under cProfile, so the
+slowest files can be inspected with pstats or snakeviz, and
+trace_memory=True records each pass's peak allocation with tracemalloc.
+
+Records are plain dicts, so they travel back from transform_pipeline's
+worker processes in its results. Write them as JSON Lines with
+write_records or print a per-pass summary with print_summary.
+
+The standalone fix scripts record their file functions the same way when
+TRANSFORM_METRICS names a JSON Lines file:
+    TRANSFORM_METRICS=build/metrics.jsonl python fix_remaining_icons.py
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import pstats
+import functools
+import tracemalloc
+
+import html_tokens
+
+# Environment variable naming the JSON Lines file standalone scripts record to
+METRICS_ENV = "TRANSFORM_METRICS"
+
+# Functions listed per profiled file in the summary
+PROFILE_LINES = 8
+
+class Recorder:
+    def __init__(self, profile=False, trace_memory=False):
+        self.records = []
+        self.profiles = {}
+        self.profile = profile
+        self.trace_memory = trace_memory
+
+    def run(self, pass_name, transform, content, path):
+        """
+        Run one pass over content and record it. Returns the new content.
+        """
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        edits = html_tokens.edit_count
+        start = time.perf_counter()
+        new_content = transform(content)
+        seconds = time.perf_counter() - start
+
+        record = {
+            "pass": pass_name,
+            "path": path,
+            "seconds": seconds,
+            "bytes_in": byte_size(content),
+            "bytes_out": byte_size(new_content),
+            "matches": html_tokens.edit_count - edits,
+            "changed": new_content != content,
+        }
+        if self.trace_memory:
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        self.records.append(record)
+        return new_content
+
+    def start_file(self):
+        """
+        Start profiling a file's passes (when profiling is on). Pass the
+        returned handle to finish_file.
+        """
+        if not self.profile:
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, time.perf_counter()
+
+    def finish_file(self, handle, path):
+        if handle is None:
+            return
+        profiler, start = handle
+        profiler.disable()
+        profiler.create_stats()
+        self.profiles[path] = {"seconds": time.perf_counter() - start, "stats": profiler.stats}
+
+class _ProfileData:
+    """
+    Adapter that lets pstats.Stats load stats carried across processes
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def byte_size(text):
+    return len(text.encode('utf-8'))
+
+def slowest_profiles(profiles, count):
+    """
+    Return [(path, seconds, pstats.Stats)] for the count slowest profiled files
+    """
+    ranked = sorted(profiles.items(), key=lambda item: item[1]["seconds"], reverse=True)[:count]
+    return [(path, p["seconds"], pstats.Stats(_ProfileData(p["stats"]))) for path, p in ranked]
+
+def save_profiles(profiles, count, out_dir):
+    """
+    Write the count slowest profiles to out_dir as .prof files; returns their paths
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for path, _, stats in slowest_profiles(profiles, count):
+        name = path.replace(os.sep, "__").replace("/", "__") + ".prof"
+        stats.dump_stats(os.path.join(out_dir, name))
+        paths.append(os.path.join(out_dir, name))
+    return paths
+
+def write_records(records, target):
+    """
+    Write records as JSON Lines to a path, or to stdout for "-"
+    """
+    if target == "-":
+        for record in records:
+            print(json.dumps(record, sort_keys=True))
+        return
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    with open(target, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+def summarize(records):
+    """
+    Aggregate records per pass, in the order the passes first appear
+    """
+    passes = {}
+    for r in records:
+        s = passes.setdefault(r["pass"], {"files": 0, "changed": 0, "seconds": 0.0, "bytes_in": 0,
+                                          "matches": 0, "slowest": None, "peak_bytes": None})
+        s["files"] += 1
+        s["changed"] += r["changed"]
+        s["seconds"] += r["seconds"]
+        s["bytes_in"] += r["bytes_in"]
+        s["matches"] += r["matches"]
+        if s["slowest"] is None or r["seconds"] > s["slowest"][1]:
+            s["slowest"] = (r["path"], r["seconds"])
+        if "peak_bytes" in r:
+            s["peak_bytes"] = max(s["peak_bytes"] or 0, r["peak_bytes"])
+    return passes
+
+def print_summary(records, profiles=None, profile_count=0):
+    passes = summarize(records)
+    if not passes:
+        return
+    memory = any(s["peak_bytes"] is not None for s in passes.values())
+
+    header = f"{'pass':<22} {'files':>6} {'changed':>8} {'matches':>8} {'MB':>7} {'total ms':>9} {'ms/MB':>8} {'max ms':>8}"
+    print(header + (f" {'peak KB':>8}" if memory else ""))
+    print("-" * (len(header) + (9 if memory else 0)))
+    for name, s in passes.items():
+        mb = s["bytes_in"] / 1024 / 1024
+        line = (f"{name:<22} {s['files']:>6} {s['changed']:>8} {s['matches']:>8} {mb:>7.2f} "
+                f"{s['seconds'] * 1000:>9.1f} {s['seconds'] * 1000 / mb if mb else 0:>8.1f} "
+                f"{s['slowest'][1] * 1000:>8.1f}")
+        if memory:
+            line += f" {(s['peak_bytes'] or 0) / 1024:>8.0f}"
+        print(line)
+    for name, s in passes.items():
+        print(f"⏱️  Slowest for {name}: {s['slowest'][0]} ({s['slowest'][1] * 1000:.1f} ms)")
+
+    for path, seconds, stats in slowest_profiles(profiles or {}, profile_count):
+        print()
+        print(f"🔍 {path}: {seconds * 1000:.1f} ms")
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_LINES]
+        for func, (_, calls, own, cumulative, _) in entries:
+            print(f"   {cumulative * 1000:>8.1f} ms cum {own * 1000:>8.1f} ms own {calls:>7}  {pstats.func_std_string(func)}")
+
+# --- Standalone scripts -----------------------------------------------------------
+
+_default_recorder = None
+
+def _flush_default():
+    write_records(_default_recorder.records, os.environ[METRICS_ENV])
+
+def default_recorder():
+    """
+    The recorder for standalone script runs, or None unless TRANSFORM_METRICS is set
+    """
+    global _default_recorder
+    if _default_recorder is None and os.environ.get(METRICS_ENV):
+        _default_recorder = Recorder()
+        atexit.register(_flush_default)
+    return _default_recorder
+
+def instrumented(pass_name):
+    """
+    Decorate a script's per-file function (path in, True when it changed the
+    file) so its runs are recorded when TRANSFORM_METRICS is set
+    """
+    def decorate(update_file):
+        @functools.wraps(update_file)
+        def wrapper(file_path, *args, **kwargs):
+            recorder = default_recorder()
+            if recorder is None:
+                return update_file(file_path, *args, **kwargs)
+            bytes_in = os.path.getsize(file_path) if os.path.isfile(file_path) else 0
+            edits = html_tokens.edit_count
+            start = time.perf_counter()
+            changed = update_file(file_path, *args, **kwargs)
+            recorder.records.append({
+                "pass": pass_name,
+                "path": file_path,
+                "seconds": time.perf_counter() - start,
+                "bytes_in": bytes_in,
+                "bytes_out": os.path.getsize(file_path) if os.path.isfile(file_path) else 0,
+                "matches": html_tokens.edit_count - edits,
+                "changed": bool(changed),
+            })
+            return changed
+        return wrapper
+    return decorate
+
+if __name__ == "__main__":
+    # Summarize a recorded JSON Lines file
+    if len(sys.argv) != 2:
+        print("Usage: python transform_metrics.py METRICS.jsonl")
+        sys.exit(1)
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        print_summary([json.loads(line) for line in f if line.strip()])
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Single-pass transform engine for the email template fixups.
+
+Each fix script exposes a pure content transform which is registered here as a
+pass. Every file is read once, all passes that apply to it run in memory, and
+the file is written once. Files are spread across a process pool.
+
+The passes edit the templates only; the download pages are generated from
+them (generate_download_pages.py), so the pages of changed templates are
+regenerated after the run instead of being patched separately.
+
+Results are recorded in the build manifest (see build_manifest.py) so files
+whose content and pass set are unchanged since the last run are skipped
+without being read.
+
+With --summary or --metrics every pass is timed per file (see
+transform_metrics.py); --profile and --trace-memory add cProfile and
+tracemalloc data for finding pathological templates.
+
+Usage:
+    python transform_pipeline.py                 # run every pass on its files
+    python transform_pipeline.py --pass icon_urls --workers 4
+    python transform_pipeline.py --list          # show registered passes
+    python transform_pipeline.py --force         # ignore the manifest
+    python transform_pipeline.py --force --quiet --summary --profile 3
+    python transform_pipeline.py --force --metrics build/transform-metrics.jsonl
+"""
+
+import os
+import glob
+import fnmatch
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import update_templates_with_local_icons
+import fix_remaining_icons
+import fix_duplicate_attributes
+import update_icon_urls
+import build_manifest
+import generate_download_pages
+import transform_metrics
+
+# Manifest section holding the per-file records of this pipeline
+MANIFEST_SECTION = "transforms"
+
+# Where --profile writes the slowest files' cProfile data
+profile_dir = ".cache/profiles"
+
+# Registered passes, in the order they run over a file
+PASSES = []
+
+def register_pass(name, transform, patterns, version="1"):
+    """
+    Register a content transform as a pipeline pass.
+    The transform takes the file content and returns the new content;
+    patterns are glob patterns (relative to the project root) it applies to.
+    Changes to the module that defines the transform and to the project
+    modules it imports re-run the pass on their own; bump the version when
+    behaviour changes anywhere else (a data file, an installed package).
+    """
+    if any(p["name"] == name for p in PASSES):
+        raise ValueError(f"Pass '{name}' is already registered")
+
+    PASSES.append({
+        "name": name,
+        "transform": transform,
+        "patterns": list(patterns),
+        "version": version,
+    })
+
+# The order mirrors the order the standalone scripts used to be run in
+register_pass("local_icons",
+              update_templates_with_local_icons.replace_material_icons,
+              ["emails/newsletters/*.html"])
+register_pass("remaining_icons",
+              fix_remaining_icons.replace_remaining_icons,
+              ["emails/newsletters/*.html"])
+register_pass("duplicate_attributes",
+              fix_duplicate_attributes.clean_duplicate_attributes,
+              ["emails/newsletters/*.html"])
+register_pass("icon_urls",
+              update_icon_urls.rewrite_icon_urls,
+              ["emails/newsletters/*.html"])
+
+def select_passes(names=None):
+    """
+    Return the registered passes, optionally restricted to the given names
+    """
+    if not names:
+        return list(PASSES)
+
+    unknown = set(names) - {p["name"] for p in PASSES}
+    if unknown:
+        raise ValueError(f"Unknown pass(es): {', '.join(sorted(unknown))}")
+
+    return [p for p in PASSES if p["name"] in names]
+
+def passes_for_file(file_path, passes):
+    """
+    Return the passes whose patterns match the given file
+    """
+    rel_path = file_path.replace(os.sep, "/")
+    return [p for p in passes
+            if any(fnmatch.fnmatch(rel_path, pattern) for pattern in p["patterns"])]
+
+def collect_files(passes):
+    """
+    Collect every file matched by at least one of the passes, in a stable order
+    """
+    files = set()
+    for p in passes:
+        for pattern in p["patterns"]:
+            files.update(glob.glob(pattern))
+    return sorted(files)
+
+def pass_fingerprints(passes):
+    """
+    Return {pass name: fingerprint} for the given passes
+    """
+    return {p["name"]: build_manifest.pass_fingerprint(p["transform"], p["version"])
+            for p in passes}
+
+def filter_stale_files(files, passes, section):
+    """
+    Split the files into those that need processing and those the manifest
+    shows are up to date. Up-to-date entries refreshed by a content hash
+    check are written back into the section.
+    """
+    fingerprints = pass_fingerprints(passes)
+    stale = []
+    fresh = []
+
+    for file_path in files:
+        applicable = {p["name"]: fingerprints[p["name"]]
+                      for p in passes_for_file(file_path, passes)}
+        up_to_date, entry = build_manifest.is_up_to_date(section.get(file_path), file_path, applicable)
+        if up_to_date:
+            section[file_path] = entry
+            fresh.append(file_path)
+        else:
+            stale.append((file_path, applicable))
+
+    return stale, fresh
+
+def apply_passes(content, passes, recorder=None, path=None):
+    """
+    Run the passes over the content in memory, recording each one when a
+    transform_metrics.Recorder is given.
+    Returns the new content and the names of the passes that changed it.
+    """
+    changed_by = []
+    for p in passes:
+        if recorder is None:
+            new_content = p["transform"](content)
+        else:
+            new_content = recorder.run(p["name"], p["transform"], content, path)
+        if new_content != content:
+            changed_by.append(p["name"])
+            content = new_content
+    return content, changed_by
+
+def process_file(file_path, pass_names=None, instrument=None):
+    """
+    Read a file once, run every applicable pass over it and write it once.
+    Returns a result dict; errors are reported rather than raised so one bad
+    file does not abort the whole batch. With instrument (a dict of
+    transform_metrics.Recorder options) the result also carries the pass
+    records and the file's profile.
+    """
+    result = {"path": file_path, "changed": False, "passes": [], "error": None, "sha256": None}
+    recorder = transform_metrics.Recorder(**instrument) if instrument is not None else None
+
+    try:
+        passes = passes_for_file(file_path, select_passes(pass_names))
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        if recorder is None:
+            new_content, changed_by = apply_passes(content, passes)
+        else:
+            profiling = recorder.start_file()
+            new_content, changed_by = apply_passes(content, passes, recorder, file_path)
+            recorder.finish_file(profiling, file_path)
+
+        if new_content != content:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(new_content)
+            result["changed"] = True
+            result["passes"] = changed_by
+
+        result["sha256"] = build_manifest.content_hash(new_content)
+    except Exception as e:
+        result["error"] = str(e)
+
+    if recorder is not None:
+        result["metrics"] = recorder.records
+        result["profile"] = recorder.profiles.get(file_path)
+    return result
+
+def run_pipeline(files, pass_names=None, workers=None, instrument=None):
+    """
+    Process the files across a process pool and return the per-file results
+    """
+    if not files:
+        return []
+
+    # A pool is pure overhead for a handful of files
+    if workers == 1 or len(files) == 1:
+        return [process_file(f, pass_names, instrument) for f in files]
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(files) // (workers * 4))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(process_file, files,
+                                 [pass_names] * len(files),
+                                 [instrument] * len(files),
+                                 chunksize=chunksize))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the template fixup passes in a single read/write per file")
+    parser.add_argument("--pass", dest="passes", action="append",
+                        help="only run this pass (may be given more than once)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--list", action="store_true", help="list the registered passes and exit")
+    parser.add_argument("--force", action="store_true",
+                        help="process every file even if the manifest shows it is up to date")
+    parser.add_argument("--manifest", default=build_manifest.MANIFEST_PATH,
+                        help=f"manifest location (default: {build_manifest.MANIFEST_PATH})")
+    parser.add_argument("--quiet", action="store_true", help="only print the totals, not every updated file")
+    parser.add_argument("--summary", action="store_true", help="print per-pass timings (combine with --force)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="append per-pass, per-file records as JSON Lines (- for stdout)")
+    parser.add_argument("--profile", type=int, default=0, metavar="N",
+                        help=f"run under cProfile and keep the N slowest files in {profile_dir}/")
+    parser.add_argument("--trace-memory", action="store_true", help="record peak allocations with tracemalloc")
+    args = parser.parse_args()
+
+    if args.list:
+        for p in PASSES:
+            print(f"{p['name']:<22} {', '.join(p['patterns'])}")
+        return
+
+    passes = select_passes(args.passes)
+    files = collect_files(passes)
+
+    if not files:
+        print("❌ No template files found")
+        return
+
+    manifest = build_manifest.load_manifest(args.manifest)
+    section = build_manifest.get_section(manifest, MANIFEST_SECTION)
+
+    if args.force:
+        fingerprints = pass_fingerprints(passes)
+        stale = [(f, {p["name"]: fingerprints[p["name"]] for p in passes_for_file(f, passes)})
+                 for f in files]
+    else:
+        stale, _ = filter_stale_files(files, passes, section)
+
+    if not stale:
+        build_manifest.save_manifest(manifest, args.manifest)
+        print(f"ℹ️  All {len(files)} files are up to date")
+        return
+
+    instrument = None
+    if args.summary or args.metrics or args.profile or args.trace_memory:
+        instrument = {"profile": args.profile > 0, "trace_memory": args.trace_memory}
+    # JSON Lines on stdout are the only output
+    records_to_stdout = args.metrics == "-"
+    if records_to_stdout:
+        def report(*values):
+            pass
+    else:
+        report = print
+
+    report(f"🔄 Running {len(passes)} pass(es) over {len(stale)} of {len(files)} files...")
+    report()
+
+    results = run_pipeline([f for f, _ in stale], args.passes, args.workers, instrument)
+
+    applied = dict(stale)
+    for r in results:
+        if r["error"]:
+            section.pop(r["path"], None)
+        else:
+            section[r["path"]] = build_manifest.make_entry(r["path"], r["sha256"], applied[r["path"]])
+
+    # Only a full run knows the complete set of files taking part in the build
+    if not args.passes:
+        build_manifest.prune_section(section, set(files))
+    build_manifest.save_manifest(manifest, args.manifest)
+
+    changed = [r for r in results if r["changed"]]
+    errors = [r for r in results if r["error"]]
+
+    if not args.quiet:
+        for r in changed:
+            report(f"✅ Updated {r['path']} ({', '.join(r['passes'])})")
+    for r in errors:
+        report(f"❌ Error processing {r['path']}: {r['error']}")
+
+    regenerated = []
+    sources = [r["path"] for r in changed if generate_download_pages.is_source(r["path"])]
+    if sources:
+        regenerated, _ = generate_download_pages.generate(sources, manifest_path=args.manifest)
+        if not args.quiet:
+            for page_path in regenerated:
+                report(f"🔄 Regenerated {page_path}")
+
+    if instrument is not None:
+        records = [record for r in results for record in r.get("metrics", [])]
+        profiles = {r["path"]: r["profile"] for r in results if r.get("profile")}
+        if args.metrics:
+            transform_metrics.write_records(records, args.metrics)
+        if (args.summary or args.profile) and not records_to_stdout:
+            if changed and not args.quiet:
+                report()
+            transform_metrics.print_summary(records, profiles, args.profile)
+        if args.profile:
+            saved = transform_metrics.save_profiles(profiles, args.profile, profile_dir)
+            report(f"ℹ️  Saved {len(saved)} profiles to {profile_dir}/ (open with python -m pstats)")
+        report()
+
+    report("=" * 50)
+    report(f"✅ Updated {len(changed)} of {len(results)} processed files ({len(files) - len(results)} up to date)")
+    if regenerated:
+        report(f"✅ Regenerated {len(regenerated)} download pages")
+    if errors:
+        report(f"❌ {len(errors)} files failed")
+
+if __name__ == "__main__":
+    main()
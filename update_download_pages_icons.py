@@ -8,9 +8,15 @@ import os
 import re
 import glob
 
+import html_tokens
+import transform_metrics
+
 # Base URL for the Vercel deployment
 BASE_URL = "https://zomo-emails.vercel.app"
 
+# The newsletter download pages, the only ones with icons
+DOWNLOAD_PAGES_PATTERN = "download-pages/zomo-health-*-template-download.html"
+
 # Mapping of Material Icon names to their SVG file paths
 icon_mapping = {
     "handshake": "assets/images/icons/handshake.svg",
@@ -34,20 +40,21 @@ icon_mapping = {
     "dark_mode": "assets/images/icons/dark_mode.svg"
 }
 
-def create_icon_img_tag_encoded(icon_name, style_attrs=""):
+def create_icon_img_tag_encoded(icon_name, style=None, extra_attrs=""):
     """
-    Create an HTML-encoded img tag for the icon with proper styling
+    Create an HTML-encoded img tag for the icon with proper styling, from the
+    (encoded) inline style of the span it replaces. extra_attrs holds the
+    span's other attributes, still encoded; they are kept on the img.
     """
     if icon_name not in icon_mapping:
         print(f"⚠️  Warning: No local icon found for '{icon_name}'")
-        return f'&lt;span class=&quot;material-icons&quot; {style_attrs}&gt;{icon_name}&lt;/span&gt;'
+        style_attr = f' style=&quot;{style}&quot;' if style is not None else ""
+        return f'&lt;span class=&quot;material-icons&quot;{style_attr}{extra_attrs}&gt;{icon_name}&lt;/span&gt;'
     
     svg_path = f"{BASE_URL}/{icon_mapping[icon_name]}"
     
-    # Extract style attributes from the original span
-    style_match = re.search(r'style=&quot;([^&]*)&quot;', style_attrs)
-    if style_match:
-        original_style = style_match.group(1)
+    if style is not None:
+        original_style = style
         # Convert font-size to width/height for img tag
         width_height = "16px"  # default
         if "font-size:24px" in original_style:
@@ -71,8 +78,32 @@ def create_icon_img_tag_encoded(icon_name, style_attrs=""):
     else:
         new_style = "width:16px; height:16px; vertical-align:middle;"
     
-    return f'&lt;img src=&quot;{svg_path}&quot; alt=&quot;{icon_name}&quot; style=&quot;{new_style}&quot;&gt;'
+    return f'&lt;img src=&quot;{svg_path}&quot; alt=&quot;{icon_name}&quot; style=&quot;{new_style}&quot;{extra_attrs}&gt;'
+
+def is_material_icon_span(tag):
+    return tag.name == "span" and tag.get("class") == "material-icons"
+
+def replace_encoded_icons(content):
+    """
+    Replace HTML-encoded Material Icons spans with encoded img tags
+    """
+    # Matches: &lt;span class=&quot;material-icons&quot; style=&quot;...&quot;&gt;icon_name&lt;/span&gt;
+    edits = []
+    spans = html_tokens.text_elements(content, {"span"}, is_material_icon_span, escaped=True)
+    for start, text, end in spans:
+        icon_name = text.text.strip()
+        
+        # Skip if it's not a known icon
+        if icon_name not in icon_mapping:
+            continue
+        
+        extra_attrs = "".join(a.text for a in start.attributes if a.name.lower() not in ("class", "style"))
+        edits.append((start.start, end.end, create_icon_img_tag_encoded(icon_name, start.get("style"), extra_attrs)))
+    
+    # Replace all Material Icons with local SVG images
+    return html_tokens.apply_edits(content, edits)
 
+@transform_metrics.instrumented("download_page_icons")
 def update_download_page(file_path):
     """
     Update a single download page to use local icons
@@ -84,23 +115,7 @@ def update_download_page(file_path):
             content = f.read()
         
         original_content = content
-        
-        # Pattern to match HTML-encoded Material Icons spans
-        # Matches: &lt;span class=&quot;material-icons&quot; style=&quot;...&quot;&gt;icon_name&lt;/span&gt;
-        pattern = r'&lt;span class=&quot;material-icons&quot;([^&]*)&gt;([^&]+)&lt;/span&gt;'
-        
-        def replace_icon(match):
-            style_attrs = match.group(1)
-            icon_name = match.group(2).strip()
-            
-            # Skip if it's not a known icon
-            if icon_name not in icon_mapping:
-                return match.group(0)  # Return original
-            
-            return create_icon_img_tag_encoded(icon_name, style_attrs)
-        
-        # Replace all Material Icons with local SVG images
-        content = re.sub(pattern, replace_icon, content)
+        content = replace_encoded_icons(content)
         
         # Only write if content changed
         if content != original_content:
@@ -122,7 +137,7 @@ def main():
     print()
     
     # Find all newsletter download page files
-    download_files = glob.glob("download-pages/zomo-health-*-template-download.html")
+    download_files = glob.glob(DOWNLOAD_PAGES_PATTERN)
     
     if not download_files:
         print("❌ No newsletter download files found")
@@ -5,12 +5,31 @@ Email clients need remote URLs to load images, not local file paths.
 """
 
 import os
-import re
 import glob
 
+import html_tokens
+import transform_metrics
+
 # Base URL for the Vercel deployment
 BASE_URL = "https://zomo-emails.vercel.app"
 
+def point_icon_at_vercel(tag):
+    """
+    Rewrite a local icon src (assets/images/icons/icon_name.svg) to the Vercel URL
+    """
+    if "assets/images/icons/" not in tag.text:
+        return
+    src = tag.get("src")
+    if src and src.startswith("assets/images/icons/") and src.endswith(".svg"):
+        tag.set("src", f"{BASE_URL}/{src}")
+
+def rewrite_icon_urls(content):
+    """
+    Point local icon paths in the content at the Vercel deployment
+    """
+    return html_tokens.rewrite_tags(content, point_icon_at_vercel, {"img"})
+
+@transform_metrics.instrumented("icon_urls")
 def update_icon_urls(file_path):
     """
     Update icon URLs in a template file to use the Vercel URL
@@ -22,17 +41,7 @@ def update_icon_urls(file_path):
             content = f.read()
         
         original_content = content
-        
-        # Pattern to match local icon paths and replace with Vercel URL
-        # Matches: src="assets/images/icons/icon_name.svg"
-        pattern = r'src="assets/images/icons/([^"]*\.svg)"'
-        
-        def replace_with_vercel_url(match):
-            icon_filename = match.group(1)
-            return f'src="{BASE_URL}/assets/images/icons/{icon_filename}"'
-        
-        # Replace all local icon paths with Vercel URLs
-        content = re.sub(pattern, replace_with_vercel_url, content)
+        content = rewrite_icon_urls(content)
         
         # Only write if content changed
         if content != original_content:
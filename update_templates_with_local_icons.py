@@ -8,6 +8,9 @@ import os
 import re
 import glob
 
+import html_tokens
+import transform_metrics
+
 # Directory containing email templates
 templates_dir = "emails/newsletters"
 icons_dir = "assets/images/icons"
@@ -35,20 +38,21 @@ icon_mapping = {
     "dark_mode": "assets/images/icons/dark_mode.svg"
 }
 
-def create_icon_img_tag(icon_name, style_attrs=""):
+def create_icon_img_tag(icon_name, style=None, extra_attrs=""):
     """
-    Create an img tag for the icon with proper styling
+    Create an img tag for the icon with proper styling, from the inline style
+    of the span it replaces. extra_attrs holds the span's other attributes
+    (already serialized, each with its leading space); they are kept on the img.
     """
     if icon_name not in icon_mapping:
         print(f"⚠️  Warning: No local icon found for '{icon_name}'")
-        return f'<span class="material-icons" {style_attrs}>{icon_name}</span>'
+        style_attr = f' style="{style}"' if style is not None else ""
+        return f'<span class="material-icons"{style_attr}{extra_attrs}>{icon_name}</span>'
     
     svg_path = icon_mapping[icon_name]
     
-    # Extract style attributes from the original span
-    style_match = re.search(r'style="([^"]*)"', style_attrs)
-    if style_match:
-        original_style = style_match.group(1)
+    if style is not None:
+        original_style = style
         # Convert font-size to width/height for img tag
         width_height = "16px"  # default
         if "font-size:24px" in original_style:
@@ -72,20 +76,74 @@ def create_icon_img_tag(icon_name, style_attrs=""):
     else:
         new_style = "width:16px; height:16px; vertical-align:middle;"
     
-    # Clean up style_attrs to avoid conflicts - remove style attribute since we're adding our own
-    clean_attrs = style_attrs.replace('style="', '').replace('"', '').strip()
-    # Remove any remaining style-related attributes
-    clean_attrs = re.sub(r'font-size:[^;]*;?', '', clean_attrs)
-    clean_attrs = re.sub(r'vertical-align:[^;]*;?', '', clean_attrs)
-    clean_attrs = re.sub(r'margin-right:[^;]*;?', '', clean_attrs)
-    clean_attrs = re.sub(r'color:[^;]*;?', '', clean_attrs)
-    clean_attrs = clean_attrs.strip()
+    return f'<img src="{svg_path}" alt="{icon_name}" style="{new_style}"{extra_attrs}>'
+
+def is_material_icon_span(tag):
+    # Only plain icon spans; spans with extra classes are left to fix_remaining_icons.py
+    return tag.name == "span" and tag.get("class") == "material-icons"
+
+def is_icon_font_link(tag):
+    return tag.name == "link" and "Material+Icons" in (tag.get("href") or "")
+
+# One CSS rule without nested blocks: selectors { declarations }
+CSS_RULE_PATTERN = re.compile(r'(?P<selectors>[^{}]*)\{(?P<body>[^{}]*)\}')
+
+def strip_icon_font_css(css):
+    """
+    Remove the Material Icons font import and the .material-icons selectors
+    (and rules left without selectors) from a stylesheet
+    """
+    css = re.sub(r'@import url\([^)]*Material\+Icons[^)]*\);', '', css)
+    
+    def strip_rule(match):
+        selectors = match.group("selectors")
+        if ".material-icons" not in selectors:
+            return match.group(0)
+        kept = [s for s in selectors.split(",") if ".material-icons" not in s]
+        if not kept:
+            return selectors[:len(selectors) - len(selectors.lstrip())]
+        trailing = selectors[len(selectors.rstrip()):]
+        return ",".join(kept).rstrip() + trailing + "{" + match.group("body") + "}"
     
-    if clean_attrs:
-        clean_attrs = f' {clean_attrs}'
+    return CSS_RULE_PATTERN.sub(strip_rule, css)
+
+def replace_material_icons(content):
+    """
+    Replace Material Icons spans with local SVG img tags and drop the icon font
+    """
+    edits = []
+    # Font links and stylesheets (including those inside <!--[if mso]> comments)
+    # are edited in the same pass as the spans
+    for tag in html_tokens.iter_tags(content, {"span", "link", "style"}):
+        if tag.name == "link":
+            if is_icon_font_link(tag):
+                edits.append((tag.start, tag.end, ""))
+            continue
+        if tag.name == "style":
+            css_start, css_end = html_tokens.raw_text(tag)
+            css = content[css_start:css_end]
+            stripped = strip_icon_font_css(css)
+            if stripped != css:
+                edits.append((css_start, css_end, stripped))
+            continue
+        if not is_material_icon_span(tag):
+            continue
+        element = html_tokens.element_text(tag)
+        if element is None:
+            continue
+        text, end = element
+        icon_name = text.text.strip()
+        
+        # Skip if it's not a known icon
+        if icon_name not in icon_mapping:
+            continue
+        
+        extra_attrs = "".join(a.text for a in tag.attributes if a.name.lower() not in ("class", "style"))
+        edits.append((tag.start, end.end, create_icon_img_tag(icon_name, tag.get("style"), extra_attrs)))
     
-    return f'<img src="{svg_path}" alt="{icon_name}" style="{new_style}"{clean_attrs}>'
+    return html_tokens.apply_edits(content, edits)
 
+@transform_metrics.instrumented("local_icons")
 def update_template_file(file_path):
     """
     Update a single template file to use local icons
@@ -97,31 +155,7 @@ def update_template_file(file_path):
             content = f.read()
         
         original_content = content
-        
-        # Pattern to match Material Icons spans
-        # Matches: <span class="material-icons" style="...">icon_name</span>
-        pattern = r'<span class="material-icons"([^>]*)>([^<]+)</span>'
-        
-        def replace_icon(match):
-            style_attrs = match.group(1)
-            icon_name = match.group(2).strip()
-            
-            # Skip if it's not a known icon
-            if icon_name not in icon_mapping:
-                return match.group(0)  # Return original
-            
-            return create_icon_img_tag(icon_name, style_attrs)
-        
-        # Replace all Material Icons with local SVG images
-        content = re.sub(pattern, replace_icon, content)
-        
-        # Also remove the Material Icons font import and CSS
-        content = re.sub(r'@import url\([^)]*Material\+Icons[^)]*\);', '', content)
-        content = re.sub(r'<link[^>]*Material\+Icons[^>]*>', '', content)
-        
-        # Remove Material Icons CSS rules
-        content = re.sub(r'\.material-icons\s*\{[^}]*\}', '', content)
-        content = re.sub(r'\.material-icons[^{]*\{[^}]*\}', '', content)
+        content = replace_material_icons(content)
         
         # Only write if content changed
         if content != original_content: